@@ -1,26 +1,36 @@
 """
 Rádio IA News - Interface web
 Programação contínua: notícia → música → música → notícia.
+Várias rádios no mesmo processo: a padrão em /, as demais em /s/<rádio>/ (ver core/station.py).
 Blocos de notícia gerados toda segunda-feira em lote (RSS + dicas → voz → disco);
 a rádio usa esses blocos durante a semana, minimizando uso de APIs (Gemini + ElevenLabs).
 """
 
+import hashlib
+import hmac
 import os
 import random
 import re
 import shutil
+import sys
 import threading
 import time
+import uuid
 from datetime import datetime, timezone
 from pathlib import Path
 from urllib.parse import quote
 
-from flask import Flask, jsonify, render_template, request, send_file
-
-import google.generativeai as genai
-
-from core.mixer import get_next_track, mix_voice_with_bed, normalize_audio
-from core.news_agent import run as news_run, run_louveira, run_from_pasted_source
+from flask import Flask, Response, abort, jsonify, render_template, request, send_file
+from werkzeug.datastructures import ContentRange
+from werkzeug.http import is_resource_modified
+
+from core import block_manifest, byte_cache, feeds, jobs, library_index, playout_plan, profiling, quota, renditions, tts_cache
+from core.mixer import HISTORY_SIZE, _get_music_files, get_next_track, loudness_stats, render_block
+from core.news_agent import TOP_N, fetch_news, run as news_run, run_louveira, run_from_pasted_source, script_stats
+from core.producer import BlockProducer
+from core.state_store import open_store
+from core.station import DEFAULT_SLUG, GenerationScheduler, Station, load_stations
+from core.story_index import StoryIndex
 from core.voice_agent import run as voice_run
 
 app = Flask(__name__)
@@ -28,6 +38,8 @@ app = Flask(__name__)
 BASE_DIR = Path(__file__).resolve().parent
 OUTPUT_DIR = BASE_DIR / "output"
 BLOCKS_DIR = OUTPUT_DIR / "blocks"
+# Lote semanal novo é gerado aqui enquanto o lote antigo continua tocando
+STAGING_DIR = OUTPUT_DIR / "blocks_staging"
 NEWS_FILE = OUTPUT_DIR / "news_latest.mp3"
 DUCKED_FILE = OUTPUT_DIR / "ducked_latest.mp3"
 MUSICAS_DIR = BASE_DIR / "assets" / "musicas"
@@ -39,7 +51,6 @@ CLOSING_MESSAGES = [
     "A Rádio IAE News é uma criação da IAExpertise Inteligência Artificial. Para saber mais, visite iaexpertise.com.br. [pausa] Vamos de música!",
     "A Rádio IAE News é totalmente criada e executada por Inteligência Artificial e a sua empresa também pode ter uma rádio personalizada no seu site. Fale com a IAExpertise.",
 ]
-_closing_index = 0
 
 # Dicas de IA (alternam com as notícias na programação)
 DICA_INTROS = [
@@ -58,93 +69,317 @@ DICA_TIPS = [
     "Ferramentas de IA ajudam programadores a escrever código mais rápido e com menos erros.",
 ]
 
-# Fila de blocos de notícia prontos (nomes de arquivo)
-ready_blocks: list[str] = []
-_lock = threading.Lock()
-_block_counter = 0
 # Ciclo: 0 = notícia, 1 = música, 2 = música, depois volta a 0
-_cycle_index = 0
+CYCLE_LEN = 3
 
 # Atualização semanal: toda segunda gera um lote e usa durante a semana (minimiza APIs)
 LAST_WEEKLY_FILE = OUTPUT_DIR / "last_weekly_generation.txt"
-BLOCKS_PER_WEEK = 15
-WEEKLY_CHECK_INTERVAL_SEC = 6 * 3600  # verificar a cada 6h se é segunda e precisa gerar
-DELAY_BETWEEN_BLOCKS_SEC = 3  # intervalo entre blocos no lote (evita rate limit)
+BLOCKS_PER_WEEK = 15  # teto do lote semanal (o tamanho real segue a demanda medida)
+# Quantos blocos novos precisam estar prontos para trocar o lote antigo pelo novo
+WEEKLY_MIN_BLOCKS_TO_SWAP = int(os.getenv("WEEKLY_MIN_BLOCKS_TO_SWAP", "5"))
+# Arquivos do lote antigo ficam no disco mais um tempo (downloads em andamento terminam)
+OLD_BLOCKS_GRACE_SEC = 15 * 60
+# Reserva do lote semanal no StateStore: um lote por rádio entre todos os processos
+# (servidor web sem agendador + --generator). Renovada a cada bloco; vence se o dono morrer.
+BATCH_LEASE = "weekly_batch"
+BATCH_LEASE_SEC = 30 * 60
+# Blocos têm nome único e nunca mudam: podem ficar em cache no navegador/CDN
+BLOCK_CACHE_MAX_AGE_SEC = 7 * 24 * 3600
+# Pré-aquecimento do cache de bytes: próximos blocos da fila e músicas mais tocadas
+PREWARM_BLOCKS = 3
+PREWARM_TRACKS = 5
+# Intervalo mínimo entre pré-aquecimentos da mesma rádio (disparados por /api/next)
+PREWARM_EVERY_SEC = 60
+# Plano da semana (core/playout_plan.py): notícia a cada N minutos em vez do ciclo fixo (0 = ciclo)
+PLAN_NEWS_EVERY_MIN = float(os.getenv("PLAN_NEWS_EVERY_MIN", "0"))
+# O plano é refeito quando restam menos posições que isso
+PLAN_MIN_AHEAD = 30
+# Posições devolvidas por /api/plan (padrão e teto)
+PLAN_API_DEFAULT = 10
+PLAN_API_MAX = 200
+# Validade dos links de download de perfis (assinados, sem o segredo na URL)
+PROFILE_LINK_TTL_SEC = 10 * 60
+
+# ---------- Rádios ----------
+
+# Agendador central: um loop de geração reparte o trabalho entre todas as rádios
+scheduler = GenerationScheduler(lambda: list(STATIONS.values()))
+# True quando o loop de geração roda neste processo
+_scheduler_running = False
+
+
+def _make_producer(st: Station) -> BlockProducer:
+    """Produção sob demanda da rádio: estoque acompanha o consumo medido em /api/next."""
+    return BlockProducer(
+        produce=lambda: _generate_one_block(st),
+        ready_count=st.state.queue_len,
+        consumed_count=st.state.news_consumed,
+        low=int(os.getenv("PRODUCER_LOW_WATERMARK", "3")),
+        high=int(os.getenv("PRODUCER_HIGH_WATERMARK", str(BLOCKS_PER_WEEK))),
+        daily_budget=int(os.getenv("PRODUCER_DAILY_BUDGET", "30")),
+        wake_event=scheduler.event,
+        spent_today=lambda day: st.state.counter(f"produced:{day}"),
+        spend=lambda day: st.state.incr_counter(f"produced:{day}"),
+    )
+
+
+def _make_story_index(st: Station) -> StoryIndex:
+    """
+    Índice de matérias da rádio: janela do feed dela (ou das várias fontes agregadas, se
+    configuradas), matérias já exibidas em work_dir.
+    """
+
+    def fetch(limit: int) -> list[dict]:
+        if st.feeds:
+            return feeds.fetch(st.feeds, limit)
+        return fetch_news(st.rss_url, limit=limit)
+
+    return StoryIndex(fetch=fetch, aired_path=st.aired_stories_file)
+
+
+# Rádio padrão: pastas originais. Estado compartilhado (fila, ciclo, contador, encerramento, chat):
+# RADIO_STATE_BACKEND=sqlite permite vários workers/processos com a mesma fila e chat.
+DEFAULT_STATION = Station(
+    slug=DEFAULT_SLUG,
+    name="Rádio IAE News",
+    music_dir=MUSICAS_DIR,
+    bed_path=NEWS_BED_PATH,
+    blocks_dir=BLOCKS_DIR,
+    staging_dir=STAGING_DIR,
+    work_dir=OUTPUT_DIR,
+    state=open_store(),
+    feeds=feeds.parse_sources(os.getenv("NEWS_FEEDS")),
+)
+STATIONS: dict[str, Station] = load_stations(DEFAULT_STATION)
+for _st in STATIONS.values():
+    _st.producer = _make_producer(_st)
+    _st.stories = _make_story_index(_st)
+    _st.library = library_index.for_dir(_st.music_dir)
+# Compatibilidade: estado da rádio padrão
+state = DEFAULT_STATION.state
+
+
+def _station(slug: str | None) -> Station:
+    """Rádio pelo slug da rota (/s/<slug>/...); None = rádio padrão. 404 se não existir."""
+    st = STATIONS.get(slug or DEFAULT_SLUG)
+    if st is None:
+        abort(404)
+    return st
+
+
+def _next_track(st: Station) -> Path | None:
+    """Próxima música da playlist da rádio (histórico de não repetição por rádio)."""
+    with st.lock:
+        return get_next_track(st.music_dir, st.track_history)
+
+
+def _planned_track(st: Station, plan: playout_plan.PlayoutPlan | None, position: int) -> Path | None:
+    """Faixa do plano para a posição (entra no histórico de não repetição); None = sortear."""
+    name = plan.track_at(position) if plan is not None else None
+    if name is None:
+        return None
+    track = Path(name)
+    if not track.is_file():
+        # Faixa saiu da pasta: plano novo com a biblioteca atual
+        _refresh_plan_soon(st)
+        return None
+    with st.lock:
+        st.track_history.append(name)
+        if len(st.track_history) > HISTORY_SIZE:
+            st.track_history.pop(0)
+    return track
+
+
+def _rebuild_plan(st: Station) -> playout_plan.PlayoutPlan:
+    """
+    Refaz o plano da semana a partir da posição atual do ciclo: fila de blocos (durações do
+    manifest), faixas da pasta (durações do índice da biblioteca) e últimas faixas planejadas
+    (a rotação continua sem repetir). Se só a fila mudou (mesma semana, ciclo e faixas, plano
+    ainda à frente), mantém as músicas já planejadas e troca só a tabela de blocos.
+    Grava em st.plan_file para todos os processos.
+    """
+    rows = _block_rows(st)
+    blocks = []
+    for name in st.state.queue_list():
+        ms = (rows.get(name) or {}).get("duration_ms")
+        blocks.append((name, ms / 1000 if ms else None))
+    tracks = []
+    for path in _get_music_files(st.music_dir):
+        info = st.library.get(path) or {}
+        tracks.append((str(path.resolve()), info.get("duration_sec")))
+    position = st.state.cycle_position()
+    old = playout_plan.load_plan(st.plan_file)
+    if (
+        old is not None
+        and old.week == playout_plan.week_id()
+        and old.cycle_len == CYCLE_LEN
+        and old.tracks == [path for path, _ in tracks]
+        and old.covers(position + PLAN_MIN_AHEAD)
+    ):
+        plan = old.with_blocks(position, blocks)
+        playout_plan.write_plan(st.plan_file, plan)
+        return plan
+    if old is not None:
+        recent = old.music_before(position, HISTORY_SIZE)
+    else:
+        with st.lock:
+            recent = list(st.track_history)
+    plan = playout_plan.build_plan(
+        position,
+        blocks,
+        tracks,
+        cycle_len=CYCLE_LEN,
+        news_every_sec=PLAN_NEWS_EVERY_MIN * 60 or None,
+        recent=recent,
+        seed=f"{st.slug}:{playout_plan.week_id()}",
+    )
+    playout_plan.write_plan(st.plan_file, plan)
+    return plan
 
 
-def _next_block_id() -> int:
-    global _block_counter
-    with _lock:
-        _block_counter += 1
-        return _block_counter
+# Rádios com plano a refazer / com refazimento em andamento neste processo
+_plan_pending: set[str] = set()
+_plan_running: set[str] = set()
+_plan_lock = threading.Lock()
 
 
-def _get_next_closing() -> str:
+def _refresh_plan_soon(st: Station) -> None:
+    """
+    Refaz o plano em segundo plano (semana nova, plano no fim ou blocos mudaram). Pedidos
+    durante um refazimento geram mais uma rodada, com a fila já atualizada.
+    """
+    with _plan_lock:
+        _plan_pending.add(st.slug)
+        if st.slug in _plan_running:
+            return
+        _plan_running.add(st.slug)
+    threading.Thread(target=_plan_worker, args=(st,), daemon=True).start()
+
+
+def _plan_worker(st: Station) -> None:
+    while True:
+        with _plan_lock:
+            if st.slug not in _plan_pending:
+                _plan_running.discard(st.slug)
+                return
+            _plan_pending.discard(st.slug)
+        try:
+            _rebuild_plan(st)
+        except Exception:
+            # Fica o plano anterior (ou o ciclo fixo); a próxima mudança tenta de novo
+            pass
+
+
+def _get_next_closing(st: Station) -> str:
     """Retorna a próxima mensagem de encerramento (alternada)."""
-    global _closing_index
-    with _lock:
-        msg = CLOSING_MESSAGES[_closing_index % len(CLOSING_MESSAGES)]
-        _closing_index += 1
-    return msg
+    return CLOSING_MESSAGES[st.state.next_closing_index() % len(CLOSING_MESSAGES)]
 
 
-def _generate_one_block() -> bool:
-    """Gera um bloco: notícias OU dica de IA (aleatório), + encerramento → voz, opcionalmente com bed."""
-    global ready_blocks
+def _produce_block(st: Station, script: str, source: str, dest_dir: Path | None = None) -> str | None:
+    """
+    Roteiro + encerramento → voz → mix/normalização → dest_dir/block_NNNNNN.mp3
+    (padrão: pasta de blocos da rádio). Registra o bloco no manifest de dest_dir (duração,
+    LUFS, hash, roteiro) e retorna o nome do arquivo (não coloca na fila).
+    Retorna None se o áudio não foi gerado.
+    """
+    dest_dir = dest_dir or st.blocks_dir
+    closing = _get_next_closing(st)
+    full_script = script.strip() + " [pausa] " + closing
+    voice_path = st.new_voice_file()
+    try:
+        with jobs.stage("voz"):
+            voice_run(full_script, output_path=voice_path)
+        if not voice_path.is_file():
+            return None
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        name = f"block_{st.state.next_block_id():06d}.mp3"
+        dest = dest_dir / name
+        with jobs.stage("mix"):
+            duration_ms, lufs = render_block(voice_path, dest, st.bed_path)
+    finally:
+        voice_path.unlink(missing_ok=True)
+    row = block_manifest.build_row(dest, duration_ms=duration_ms, lufs=lufs, script=full_script, source=source)
+    block_manifest.add_block(dest_dir, row)
+    return name
+
+
+@profiling.profiled("block")
+def _make_block(st: Station, dest_dir: Path | None = None) -> str | None:
+    """
+    Gera um bloco: notícias OU dica de IA (aleatório), + encerramento → voz, opcionalmente com bed.
+    As notícias vêm do índice de matérias da rádio (TOP_N matérias distintas e inéditas na
+    semana); se acabaram, o bloco vira dica em vez de repetir notícia.
+    """
+    stories: list[dict] = []
     try:
         use_dica = random.random() < 0.35
+        if not use_dica:
+            stories = st.stories.take(TOP_N)
+            use_dica = not stories
         if use_dica:
             intro = random.choice(DICA_INTROS)
             tip = random.choice(DICA_TIPS)
             script = intro + tip
         else:
-            script = news_run()
-        closing = _get_next_closing()
-        full_script = script.strip() + " [pausa] " + closing
-        voice_run(full_script)
-        if not NEWS_FILE.is_file():
-            return False
-        BLOCKS_DIR.mkdir(parents=True, exist_ok=True)
-        name = f"block_{_next_block_id():06d}.mp3"
-        dest = BLOCKS_DIR / name
-        if NEWS_BED_PATH.is_file():
-            mix_voice_with_bed(NEWS_FILE, NEWS_BED_PATH, dest)
-        else:
-            normalize_audio(NEWS_FILE, dest)
-        with _lock:
-            ready_blocks.append(name)
-        return True
+            script = news_run(news=stories)
+        name = _produce_block(st, script, "dica" if use_dica else "news", dest_dir)
     except Exception:
+        name = None
+    if stories:
+        if name is None:
+            st.stories.release(stories)
+        else:
+            st.stories.mark_aired(stories)
+    return name
+
+
+def _generate_one_block(st: Station) -> bool:
+    """Gera um bloco na pasta de blocos da rádio e coloca no fim da fila."""
+    name = _make_block(st)
+    if name is None:
         return False
+    st.state.queue_append(name)
+    renditions.schedule(st.blocks_dir / name)
+    _refresh_plan_soon(st)
+    return True
+
 
+def _block_rows(st: Station) -> dict[str, dict]:
+    """Linhas do manifest da pasta de blocos da rádio (vazio se ainda não existir)."""
+    return block_manifest.load_manifest(st.blocks_dir) or {}
 
-def _load_blocks_from_disk() -> None:
-    """Carrega a lista de blocos já gravados em output/blocks/ para ready_blocks."""
-    global ready_blocks, _block_counter
-    if not BLOCKS_DIR.is_dir():
+
+def _load_blocks_from_disk(st: Station) -> None:
+    """
+    Carrega a fila a partir do manifest da pasta de blocos (sem varrer nem decodificar áudio).
+    Instalações antigas sem manifest: cria o manifest uma vez a partir dos arquivos.
+    """
+    if not st.blocks_dir.is_dir():
         return
-    names = sorted(f.name for f in BLOCKS_DIR.glob("block_*.mp3") if _safe_block_filename(f.name))
-    with _lock:
-        ready_blocks.clear()
-        ready_blocks.extend(names)
-        # Atualiza contador para o próximo ID (evita sobrescrever arquivos)
-        for n in names:
-            try:
-                num = int(n.replace("block_", "").replace(".mp3", ""))
-                _block_counter = max(_block_counter, num)
-            except ValueError:
-                pass
+    rows = block_manifest.load_manifest(st.blocks_dir)
+    if rows is None:
+        rows = block_manifest.rebuild_from_files(st.blocks_dir)
+    names = [n for n in rows if _safe_block_filename(n)]
+    st.state.queue_replace(names)
+    _refresh_plan_soon(st)
+    # Atualiza contador para o próximo ID (evita sobrescrever arquivos)
+    for n in names:
+        try:
+            num = int(n.replace("block_", "").replace(".mp3", ""))
+            st.state.bump_block_counter(num)
+        except ValueError:
+            pass
 
 
-def _should_run_weekly_generation() -> bool:
+def _should_run_weekly_generation(st: Station) -> bool:
     """True se for segunda e (nunca gerou ou última geração foi há 6+ dias)."""
     now = datetime.now(timezone.utc)
     if now.weekday() != 0:
         return False
-    if not LAST_WEEKLY_FILE.is_file():
+    if not st.last_weekly_file.is_file():
         return True
     try:
-        with open(LAST_WEEKLY_FILE) as f:
+        with open(st.last_weekly_file) as f:
             s = f.read().strip()
         last = datetime.fromisoformat(s.replace("Z", "+00:00"))
         return (now - last).days >= 6
@@ -152,47 +387,206 @@ def _should_run_weekly_generation() -> bool:
         return True
 
 
-def _run_weekly_batch() -> None:
-    """Gera um lote de blocos (notícias/dicas), grava em output/blocks/ e atualiza last_weekly."""
-    global ready_blocks, _block_counter
-    BLOCKS_DIR.mkdir(parents=True, exist_ok=True)
-    with _lock:
-        ready_blocks.clear()
-        _block_counter = 0
-    for f in BLOCKS_DIR.glob("block_*.mp3"):
+def _remove_block_files(directory: Path, keep: set[str], older_than: float | None = None) -> None:
+    """
+    Apaga os block_*.mp3 de directory que não estão em keep. Com older_than (epoch), só os
+    modificados antes disso: um boletim ainda sendo gravado (fora do manifest) fica.
+    """
+    for f in directory.glob("block_*.mp3"):
+        if f.name in keep:
+            continue
         try:
+            if older_than is not None and f.stat().st_mtime >= older_than:
+                continue
+            renditions.discard(f)
             f.unlink()
         except Exception:
             pass
-    for _ in range(BLOCKS_PER_WEEK):
-        _generate_one_block()
-        time.sleep(DELAY_BETWEEN_BLOCKS_SEC)
-    now = datetime.now(timezone.utc)
-    LAST_WEEKLY_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(LAST_WEEKLY_FILE, "w") as f:
-        f.write(now.strftime("%Y-%m-%dT%H:%M:%SZ"))
 
 
-def _weekly_generator_thread():
+def _cleanup_old_blocks(st: Station, names: set[str] | None = None) -> None:
     """
-    Toda segunda-feira gera um lote de blocos (notícias/dicas), grava em output/blocks/
-    e usa esses blocos durante a semana. Minimiza uso de Gemini + ElevenLabs.
+    Apaga da pasta de blocos os arquivos do lote antigo (names, os que a troca tirou) que não
+    voltaram ao manifest. Sem names: órfãos fora do manifest com mais de OLD_BLOCKS_GRACE_SEC.
     """
-    global ready_blocks, _block_counter
-    while True:
+    with block_manifest.locked(st.blocks_dir):
+        listed = set(_block_rows(st))
+    if names is None:
+        _remove_block_files(st.blocks_dir, listed, older_than=time.time() - OLD_BLOCKS_GRACE_SEC)
+        return
+    for name in names - listed - set(st.state.queue_list()):
+        path = st.blocks_dir / name
         try:
-            need = _should_run_weekly_generation()
-            if not need:
-                # Primeira execução sem blocos: gera um lote para não ficar sem conteúdo
-                with _lock:
-                    n = len(ready_blocks)
-                if n == 0:
-                    need = True
-            if need:
-                _run_weekly_batch()
-            time.sleep(WEEKLY_CHECK_INTERVAL_SEC)
+            renditions.discard(path)
+            path.unlink(missing_ok=True)
         except Exception:
-            time.sleep(3600)
+            pass
+
+
+def _old_batch_names(rows: dict[str, dict], queued: set[str]) -> set[str]:
+    """
+    Blocos do lote antigo (saem na troca): notícias/dicas, e boletins que já tocaram e foram
+    gravados há mais de OLD_BLOCKS_GRACE_SEC. Boletim na fila ou recém-gravado fica.
+    """
+    limit = time.time() - OLD_BLOCKS_GRACE_SEC
+    old = set()
+    for name, row in rows.items():
+        if row.get("source") != "boletim":
+            old.add(name)
+            continue
+        created = row.get("created_at")
+        try:
+            ts = datetime.fromisoformat(created.replace("Z", "+00:00")).timestamp() if created else 0.0
+        except ValueError:
+            ts = 0.0
+        if name not in queued and ts < limit:
+            old.add(name)
+    return old
+
+
+def _swap_in_staged(st: Station, names: list[str]) -> None:
+    """
+    Troca o lote antigo pelo novo: move os blocos do staging para a pasta de blocos
+    (os.replace, atômico por arquivo e com nomes únicos), grava o manifest novo e troca a fila
+    numa transação do store (queue_swap relê a fila: boletim colocado no meio tempo fica),
+    tudo sob o lock do manifest (entre processos). Os arquivos do lote antigo continuam no
+    disco até _cleanup_old_blocks (downloads em andamento) e só eles são apagados.
+    """
+    staged_rows = block_manifest.load_manifest(st.staging_dir) or {}
+    with block_manifest.locked(st.blocks_dir):
+        old_rows = dict(_block_rows(st))
+        drop = _old_batch_names(old_rows, set(st.state.queue_list()))
+        for n in names:
+            os.replace(st.staging_dir / n, st.blocks_dir / n)
+            renditions.schedule(st.blocks_dir / n)
+        rows = [r for n, r in old_rows.items() if n not in drop] + [staged_rows[n] for n in names if n in staged_rows]
+        block_manifest.write_manifest(st.blocks_dir, rows)
+        st.state.queue_swap(drop, names)
+    block_manifest.remove_blocks(st.staging_dir, names)
+    _refresh_plan_soon(st)
+    t = threading.Timer(OLD_BLOCKS_GRACE_SEC, _cleanup_old_blocks, args=(st, drop - set(names)))
+    t.daemon = True
+    t.start()
+
+
+def _promote_staged(st: Station, name: str) -> None:
+    """Depois da troca: move um bloco novo do staging para a pasta de blocos e coloca na fila."""
+    row = (block_manifest.load_manifest(st.staging_dir) or {}).get(name)
+    os.replace(st.staging_dir / name, st.blocks_dir / name)
+    renditions.schedule(st.blocks_dir / name)
+    if row:
+        block_manifest.add_block(st.blocks_dir, row)
+    block_manifest.remove_blocks(st.staging_dir, [name])
+    st.state.queue_append(name)
+    _refresh_plan_soon(st)
+
+
+def _start_weekly_batch(st: Station, count: int = BLOCKS_PER_WEEK) -> bool:
+    """
+    Abre um lote de count blocos (notícias/dicas) gerados no staging enquanto o lote antigo
+    continua tocando. Os blocos são gerados um a um por _weekly_batch_step.
+    Retorna False (sem tocar no staging) se outro processo já tem um lote desta rádio.
+    """
+    lease = uuid.uuid4().hex
+    with st.batch_lock:
+        # Pedido do admin e agendador ao mesmo tempo: só um abre o lote
+        if st.batch is not None or not st.state.acquire_lease(BATCH_LEASE, lease, BATCH_LEASE_SEC):
+            return False
+        st.blocks_dir.mkdir(parents=True, exist_ok=True)
+        st.staging_dir.mkdir(parents=True, exist_ok=True)
+        # Restos de um lote interrompido e arquivos órfãos (fora do manifest)
+        _remove_block_files(st.staging_dir, keep=set())
+        with block_manifest.locked(st.staging_dir):
+            block_manifest.write_manifest(st.staging_dir, [])
+        st.batch = {
+            "count": count,
+            "done": 0,
+            "staged": [],
+            "swapped": False,
+            "min_to_swap": max(1, min(WEEKLY_MIN_BLOCKS_TO_SWAP, count)),
+            "lease": lease,
+        }
+    _cleanup_old_blocks(st)
+    # Uma busca do feed (janela larga) por lote; as matérias distintas são repartidas entre os blocos
+    try:
+        st.stories.refresh()
+    except Exception:
+        pass
+    return True
+
+
+def _weekly_batch_step(st: Station) -> bool:
+    """
+    Gera o próximo bloco do lote. Ao atingir min_to_swap blocos, troca lote e fila de uma vez;
+    os blocos seguintes entram na fila conforme ficam prontos. No fim atualiza last_weekly.
+    Retorna False se o bloco falhou.
+    """
+    batch = st.batch
+    if batch is None:
+        return True
+    if not st.state.acquire_lease(BATCH_LEASE, batch["lease"], BATCH_LEASE_SEC):
+        # Reserva venceu e outro processo abriu um lote: este para sem mexer no staging
+        with st.batch_lock:
+            st.batch = None
+        return False
+    name = _make_block(st, st.staging_dir)
+    if name is not None:
+        if batch["swapped"]:
+            _promote_staged(st, name)
+        else:
+            batch["staged"].append(name)
+            if len(batch["staged"]) >= batch["min_to_swap"]:
+                _swap_in_staged(st, batch["staged"])
+                batch["swapped"] = True
+    batch["done"] += 1
+    if batch["done"] >= batch["count"]:
+        with st.batch_lock:
+            st.batch = None
+        st.state.release_lease(BATCH_LEASE, batch["lease"])
+        if not batch["swapped"]:
+            if not batch["staged"]:
+                # Nada foi gerado: mantém o lote antigo e tenta de novo na próxima verificação
+                return False
+            _swap_in_staged(st, batch["staged"])
+        now = datetime.now(timezone.utc)
+        st.last_weekly_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(st.last_weekly_file, "w") as f:
+            f.write(now.strftime("%Y-%m-%dT%H:%M:%SZ"))
+    return name is not None
+
+
+def _run_weekly_batch(st: Station, count: int = BLOCKS_PER_WEEK) -> bool:
+    """Gera o lote inteiro de uma vez (sem agendador neste processo). False se já havia lote."""
+    if not _start_weekly_batch(st, count):
+        return False
+    while st.batch is not None:
+        _weekly_batch_step(st)
+    return True
+
+
+def _weekly_refresh(st: Station) -> None:
+    """Na segunda-feira abre o lote novo da rádio (notícias da semana), no tamanho da demanda atual."""
+    if st.batch is None and _should_run_weekly_generation(st):
+        st.producer.sample_rate()
+        _start_weekly_batch(st, count=max(st.producer.target(), WEEKLY_MIN_BLOCKS_TO_SWAP))
+
+
+def _generation_work(st: Station) -> bool:
+    """Uma unidade de trabalho do agendador: próximo bloco do lote semanal ou reposição da fila."""
+    if st.batch is not None:
+        return _weekly_batch_step(st)
+    return st.producer.produce_one()
+
+
+def _weekly_generator_thread():
+    """
+    Gerador: toda segunda-feira renova o lote de blocos de cada rádio (notícias/dicas); no resto
+    do tempo repõe as filas sob demanda (marcas baixa/alta), acordando quando a programação
+    consome blocos. O agendador reparte as chamadas às APIs entre as rádios.
+    """
+    global _scheduler_running
+    _scheduler_running = True
+    scheduler.run_forever(_generation_work, before_round=_weekly_refresh)
 
 
 def _safe_block_filename(name: str) -> bool:
@@ -207,142 +601,356 @@ def _safe_music_filename(name: str) -> bool:
 
 # ---------- Geração semanal (manual ou automática) ----------
 
-def _check_admin_secret() -> bool:
-    """True se a requisição traz o ADMIN_SECRET (body ou header X-Admin-Key)."""
-    secret_env = os.getenv("ADMIN_SECRET", "").strip()
-    if not secret_env:
-        return False
+def _secret_matches(given: str, secrets: set[str]) -> bool:
+    """Compara em tempo constante com cada segredo válido (vazios não valem)."""
+    given_b = (given or "").encode("utf-8")
+    return bool(given_b) and any(hmac.compare_digest(given_b, s.encode("utf-8")) for s in secrets if s)
+
+
+def _check_admin_secret(st: Station | None = None) -> bool:
+    """
+    True se a requisição traz o ADMIN_SECRET ou o admin_secret da rádio (body "secret" ou
+    header X-Admin-Key). Nunca pela URL: iria para logs, histórico e Referer.
+    """
+    secrets = {os.getenv("ADMIN_SECRET", "").strip()}
+    if st is not None and st.admin_secret:
+        secrets.add(st.admin_secret)
     data = request.get_json(silent=True) or {}
-    secret = data.get("secret") or request.headers.get("X-Admin-Key") or ""
-    return secret == secret_env
+    return _secret_matches(data.get("secret") or request.headers.get("X-Admin-Key") or "", secrets)
+
+
+def _profile_link_sig(name: str, expires: int) -> str:
+    """Assinatura (HMAC do ADMIN_SECRET) do link de download de um perfil até expires."""
+    secret = os.getenv("ADMIN_SECRET", "").strip().encode("utf-8")
+    return hmac.new(secret, f"profile:{name}:{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _profile_link(name: str) -> str:
+    """Link de download com validade curta (PROFILE_LINK_TTL_SEC), sem o segredo na URL."""
+    expires = int(time.time()) + PROFILE_LINK_TTL_SEC
+    return f"/api/admin/profiles/{quote(name, safe='')}?exp={expires}&sig={_profile_link_sig(name, expires)}"
 
 
 @app.route("/admin")
-def admin_page():
+@app.route("/s/<station>/admin")
+def admin_page(station=None):
     """Só quem acessar com ?key=ADMIN_SECRET vê o botão de gerar. Salve esse link nos favoritos do celular."""
+    st = _station(station)
     key = request.args.get("key", "")
-    if key != os.getenv("ADMIN_SECRET", "").strip():
+    if not _secret_matches(key, {os.getenv("ADMIN_SECRET", "").strip(), st.admin_secret or ""}):
         return "Não encontrado.", 404
-    return render_template("admin.html")
+    return render_template("admin.html", prefix=st.url_prefix, station_name=st.name)
 
 
 @app.route("/api/gerar-semana", methods=["POST"])
-def api_gerar_semana():
+@app.route("/s/<station>/api/gerar-semana", methods=["POST"])
+def api_gerar_semana(station=None):
     """
     Gera o lote semanal (15 blocos). Exige secret (só quem vem da página /admin?key=... envia).
     """
+    st = _station(station)
+    if not _check_admin_secret(st):
+        return jsonify({"ok": False, "error": "Acesso negado."}), 403
+    busy = "Já existe um lote em geração. Atualize o status."
+    if st.batch is not None or st.state.lease_owner(BATCH_LEASE) is not None:
+        return jsonify({"ok": True, "message": busy})
+    message = "Geração da semana iniciada em background. Em alguns minutos os blocos estarão disponíveis. Atualize o status."
+    if not _scheduler_running:
+        # Sem agendador neste processo: o lote roda como trabalho acompanhável em /api/jobs/<id>
+        def work() -> dict:
+            if not _run_weekly_batch(st):
+                return {"message": busy, "blocksReady": st.state.queue_len()}
+            return {"blocksReady": st.state.queue_len()}
+
+        return _submit_job("semana", work, st, message=message)
+    if not _start_weekly_batch(st, BLOCKS_PER_WEEK):
+        return jsonify({"ok": True, "message": busy})
+    scheduler.wake()
+    return jsonify({"ok": True, "message": message})
+
+
+def _submit_job(
+    kind: str,
+    work,
+    st: Station | None,
+    params: dict | None = None,
+    planned: list[str] | None = None,
+    public: bool = False,
+    message: str = "Pedido na fila.",
+):
+    """
+    Enfileira o trabalho e responde na hora (202) com o id e a URL de status. Pedido igual
+    a um que ainda está na fila ou rodando devolve o mesmo id (deduplicated=true).
+    """
+    try:
+        job, created = jobs.submit(
+            kind, work, station=st.slug if st is not None else "", params=params, planned=planned, public=public
+        )
+    except jobs.JobQueueFull as e:
+        return jsonify({"ok": False, "error": str(e)}), 429
+    prefix = st.url_prefix if st is not None else ""
+    return jsonify({
+        "ok": True,
+        "job": job.id,
+        "status": job.status,
+        "deduplicated": not created,
+        "statusUrl": f"{prefix}/api/jobs/{job.id}",
+        "message": message,
+    }), 202
+
+
+@app.route("/api/jobs/<job_id>")
+@app.route("/s/<station>/api/jobs/<job_id>")
+def api_job(job_id, station=None):
+    """
+    Estado de um trabalho: status (queued, running, done, error), etapa atual, tempo de cada
+    etapa e resultado. Exige o segredo (header X-Admin-Key), exceto nos trabalhos das rotas antigas.
+    """
+    st = _station(station)
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Trabalho não encontrado."}), 404
+    if not job.get("public"):
+        if not _check_admin_secret(st):
+            return jsonify({"ok": False, "error": "Acesso negado."}), 403
+        if job.get("station") != st.slug:
+            return jsonify({"ok": False, "error": "Trabalho não encontrado."}), 404
+    return jsonify({"ok": True, **job})
+
+
+@app.route("/api/admin/profiling", methods=["GET", "POST"])
+def api_admin_profiling():
+    """
+    Perfis sob demanda (só ADMIN_SECRET geral). POST {secret, target: block|mixer|all,
+    count, mode: cprofile|sample} arma as próximas count chamadas; GET mostra o que está armado
+    e os perfis gravados (cada um com url de download assinada, válida por PROFILE_LINK_TTL_SEC).
+    """
     if not _check_admin_secret():
         return jsonify({"ok": False, "error": "Acesso negado."}), 403
-    def _run():
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
         try:
-            _run_weekly_batch()
-        except Exception:
-            pass
+            profiling.arm(data.get("target") or "block", data.get("count", 1), data.get("mode") or "cprofile")
+        except (TypeError, ValueError) as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+    profiles = [{**p, "url": _profile_link(p["name"])} for p in profiling.list_profiles()]
+    return jsonify({"ok": True, **profiling.status(), "profiles": profiles})
 
-    t = threading.Thread(target=_run, daemon=True)
-    t.start()
-    return jsonify({
-        "ok": True,
-        "message": "Geração da semana iniciada em background. Em alguns minutos os blocos estarão disponíveis. Atualize o status.",
-    })
+
+@app.route("/api/admin/profiles/<name>")
+def api_admin_profile_download(name):
+    """
+    Baixa um perfil (.prof = pstats; .folded = pilhas colapsadas para flamegraph). Aceita o
+    segredo no header ou o link assinado de /api/admin/profiling (?exp=&sig=, ainda válido).
+    """
+    try:
+        expires = int(request.args.get("exp", "0"))
+    except ValueError:
+        expires = 0
+    signed = (
+        bool(os.getenv("ADMIN_SECRET", "").strip())
+        and expires >= time.time()
+        and hmac.compare_digest(request.args.get("sig", ""), _profile_link_sig(name, expires))
+    )
+    if not signed and not _check_admin_secret():
+        return jsonify({"ok": False, "error": "Acesso negado."}), 403
+    path = profiling.profile_path(name)
+    if path is None:
+        return jsonify({"error": "not found"}), 404
+    return send_file(path, mimetype="application/octet-stream", as_attachment=True)
 
 
 @app.route("/api/gerar-roteiro-louveira", methods=["POST"])
-def api_gerar_roteiro_louveira():
+@app.route("/s/<station>/api/gerar-roteiro-louveira", methods=["POST"])
+@quota.with_priority(quota.ADMIN)
+def api_gerar_roteiro_louveira(station=None):
     """
     Feed (URL colada ou padrão) + scraping do corpo + Gemini → roteiro completo.
     Body opcional: { "feed_url": "https://..." }. Se feed_url vazio/omitido, usa o feed padrão.
+    Responde com o id do trabalho; o roteiro sai em result.script de /api/jobs/<id>.
     """
-    if not _check_admin_secret():
+    st = _station(station)
+    if not _check_admin_secret(st):
         return jsonify({"ok": False, "error": "Acesso negado."}), 403
     data = request.get_json(silent=True) or {}
     feed_url = (data.get("feed_url") or "").strip() or None
-    try:
-        script = run_louveira(feed_url=feed_url)
-        return jsonify({"ok": True, "script": script})
-    except Exception as e:
-        return jsonify({"ok": False, "error": str(e)}), 500
+    return _submit_job(
+        "roteiro-feed",
+        lambda: {"script": run_louveira(feed_url=feed_url)},
+        st,
+        params={"feed_url": feed_url},
+        planned=["feed", "roteiro"],
+        message="Buscando feed e gerando roteiro.",
+    )
 
 
 @app.route("/api/gerar-roteiro-de-fonte", methods=["POST"])
-def api_gerar_roteiro_de_fonte():
+@app.route("/s/<station>/api/gerar-roteiro-de-fonte", methods=["POST"])
+@quota.with_priority(quota.ADMIN)
+def api_gerar_roteiro_de_fonte(station=None):
     """
     Gera roteiro a partir de texto colado (fonte manual). Para portais fechados ou quando
-    o usuário copia o conteúdo do site. Body: { "source_text": "..." }.
+    o usuário copia o conteúdo do site. Body: { "source_text": "..." }. Responde com o id do trabalho.
     """
-    if not _check_admin_secret():
+    st = _station(station)
+    if not _check_admin_secret(st):
         return jsonify({"ok": False, "error": "Acesso negado."}), 403
     data = request.get_json(silent=True) or {}
     source_text = (data.get("source_text") or "").strip()
     if not source_text:
         return jsonify({"ok": False, "error": "Texto da fonte vazio. Cole o conteúdo no campo e tente novamente."}), 400
-    try:
-        script = run_from_pasted_source(source_text)
-        return jsonify({"ok": True, "script": script})
-    except Exception as e:
-        return jsonify({"ok": False, "error": str(e)}), 500
+    return _submit_job(
+        "roteiro-fonte",
+        lambda: {"script": run_from_pasted_source(source_text)},
+        st,
+        params={"source_text": source_text},
+        planned=["roteiro"],
+        message="Gerando roteiro a partir do texto colado.",
+    )
 
 
 @app.route("/api/gerar-audio-boletim", methods=["POST"])
-def api_gerar_audio_boletim():
+@app.route("/s/<station>/api/gerar-audio-boletim", methods=["POST"])
+@quota.with_priority(quota.ADMIN)
+def api_gerar_audio_boletim(station=None):
     """
-    Recebe o roteiro (body.script), gera áudio ElevenLabs, grava em output/blocks/.
+    Recebe o roteiro (body.script), gera áudio ElevenLabs, grava na pasta de blocos da rádio.
     Adiciona 1 boletim à rádio (não gera os 15 blocos da semana).
     - substituir_fila=true: esvazia a fila e deixa só este boletim (o que toca na rádio passa a ser só este até gerar mais).
     - substituir_fila=false ou omitido: coloca este boletim no INÍCIO da fila (toca na próxima vez que for vez de notícia).
+    Responde com o id do trabalho; o bloco gravado sai em result.block de /api/jobs/<id>.
     """
-    if not _check_admin_secret():
+    st = _station(station)
+    if not _check_admin_secret(st):
         return jsonify({"ok": False, "error": "Acesso negado."}), 403
     data = request.get_json(silent=True) or {}
     script = (data.get("script") or "").strip()
     if not script:
         return jsonify({"ok": False, "error": "Roteiro vazio. Gere o roteiro antes ou cole o texto."}), 400
     substituir_fila = data.get("substituir_fila") is True
-    try:
-        closing = _get_next_closing()
-        full_script = script + " [pausa] " + closing
-        voice_run(full_script)
-        if not NEWS_FILE.is_file():
-            return jsonify({"ok": False, "error": "Áudio não foi gerado."}), 500
-        BLOCKS_DIR.mkdir(parents=True, exist_ok=True)
-        name = f"block_{_next_block_id():06d}.mp3"
-        dest = BLOCKS_DIR / name
-        if NEWS_BED_PATH.is_file():
-            mix_voice_with_bed(NEWS_FILE, NEWS_BED_PATH, dest)
-        else:
-            normalize_audio(NEWS_FILE, dest)
-        with _lock:
-            if substituir_fila:
-                ready_blocks.clear()
-            ready_blocks.insert(0, name)
+
+    def work() -> dict:
+        name = _produce_block(st, script, "boletim")
+        if name is None:
+            raise RuntimeError("Áudio não foi gerado.")
+        st.state.queue_push_front(name, clear=substituir_fila)
+        _refresh_plan_soon(st)
         msg = "Boletim gravado. Fila substituída: só este boletim toca na rádio até você gerar mais." if substituir_fila else "Boletim gravado e colocado no início da fila. Tocará na próxima vez que for vez de notícia."
-        return jsonify({
-            "ok": True,
-            "message": msg,
-            "block": name,
-        })
-    except Exception as e:
-        return jsonify({"ok": False, "error": str(e)}), 500
+        return {"message": msg, "block": name}
+
+    return _submit_job(
+        "boletim",
+        work,
+        st,
+        params={"script": script, "substituir_fila": substituir_fila},
+        planned=["voz", "mix"],
+        message="Gravando áudio e colocando na programação.",
+    )
 
 
 # ---------- Rotas da programação contínua ----------
 
 @app.route("/")
-def index():
-    return render_template("index.html")
+@app.route("/s/<station>/")
+def index(station=None):
+    st = _station(station)
+    return render_template("index.html", prefix=st.url_prefix, station_name=st.name)
+
+
+@app.route("/api/stations")
+def api_stations():
+    """Lista as rádios hospedadas neste processo."""
+    return jsonify({
+        "stations": [
+            {"slug": st.slug, "name": st.name, "url": st.url_prefix + "/", "blocksReady": st.state.queue_len()}
+            for st in STATIONS.values()
+        ],
+    })
 
 
 @app.route("/api/status")
-def api_status():
+@app.route("/s/<station>/api/status")
+def api_status(station=None):
     """Retorna se há blocos prontos (blocos da semana, gerados toda segunda)."""
-    with _lock:
-        n = len(ready_blocks)
+    st = _station(station)
+    names = st.state.queue_list()
+    n = len(names)
+    plan = playout_plan.load_plan(st.plan_file)
     return jsonify({
         "blocksReady": n,
         "canPlay": n > 0,
+        "queuedSeconds": round(block_manifest.total_duration_ms(_block_rows(st), names) / 1000, 1),
+        "producer": st.producer.stats(),
+        "stories": st.stories.stats(),
+        "feeds": feeds.aggregator.sources_status(st.feeds),
+        "renditions": renditions.stats(),
+        "byteCache": byte_cache.cache.stats(),
+        "loudness": loudness_stats(),
+        "plan": plan.stats(st.state.cycle_position()) if plan is not None else None,
+        "library": st.library.stats(),
+        "scripts": script_stats(),
+        "tts": tts_cache.cache.stats(),
+        "quota": quota.governor.stats(),
+        "jobs": jobs.runner.stats(),
     })
 
 
+def _requested_rendition() -> str | None:
+    """
+    Variante pedida pelo ouvinte: ?quality=low (o player mede a conexão) ou cabeçalho
+    Save-Data: on. Em "low", Opus se o navegador tocar (?opus=1), senão MP3 de bitrate baixo.
+    ?quality=high força o original. None = original.
+    """
+    quality = (request.args.get("quality") or "").strip().lower()
+    if quality == "high":
+        return None
+    if quality != "low" and request.headers.get("Save-Data", "").strip().lower() != "on":
+        return None
+    return "opus" if request.args.get("opus") == "1" else "mp3_low"
+
+
+def _with_rendition(item: dict, source: Path, rendition: str | None) -> dict:
+    """Aponta a URL para a variante se já estiver pronta; senão serve o original e agenda o encode."""
+    if renditions.get_or_schedule(source, rendition) is not None:
+        item["url"] += f"?r={rendition}"
+        item["rendition"] = rendition
+    return item
+
+
+def _news_item(st: Station, block_name: str, rendition: str | None = None) -> dict:
+    """Resposta de /api/next para um bloco de notícia (duração vem do manifest)."""
+    row = _block_rows(st).get(block_name) or {}
+    item = {
+        "ready": True,
+        "url": f"{st.url_prefix}/audio/block/{block_name}",
+        "type": "news",
+        "title": "Notícias IA",
+    }
+    if row.get("duration_ms"):
+        item["duration"] = round(row["duration_ms"] / 1000, 1)
+    return _with_rendition(item, st.blocks_dir / block_name, rendition)
+
+
+def _music_item(st: Station, track: Path, rendition: str | None = None) -> dict:
+    """
+    Resposta de /api/next para uma música. Se a faixa já foi analisada, inclui a duração e o
+    ganho (gainDb) que o player aplica para a música ficar no nível dos blocos (FINAL_LUFS).
+    """
+    item = {
+        "ready": True,
+        "url": f"{st.url_prefix}/audio/music/" + quote(track.name, safe=""),
+        "type": "music",
+        "title": _music_title(track),
+    }
+    byte_cache.cache.note_play(track)
+    info = st.library.get(track)
+    if info is not None:
+        item["duration"] = info["duration_sec"]
+        if info.get("lufs") is not None:
+            item["gainDb"] = info["gain_db"]
+    return _with_rendition(item, track, rendition)
+
+
 def _music_title(track_path: Path) -> str:
     """Nome da faixa para exibição (sem .mp3, limpo)."""
     name = track_path.stem
@@ -352,93 +960,200 @@ def _music_title(track_path: Path) -> str:
 
 
 @app.route("/api/next")
-def api_next():
+@app.route("/s/<station>/api/next")
+def api_next(station=None):
     """
     Próximo item: notícia ou música. Query: mode=music_only para só músicas.
-    Ciclo normal: notícia → música → música → notícia → ...
+    Ciclo normal: notícia → música → música → notícia → ..., na ordem do plano da semana
+    (core/playout_plan.py: posição do ciclo → item, sem sorteio na hora); sem plano, sorteio.
+    Conexão fraca: quality=low (e opus=1) ou Save-Data: on → URL da versão leve, se pronta.
     """
-    global _cycle_index
+    st = _station(station)
+    _prewarm_soon(st)
     music_only = request.args.get("mode") == "music_only"
-    with _lock:
-        if music_only:
-            track = get_next_track()
-            if track is None:
-                return jsonify({"ready": False, "message": "Nenhuma música disponível."}), 503
-            return jsonify({
-                "ready": True,
-                "url": "/audio/music/" + quote(track.name, safe=""),
-                "type": "music",
-                "title": _music_title(track),
-            })
-        if _cycle_index % 3 == 0:
-            if not ready_blocks:
-                return jsonify({"ready": False, "message": "Preparando primeiro bloco..."}), 503
-            block_name = ready_blocks.pop(0)
-            _cycle_index += 1
-            return jsonify({
-                "ready": True,
-                "url": f"/audio/block/{block_name}",
-                "type": "news",
-                "title": "Notícias IA",
-            })
-        track = get_next_track()
-        _cycle_index += 1
+    rendition = _requested_rendition()
+    if music_only:
+        track = _next_track(st)
         if track is None:
-            if ready_blocks:
-                block_name = ready_blocks.pop(0)
-                return jsonify({
-                    "ready": True,
-                    "url": f"/audio/block/{block_name}",
-                    "type": "news",
-                    "title": "Notícias IA",
-                })
-            return jsonify({"ready": False, "message": "Nenhuma música e nenhum bloco disponível."}), 503
-        return jsonify({
-            "ready": True,
-            "url": "/audio/music/" + quote(track.name, safe=""),
-            "type": "music",
-            "title": _music_title(track),
-        })
+            return jsonify({"ready": False, "message": "Nenhuma música disponível."}), 503
+        return jsonify(_music_item(st, track, rendition))
+    plan = playout_plan.load_plan(st.plan_file)
+    kind, block_name, position = st.state.take_planned_slot(plan.kind_at if plan is not None else None, CYCLE_LEN)
+    if plan is None or plan.week != playout_plan.week_id() or not plan.covers(position + PLAN_MIN_AHEAD):
+        _refresh_plan_soon(st)
+    if kind == "empty":
+        st.producer.wake()
+        return jsonify({"ready": False, "message": "Preparando primeiro bloco..."}), 503
+    if kind == "news":
+        st.producer.wake()
+        return jsonify(_news_item(st, block_name, rendition))
+    track = _planned_track(st, plan, position) or _next_track(st)
+    if track is None:
+        block_name = st.state.queue_pop_front()
+        if block_name:
+            st.producer.wake()
+            return jsonify(_news_item(st, block_name, rendition))
+        return jsonify({"ready": False, "message": "Nenhuma música e nenhum bloco disponível."}), 503
+    return jsonify(_music_item(st, track, rendition))
+
+
+@app.route("/api/plan")
+@app.route("/s/<station>/api/plan")
+def api_plan(station=None):
+    """
+    Próximas posições do plano da semana, a partir da atual: o mesmo que /api/next vai
+    entregar, para pré-carregar no player e empacotar na CDN. Query: n (padrão 10, máx. 200).
+    inSec = início estimado a partir de agora; notícia sem url = bloco ainda não produzido.
+    """
+    st = _station(station)
+    plan = playout_plan.load_plan(st.plan_file)
+    if plan is None:
+        _refresh_plan_soon(st)
+        return jsonify({"ready": False, "message": "Plano ainda não calculado."}), 503
+    try:
+        n = int(request.args.get("n", PLAN_API_DEFAULT))
+    except ValueError:
+        n = PLAN_API_DEFAULT
+    position = st.state.cycle_position()
+    slots = plan.upcoming(position, max(1, min(PLAN_API_MAX, n)))
+    base = slots[0].start_sec if slots else 0
+    items = []
+    for slot in slots:
+        item = {"position": slot.position, "type": slot.kind, "inSec": slot.start_sec - base}
+        if slot.name and slot.kind == "news":
+            item["url"] = f"{st.url_prefix}/audio/block/{slot.name}"
+        elif slot.name:
+            track = Path(slot.name)
+            item["url"] = f"{st.url_prefix}/audio/music/" + quote(track.name, safe="")
+            item["title"] = _music_title(track)
+        items.append(item)
+    return jsonify({"ready": True, "plan": plan.stats(position), "items": items})
+
+
+def _send_audio(path: Path, mimetype: str, etag: str | None = None, max_age: int | None = None):
+    """
+    Serve um arquivo de áudio do cache de bytes (core/byte_cache.py), com ETag,
+    Last-Modified, 304 e Range (206 com fatia do buffer em memória). Arquivo grande demais
+    para o cache vai pelo send_file, como antes.
+    """
+    try:
+        entry = byte_cache.cache.get(path)
+    except OSError:
+        return jsonify({"error": "not found"}), 404
+    if entry is None:
+        return send_file(path, mimetype=mimetype, as_attachment=False, etag=etag or True, max_age=max_age)
+    tag = etag or entry.etag
+    modified = datetime.fromtimestamp(entry.mtime, timezone.utc)
+    resp = Response(mimetype=mimetype, direct_passthrough=True)
+    resp.set_etag(tag)
+    resp.last_modified = modified
+    resp.accept_ranges = "bytes"
+    if max_age is not None:
+        resp.cache_control.public = True
+        resp.cache_control.max_age = max_age
+    else:
+        resp.cache_control.no_cache = True
+    if not is_resource_modified(request.environ, etag=tag, last_modified=modified):
+        resp.status_code = 304
+        return resp
+    body = [entry.data]
+    size = entry.size
+    # If-Range com outra versão do arquivo: ignora o Range e manda o arquivo inteiro
+    if request.range is not None and (
+        "HTTP_IF_RANGE" not in request.environ
+        or not is_resource_modified(request.environ, etag=tag, last_modified=modified, ignore_if_range=False)
+    ):
+        bounds = request.range.range_for_length(entry.size)
+        if bounds is None:
+            resp.status_code = 416
+            resp.headers["Content-Range"] = f"bytes */{entry.size}"
+            return resp
+        start, stop = bounds
+        resp.status_code = 206
+        resp.content_range = ContentRange("bytes", start, stop, entry.size)
+        body = byte_cache.iter_chunks(entry.view[start:stop])
+        size = stop - start
+    resp.response = body
+    resp.content_length = size
+    return resp
+
+
+_prewarmed_at: dict[str, float] = {}
+
+
+def _prewarm_soon(st: Station) -> None:
+    """
+    Pré-aquece o cache de bytes (próximos blocos da fila e próximas músicas do plano; sem
+    plano, as mais tocadas da rádio) em segundo plano, no máximo a cada PREWARM_EVERY_SEC por rádio.
+    """
+    now = time.monotonic()
+    if now - _prewarmed_at.get(st.slug, float("-inf")) < PREWARM_EVERY_SEC:
+        return
+    _prewarmed_at[st.slug] = now
+    paths = [st.blocks_dir / name for name in st.state.queue_list()[:PREWARM_BLOCKS]]
+    plan = playout_plan.load_plan(st.plan_file)
+    upcoming = plan.upcoming(st.state.cycle_position(), PREWARM_TRACKS * CYCLE_LEN) if plan is not None else []
+    tracks = [Path(slot.name) for slot in upcoming if slot.kind == "music" and slot.name]
+    paths += tracks[:PREWARM_TRACKS] or byte_cache.cache.most_played(PREWARM_TRACKS, under=st.music_dir)
+    threading.Thread(target=byte_cache.cache.prewarm, args=(paths,), daemon=True).start()
 
 
 @app.route("/audio/block/<filename>")
-def audio_block(filename):
+@app.route("/s/<station>/audio/block/<filename>")
+def audio_block(filename, station=None):
     """Serve um bloco de notícia."""
+    st = _station(station)
     if not _safe_block_filename(filename):
         return jsonify({"error": "invalid"}), 404
-    path = BLOCKS_DIR / filename
+    path = st.blocks_dir / filename
     if not path.is_file():
         return jsonify({"error": "not found"}), 404
-    return send_file(path, mimetype="audio/mpeg", as_attachment=False)
+    rendition = request.args.get("r")
+    variant = renditions.lookup(path, rendition) if rendition else None
+    if variant is not None:
+        return _send_audio(variant, renditions.mimetype(rendition), max_age=BLOCK_CACHE_MAX_AGE_SEC)
+    row = _block_rows(st).get(filename) or {}
+    return _send_audio(path, "audio/mpeg", etag=row.get("sha256"), max_age=BLOCK_CACHE_MAX_AGE_SEC)
 
 
 @app.route("/audio/music/<filename>")
-def audio_music(filename):
-    """Serve uma música: primeiro assets/musicas, depois raiz do projeto."""
+@app.route("/s/<station>/audio/music/<filename>")
+def audio_music(filename, station=None):
+    """Serve uma música: primeiro a pasta de músicas da rádio, depois raiz do projeto."""
+    st = _station(station)
     if not _safe_music_filename(filename):
         return jsonify({"error": "invalid"}), 404
-    path = MUSICAS_DIR / filename
+    path = st.music_dir / filename
     if not path.is_file():
         path = BASE_DIR / filename
     if not path.is_file():
         return jsonify({"error": "not found"}), 404
-    return send_file(path, mimetype="audio/mpeg", as_attachment=False)
+    rendition = request.args.get("r")
+    variant = renditions.lookup(path, rendition) if rendition else None
+    if variant is not None:
+        return _send_audio(variant, renditions.mimetype(rendition))
+    return _send_audio(path, "audio/mpeg")
 
 
 # ---------- Chat (humanos compartilhado; IA só quando solicitar) ----------
 
-CHAT_MESSAGES: list[dict] = []
 CHAT_MAX = 100
 
 CHAT_AI_SYSTEM = """Você é a locutora da Rádio IAE News: jovem, descolada e antenada. Alguém pediu sua opinião no chat. Responda em 1 ou 2 frases curtas, tom amigável. Se perguntarem sobre a rádio ou IA, pode mencionar que a rádio é feita com IA pela IAExpertise."""
 
 
 @app.route("/api/chat/messages")
-def api_chat_messages():
-    """Lista as últimas mensagens do chat (compartilhado entre ouvintes)."""
-    with _lock:
-        last = CHAT_MESSAGES[-50:] if len(CHAT_MESSAGES) > 50 else CHAT_MESSAGES
-    return jsonify({"messages": last})
+@app.route("/s/<station>/api/chat/messages")
+def api_chat_messages(station=None):
+    """
+    Lista as últimas mensagens do chat (compartilhado entre ouvintes da rádio).
+    Query opcional after=<id>: só mensagens novas depois desse cursor.
+    """
+    st = _station(station)
+    after = request.args.get("after", 0, type=int) or 0
+    last = st.state.chat_messages(after=after, limit=50)
+    cursor = last[-1]["id"] if last else after
+    return jsonify({"messages": last, "cursor": cursor})
 
 
 def _chat_moderation(text: str) -> bool:
@@ -457,8 +1172,10 @@ def _chat_moderation(text: str) -> bool:
 
 
 @app.route("/api/chat/send", methods=["POST"])
-def api_chat_send():
+@app.route("/s/<station>/api/chat/send", methods=["POST"])
+def api_chat_send(station=None):
     """Envia mensagem para o chat (entre humanos). Moderação: bloqueia xingamentos."""
+    st = _station(station)
     try:
         data = request.get_json() or {}
         msg = (data.get("message") or "").strip()
@@ -469,18 +1186,17 @@ def api_chat_send():
             return jsonify({"ok": False, "error": "Mensagem contém termos inadequados. Seja respeitoso."}), 400
         if len(msg) > 300:
             msg = msg[:300]
-        with _lock:
-            CHAT_MESSAGES.append({"user": user or "Ouvinte", "text": msg, "kind": "human"})
-            if len(CHAT_MESSAGES) > CHAT_MAX:
-                CHAT_MESSAGES.pop(0)
+        st.state.chat_append(user or "Ouvinte", msg, "human", CHAT_MAX)
         return jsonify({"ok": True})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
 @app.route("/api/chat/ask-ai", methods=["POST"])
-def api_chat_ask_ai():
+@app.route("/s/<station>/api/chat/ask-ai", methods=["POST"])
+def api_chat_ask_ai(station=None):
     """Pergunta à IA (locutora) quando o usuário solicita. Resposta aparece no chat."""
+    st = _station(station)
     try:
         data = request.get_json() or {}
         msg = (data.get("message") or "").strip()
@@ -489,14 +1205,19 @@ def api_chat_ask_ai():
         key = os.getenv("GEMINI_API_KEY")
         if not key:
             return jsonify({"ok": False, "error": "GEMINI_API_KEY não configurada"}), 500
+        import google.generativeai as genai
+
         genai.configure(api_key=key)
         model = genai.GenerativeModel("gemini-2.5-flash", system_instruction=CHAT_AI_SYSTEM)
-        response = model.generate_content(msg, generation_config={"temperature": 0.8, "max_output_tokens": 150})
+        with quota.priority(quota.CHAT):
+            response = quota.call(
+                "gemini",
+                model.generate_content,
+                msg,
+                generation_config={"temperature": 0.8, "max_output_tokens": 150},
+            )
         reply = (response.text or "").strip()
-        with _lock:
-            CHAT_MESSAGES.append({"user": "IA", "text": reply, "kind": "ai"})
-            if len(CHAT_MESSAGES) > CHAT_MAX:
-                CHAT_MESSAGES.pop(0)
+        st.state.chat_append("IA", reply, "ai", CHAT_MAX)
         return jsonify({"ok": True, "reply": reply})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -512,31 +1233,50 @@ def audio_news():
 
 
 @app.route("/api/gerar", methods=["POST"])
+@quota.with_priority(quota.ADMIN)
 def api_gerar():
-    try:
-        script = news_run()
-        voice_run(script)
-        return jsonify({"ok": True, "message": "Boletim gerado."})
-    except Exception as e:
-        return jsonify({"ok": False, "error": str(e)}), 500
+    def work() -> dict:
+        script = news_run(sources=DEFAULT_STATION.feeds)
+        voice_path = DEFAULT_STATION.new_voice_file()
+        try:
+            with jobs.stage("voz"):
+                voice_run(script, output_path=voice_path)
+            os.replace(voice_path, NEWS_FILE)
+        finally:
+            voice_path.unlink(missing_ok=True)
+        return {"message": "Boletim gerado."}
+
+    return _submit_job("gerar", work, None, planned=["noticias", "roteiro", "voz"], public=True)
 
 
 @app.route("/api/gerar-duck", methods=["POST"])
+@quota.with_priority(quota.ADMIN)
 def api_gerar_duck():
-    from core.mixer import create_ducked_mix
-    try:
-        script = news_run()
-        voice_run(script)
-        if not NEWS_FILE.is_file():
-            return jsonify({"ok": False, "error": "Áudio não gerado"}), 500
-        track = get_next_track()
-        if track is None:
-            return jsonify({"ok": True, "message": "Boletim gerado (sem músicas)."})
-        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-        create_ducked_mix(track, NEWS_FILE, DUCKED_FILE)
-        return jsonify({"ok": True, "message": "Boletim e mix com ducking gerados."})
-    except Exception as e:
-        return jsonify({"ok": False, "error": str(e)}), 500
+    def work() -> dict:
+        from core.mixer import create_ducked_mix
+
+        script = news_run(sources=DEFAULT_STATION.feeds)
+        voice_path = DEFAULT_STATION.new_voice_file()
+        mix_path = voice_path.with_name(voice_path.stem + "_mix.mp3")
+        try:
+            with jobs.stage("voz"):
+                voice_run(script, output_path=voice_path)
+            if not voice_path.is_file():
+                raise RuntimeError("Áudio não gerado")
+            track = _next_track(DEFAULT_STATION)
+            if track is None:
+                os.replace(voice_path, NEWS_FILE)
+                return {"message": "Boletim gerado (sem músicas)."}
+            with jobs.stage("mix"):
+                create_ducked_mix(track, voice_path, mix_path)
+            os.replace(voice_path, NEWS_FILE)
+            os.replace(mix_path, DUCKED_FILE)
+        finally:
+            voice_path.unlink(missing_ok=True)
+            mix_path.unlink(missing_ok=True)
+        return {"message": "Boletim e mix com ducking gerados."}
+
+    return _submit_job("gerar-duck", work, None, planned=["noticias", "roteiro", "voz", "mix"], public=True)
 
 
 @app.route("/audio/ducked")
@@ -547,10 +1287,26 @@ def audio_ducked():
 
 
 def main():
-    BLOCKS_DIR.mkdir(parents=True, exist_ok=True)
-    _load_blocks_from_disk()
-    t = threading.Thread(target=_weekly_generator_thread, daemon=True)
-    t.start()
+    """
+    python app.py              → servidor web + gerador semanal (um processo).
+    python app.py --generator  → só o gerador (web em outro processo, ex.: gunicorn -w 4 app:app
+                                  com RADIO_STATE_BACKEND=sqlite).
+    RADIO_GENERATOR=0 desliga o gerador dentro do processo web.
+    """
+    for st in STATIONS.values():
+        st.blocks_dir.mkdir(parents=True, exist_ok=True)
+        _load_blocks_from_disk(st)
+    # Análise incremental das músicas (só faixas novas/alteradas), em segundo plano
+    for lib in {id(st.library): st.library for st in STATIONS.values()}.values():
+        lib.build_in_background()
+    if "--generator" in sys.argv[1:]:
+        _weekly_generator_thread()
+        return
+    if os.getenv("RADIO_GENERATOR", "1").strip() != "0":
+        t = threading.Thread(target=_weekly_generator_thread, daemon=True)
+        t.start()
+    for st in STATIONS.values():
+        _prewarm_soon(st)
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=False, threaded=True)
 
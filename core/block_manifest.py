@@ -0,0 +1,193 @@
+"""
+Block Manifest - Rádio IA
+Índice dos blocos gravados em output/blocks/manifest.json: uma linha por bloco com duração,
+loudness (LUFS), tamanho, hash do conteúdo, roteiro de origem e horário de geração.
+Escrita atômica (arquivo temporário + os.replace); leitura com cache pelo mtime do arquivo,
+assim o servidor web enxerga blocos gravados por um gerador em outro processo.
+Leitura-modificação-escrita sob locked(): lock entre threads e entre processos (flock em
+.manifest.lock), pois o servidor web (boletins do admin, lote sem agendador) e o gerador
+escrevem no mesmo manifest.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: só o lock entre threads
+    fcntl = None
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+# Arquivo de lock do manifest (flock), na mesma pasta
+LOCK_NAME = ".manifest.lock"
+
+_lock = threading.Lock()
+# Lock por pasta entre threads (reentrante) + arquivo de lock aberto pela thread que o segura
+_dir_locks: dict[str, threading.RLock] = {}
+_held = threading.local()
+# Cache por diretório: ((mtime_ns, tamanho) do manifest, linhas por nome)
+_cache: dict[str, tuple[tuple[int, int], dict[str, dict]]] = {}
+
+
+def _manifest_path(blocks_dir: Path) -> Path:
+    return Path(blocks_dir) / MANIFEST_NAME
+
+
+def file_sha256(path: Path) -> str:
+    """Hash SHA-256 do arquivo (lido em pedaços)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def build_row(
+    path: Path,
+    duration_ms: int | None = None,
+    lufs: float | None = None,
+    script: str | None = None,
+    source: str | None = None,
+) -> dict:
+    """Monta a linha do manifest para um bloco recém-gravado."""
+    path = Path(path)
+    return {
+        "name": path.name,
+        "duration_ms": int(duration_ms) if duration_ms is not None else None,
+        "lufs": round(lufs, 2) if lufs is not None else None,
+        "size": path.stat().st_size,
+        "sha256": file_sha256(path),
+        "source": source,
+        "script": script,
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+
+
+def _block_number(name: str) -> int:
+    m = re.match(r"^block_(\d+)\.mp3$", name)
+    return int(m.group(1)) if m else -1
+
+
+def load_manifest(blocks_dir: Path) -> dict[str, dict] | None:
+    """
+    Linhas do manifest por nome do bloco, em ordem de número do bloco.
+    Retorna None se o manifest não existir. Relê o arquivo só se o mtime mudou.
+    """
+    path = _manifest_path(blocks_dir)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    key = str(path)
+    mtime = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    rows = sorted(data.get("blocks") or [], key=lambda r: _block_number(r.get("name", "")))
+    by_name = {r["name"]: r for r in rows if r.get("name")}
+    with _lock:
+        _cache[key] = (mtime, by_name)
+    return by_name
+
+
+def write_manifest(blocks_dir: Path, rows: list[dict]) -> None:
+    """Grava o manifest inteiro de forma atômica (quem leu antes de gravar deve estar em locked())."""
+    blocks_dir = Path(blocks_dir)
+    blocks_dir.mkdir(parents=True, exist_ok=True)
+    path = _manifest_path(blocks_dir)
+    tmp = path.with_name(f".{MANIFEST_NAME}.{os.getpid()}.{threading.get_ident()}.tmp")
+    rows = sorted(rows, key=lambda r: _block_number(r.get("name", "")))
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "blocks": rows}, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+@contextmanager
+def locked(blocks_dir: Path):
+    """
+    Seção exclusiva sobre o manifest de blocks_dir, entre threads e processos. Reentrante na
+    mesma thread (a troca de lote chama add_block/write_manifest com o lock já pego).
+    """
+    blocks_dir = Path(blocks_dir)
+    key = str(blocks_dir.resolve())
+    with _lock:
+        rlock = _dir_locks.setdefault(key, threading.RLock())
+    with rlock:
+        depth = getattr(_held, "depth", None)
+        if depth is None:
+            depth = _held.depth = {}
+        if depth.get(key):
+            depth[key] += 1
+            try:
+                yield
+            finally:
+                depth[key] -= 1
+            return
+        blocks_dir.mkdir(parents=True, exist_ok=True)
+        f = open(blocks_dir / LOCK_NAME, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            depth[key] = 1
+            try:
+                yield
+            finally:
+                depth[key] = 0
+        finally:
+            # Fechar o arquivo libera o flock
+            f.close()
+
+
+def add_block(blocks_dir: Path, row: dict) -> None:
+    """Acrescenta (ou substitui) a linha de um bloco no manifest."""
+    with locked(blocks_dir):
+        rows = dict(load_manifest(blocks_dir) or {})
+        rows[row["name"]] = row
+        write_manifest(blocks_dir, list(rows.values()))
+
+
+def remove_blocks(blocks_dir: Path, names: set[str] | list[str]) -> None:
+    """Remove as linhas dos blocos informados."""
+    names = set(names)
+    with locked(blocks_dir):
+        rows = load_manifest(blocks_dir) or {}
+        write_manifest(blocks_dir, [r for n, r in rows.items() if n not in names])
+
+
+def rebuild_from_files(blocks_dir: Path, pattern: str = "block_*.mp3") -> dict[str, dict]:
+    """
+    Cria o manifest a partir dos arquivos já existentes (migração de instalações antigas).
+    Só tamanho e hash: duração e LUFS ficam None (não decodifica áudio).
+    """
+    blocks_dir = Path(blocks_dir)
+    rows = [build_row(p) for p in sorted(blocks_dir.glob(pattern)) if _block_number(p.name) >= 0]
+    for r in rows:
+        r["created_at"] = None
+    with locked(blocks_dir):
+        write_manifest(blocks_dir, rows)
+    return load_manifest(blocks_dir) or {}
+
+
+def total_duration_ms(rows: dict[str, dict], names: list[str]) -> int:
+    """Soma das durações conhecidas dos blocos informados (ms)."""
+    total = 0
+    for n in names:
+        d = (rows.get(n) or {}).get("duration_ms")
+        if d:
+            total += d
+    return total
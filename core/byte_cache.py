@@ -0,0 +1,164 @@
+"""
+Byte Cache - Rádio IA
+Cache em memória dos arquivos de áudio servidos (blocos, músicas, versões leves): no pico,
+centenas de ouvintes baixam o mesmo bloco em poucos segundos e cada pedido voltava ao disco.
+- LRU limitado em bytes (BYTE_CACHE_MB); arquivo maior que MAX_FILE_MB não entra.
+- Chave = caminho + mtime + tamanho: arquivo trocado no disco vira entrada nova.
+- Vários pedidos do mesmo arquivo ainda não carregado: só um lê o disco, os outros esperam.
+- Pedidos com Range recebem fatias (memoryview) do mesmo buffer, sem copiar o arquivo.
+- Pré-aquecimento: blocos da fila e músicas mais tocadas (contagem do processo).
+"""
+
+import os
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+# Tamanho total do cache (MB); 0 desliga
+BYTE_CACHE_MB = int(os.getenv("BYTE_CACHE_MB", "128"))
+# Arquivos maiores que isso são servidos direto do disco
+MAX_FILE_MB = 16
+# Pedaço entregue ao servidor WSGI por vez (o gunicorn exige bytes, não memoryview)
+CHUNK_BYTES = 256 * 1024
+
+
+@dataclass(frozen=True)
+class CachedFile:
+    """Conteúdo de um arquivo em memória + metadados para ETag/Last-Modified."""
+
+    data: bytes
+    mtime: float
+    size: int
+    etag: str
+
+    @property
+    def view(self) -> memoryview:
+        return memoryview(self.data)
+
+
+def iter_chunks(view: memoryview, chunk: int = CHUNK_BYTES):
+    """Corpo da resposta em pedaços de até chunk bytes (cópia só do pedaço da vez)."""
+    for start in range(0, len(view), chunk):
+        yield bytes(view[start:start + chunk])
+
+
+class ByteCache:
+    def __init__(self, max_bytes: int = BYTE_CACHE_MB * 1024 * 1024, max_file_bytes: int = MAX_FILE_MB * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, CachedFile] = OrderedDict()
+        # Caminho -> chave atual (versão antiga do arquivo sai quando a nova entra)
+        self._keys: dict[str, tuple] = {}
+        # Leituras em andamento: chave -> evento (os outros pedidos esperam por ele)
+        self._loading: dict[tuple, threading.Event] = {}
+        self._bytes = 0
+        self._plays: Counter = Counter()
+        self.hits = self.misses = self.loads = self.evictions = self.oversize = 0
+
+    def get(self, path: Path) -> CachedFile | None:
+        """
+        Conteúdo do arquivo (da memória ou lido agora). None = não cabe no cache (ou cache
+        desligado): sirva do disco. Levanta OSError se o arquivo não existir.
+        """
+        st = os.stat(path)
+        if st.st_size > self.max_file_bytes:
+            with self._lock:
+                self.oversize += 1
+            return None
+        key = (str(path), st.st_mtime_ns, st.st_size)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                waiting = self._loading.get(key)
+                if waiting is None:
+                    self.misses += 1
+                    event = self._loading[key] = threading.Event()
+                    break
+            # Outro pedido está lendo o mesmo arquivo: espera e tenta de novo
+            waiting.wait()
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            entry = CachedFile(data=data, mtime=st.st_mtime, size=len(data), etag=f"{st.st_mtime_ns:x}-{len(data):x}")
+            if len(data) == st.st_size:
+                self._put(key, entry)
+            return entry
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            event.set()
+
+    def _put(self, key: tuple, entry: CachedFile) -> None:
+        with self._lock:
+            self.loads += 1
+            old = self._keys.get(key[0])
+            if old is not None and old in self._entries:
+                self._bytes -= self._entries.pop(old).size
+            self._entries[key] = entry
+            self._keys[key[0]] = key
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and self._entries:
+                old_key, old_entry = self._entries.popitem(last=False)
+                self._bytes -= old_entry.size
+                if self._keys.get(old_key[0]) == old_key:
+                    del self._keys[old_key[0]]
+                self.evictions += 1
+
+    def contains(self, path: Path) -> bool:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        with self._lock:
+            return (str(path), st.st_mtime_ns, st.st_size) in self._entries
+
+    def prewarm(self, paths: list[Path]) -> int:
+        """Carrega os arquivos que ainda não estão no cache. Retorna quantos foram lidos."""
+        loaded = 0
+        for path in paths:
+            if self.max_bytes <= 0 or self.contains(path):
+                continue
+            try:
+                if self.get(path) is not None:
+                    loaded += 1
+            except OSError:
+                pass
+        return loaded
+
+    def note_play(self, path: Path) -> None:
+        """Conta uma execução (música escolhida para um ouvinte); base de most_played."""
+        with self._lock:
+            self._plays[str(path)] += 1
+
+    def most_played(self, n: int, under: Path | None = None) -> list[Path]:
+        """As n faixas mais tocadas neste processo (opcionalmente só de uma pasta)."""
+        with self._lock:
+            ranked = [p for p, _ in self._plays.most_common()]
+        if under is not None:
+            prefix = str(under) + os.sep
+            ranked = [p for p in ranked if p.startswith(prefix)]
+        return [Path(p) for p in ranked[:n]]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 3) if lookups else None,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "oversize": self.oversize,
+            }
+
+
+cache = ByteCache()
@@ -0,0 +1,314 @@
+"""
+Feeds - Rádio IA
+Agregador de várias fontes de notícias por rádio: busca uma lista de feeds (RSS, Atom ou JSON
+Feed) em paralelo, cada um com seu limite de tempo e uma sessão HTTP compartilhada (conexões
+reaproveitadas entre rodadas). As entradas viram um só formato ({'title', 'summary', 'link',
+'published', 'source', 'weight', 'score'}), são juntadas, deduplicadas pelo título
+normalizado e ordenadas por recência x peso da fonte. O conjunto inteiro respeita um prazo
+(FEEDS_DEADLINE_SEC), não importa quantos feeds estejam configurados: feed que não respondeu
+a tempo entra com as entradas da última busca boa (ou fica de fora).
+
+Configuração: "feeds" no stations.json (lista de URLs ou de objetos
+{"url", "name", "weight", "timeout"}) ou NEWS_FEEDS no .env para a rádio padrão
+("url|peso,url|peso").
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from calendar import timegm
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+from urllib.parse import urlparse
+
+from core.story_index import normalize_title
+
+# requests e feedparser são importados dentro das funções que os usam (servidor web leve).
+
+# Buscas simultâneas (todas as rádios compartilham o pool)
+FEED_WORKERS = int(os.getenv("FEED_WORKERS", "8"))
+# Limite de tempo de cada feed (conexão + download), em segundos
+FEED_TIMEOUT_SEC = float(os.getenv("FEED_TIMEOUT_SEC", "6"))
+# Prazo da rodada inteira; feeds atrasados entram com a última busca boa
+FEEDS_DEADLINE_SEC = float(os.getenv("FEEDS_DEADLINE_SEC", "10"))
+# Tamanho máximo de um feed baixado (evita página gigante no lugar do feed)
+MAX_FEED_BYTES = 2 * 1024 * 1024
+# Entradas lidas de cada feed
+PER_FEED_LIMIT = 30
+# Meia-vida da recência no ranking: matéria com essa idade vale metade
+HALF_LIFE_HOURS = 12.0
+# Idade assumida para entradas sem data (não ganham de matéria recente datada)
+UNDATED_AGE_HOURS = 24.0
+# Última busca boa de um feed vale como reserva por até esse tempo
+STALE_MAX_SEC = 6 * 3600
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; RadioIA/1.0)",
+    "Accept": "application/feed+json, application/json, application/rss+xml, application/atom+xml, text/xml;q=0.9, */*;q=0.5",
+}
+
+
+@dataclass(frozen=True)
+class FeedSource:
+    """Um feed configurado: URL, nome exibido, peso no ranking e limite de tempo próprio."""
+
+    url: str
+    name: str = ""
+    weight: float = 1.0
+    timeout: float = FEED_TIMEOUT_SEC
+
+    @property
+    def label(self) -> str:
+        return self.name or urlparse(self.url).netloc or self.url
+
+
+def parse_sources(raw) -> list[FeedSource]:
+    """
+    Lista de fontes a partir da configuração: lista de URLs/objetos (stations.json) ou texto
+    "url|peso,url|peso" (NEWS_FEEDS). Entradas sem URL http(s) são ignoradas.
+    """
+    if not raw:
+        return []
+    if isinstance(raw, str):
+        raw = [part.strip() for part in raw.split(",") if part.strip()]
+    out: list[FeedSource] = []
+    seen: set[str] = set()
+    for item in raw:
+        if isinstance(item, str):
+            url, _, weight = item.partition("|")
+            item = {"url": url.strip(), "weight": weight.strip() or 1.0}
+        if not isinstance(item, dict):
+            continue
+        url = (item.get("url") or "").strip()
+        if not url.startswith(("http://", "https://")) or url in seen:
+            continue
+        seen.add(url)
+        try:
+            weight = max(0.0, float(item.get("weight", 1.0)))
+            timeout = min(FEEDS_DEADLINE_SEC, max(0.5, float(item.get("timeout") or FEED_TIMEOUT_SEC)))
+        except (TypeError, ValueError):
+            raise ValueError(f"Peso ou timeout inválido no feed {url!r}")
+        out.append(FeedSource(url=url, name=(item.get("name") or "").strip(), weight=weight, timeout=timeout))
+    return out
+
+
+def _clean(text: str) -> str:
+    """Remove HTML básico e espaços repetidos."""
+    text = text or ""
+    if "<" in text:
+        text = re.sub(r"<[^>]+>", " ", text)
+    return " ".join(text.split())
+
+
+def _json_date(value) -> float | None:
+    """Data do JSON Feed (RFC 3339) ou RFC 822 em epoch; None se não der para ler."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_entries(body: bytes, source: FeedSource, limit: int = PER_FEED_LIMIT) -> list[dict]:
+    """Entradas do feed (JSON Feed, RSS ou Atom) no formato único, na ordem do feed."""
+    out: list[dict] = []
+    head = body.lstrip()[:1]
+    if head in (b"{", b"["):
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        items = data.get("items") if isinstance(data, dict) else None
+        for item in (items or [])[:limit]:
+            if not isinstance(item, dict):
+                continue
+            out.append({
+                "title": _clean(item.get("title") or "")[:200],
+                "summary": _clean(item.get("summary") or item.get("content_text") or item.get("content_html") or ""),
+                "link": (item.get("url") or item.get("external_url") or "").strip(),
+                "published": _json_date(item.get("date_published") or item.get("date_modified")),
+            })
+    else:
+        import feedparser
+
+        feed = feedparser.parse(body)
+        for entry in feed.entries[:limit]:
+            parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+            out.append({
+                "title": _clean(entry.get("title") or "")[:200],
+                "summary": _clean(entry.get("summary") or entry.get("description") or ""),
+                "link": (entry.get("link") or "").strip(),
+                "published": float(timegm(parsed)) if parsed else None,
+            })
+    for item in out:
+        item["source"] = source.label
+        item["weight"] = source.weight
+    return [item for item in out if item["title"]]
+
+
+def score(item: dict, now: float | None = None) -> float:
+    """Peso da fonte x decaimento exponencial pela idade (meia-vida HALF_LIFE_HOURS)."""
+    now = time.time() if now is None else now
+    published = item.get("published")
+    age_h = max(0.0, (now - published) / 3600) if published else UNDATED_AGE_HOURS
+    return item.get("weight", 1.0) * 0.5 ** (age_h / HALF_LIFE_HOURS)
+
+
+def rank(entries: list[dict], limit: int, now: float | None = None) -> list[dict]:
+    """
+    Junta as entradas de todas as fontes: mesma manchete (título normalizado) fica uma vez
+    só, com a maior pontuação; ordena da maior para a menor e devolve as limit primeiras.
+    """
+    now = time.time() if now is None else now
+    best: dict[str, dict] = {}
+    for item in entries:
+        key = normalize_title(item["title"])
+        if not key:
+            continue
+        item = dict(item, score=score(item, now))
+        kept = best.get(key)
+        if kept is None or item["score"] > kept["score"]:
+            best[key] = item
+    ranked = sorted(best.values(), key=lambda i: (-i["score"], -(i.get("published") or 0.0)))
+    return ranked[:limit]
+
+
+class FeedAggregator:
+    """Pool de busca, sessão HTTP compartilhada e última busca boa de cada feed."""
+
+    def __init__(self, workers: int = FEED_WORKERS, deadline: float = FEEDS_DEADLINE_SEC) -> None:
+        self.workers = max(1, workers)
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self._pool: ThreadPoolExecutor | None = None
+        self._session = None
+        # url -> {"entries", "at", "etag", "modified"} (última resposta boa)
+        self._cache: dict[str, dict] = {}
+        # url -> resultado da última tentativa (para /api/status)
+        self._last: dict[str, dict] = {}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="feed")
+            return self._pool
+
+    def session(self):
+        """Sessão requests compartilhada (keep-alive), com pool do tamanho do executor."""
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                s = requests.Session()
+                s.headers.update(HEADERS)
+                adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                self._session = s
+            return self._session
+
+    def _download(self, source: FeedSource, cached: dict | None) -> bytes | None:
+        """Corpo do feed; None = não mudou (304). Levanta exceção em erro ou estouro de tempo."""
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("modified"):
+            headers["If-Modified-Since"] = cached["modified"]
+        started = time.monotonic()
+        with self.session().get(source.url, headers=headers, timeout=source.timeout, stream=True) as r:
+            if r.status_code == 304 and cached:
+                return None
+            r.raise_for_status()
+            chunks, size = [], 0
+            # O timeout do requests vale por leitura; aqui o feed inteiro tem source.timeout
+            for chunk in r.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > MAX_FEED_BYTES:
+                    raise RuntimeError("feed grande demais")
+                if time.monotonic() - started > source.timeout:
+                    raise TimeoutError("tempo do feed esgotado")
+                chunks.append(chunk)
+            etag, modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+        with self._lock:
+            self._cache.setdefault(source.url, {}).update(etag=etag, modified=modified)
+        return b"".join(chunks)
+
+    def _fetch_one(self, source: FeedSource) -> list[dict]:
+        started = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(source.url)
+        try:
+            body = self._download(source, cached if cached and cached.get("entries") is not None else None)
+            if body is None:
+                entries, status = cached["entries"], "not-modified"
+            else:
+                entries, status = parse_entries(body, source), "ok"
+            with self._lock:
+                self._cache.setdefault(source.url, {}).update(entries=entries, at=time.time())
+            self._record(source, status, started, len(entries))
+            return entries
+        except Exception as e:
+            self._record(source, "error", started, 0, str(e) or type(e).__name__)
+            raise
+
+    def _record(self, source: FeedSource, status: str, started: float, count: int, error: str | None = None) -> None:
+        with self._lock:
+            self._last[source.url] = {
+                "source": source.label,
+                "status": status,
+                "ms": round((time.monotonic() - started) * 1000),
+                "entries": count,
+                "error": error,
+                "at": time.time(),
+            }
+
+    def _stale(self, source: FeedSource) -> list[dict]:
+        """Entradas da última busca boa, se ainda não velhas demais."""
+        with self._lock:
+            cached = self._cache.get(source.url) or {}
+        if cached.get("entries") and time.time() - cached.get("at", 0) <= STALE_MAX_SEC:
+            return cached["entries"]
+        return []
+
+    def fetch(self, sources: list[FeedSource], limit: int) -> list[dict]:
+        """
+        Busca todas as fontes em paralelo e devolve as limit melhores entradas (ranking).
+        Retorna em até self.deadline segundos: fontes com erro ou atrasadas usam a reserva.
+        """
+        if not sources:
+            return []
+        pool = self._executor()
+        futures = {pool.submit(self._fetch_one, s): s for s in sources}
+        done, pending = wait(futures, timeout=self.deadline)
+        entries: list[dict] = []
+        for fut, source in futures.items():
+            if fut in done and fut.exception() is None:
+                entries.extend(fut.result())
+                continue
+            if fut in pending:
+                # Continua em segundo plano (limitado por source.timeout) e atualiza a reserva
+                self._record(source, "late", time.monotonic() - self.deadline, 0)
+            entries.extend(self._stale(source))
+        return rank(entries, limit)
+
+    def sources_status(self, sources: list[FeedSource]) -> list[dict]:
+        """Resultado da última busca de cada fonte (para o admin)."""
+        with self._lock:
+            return [dict(self._last.get(s.url) or {"source": s.label, "status": "never"}, url=s.url) for s in sources]
+
+
+aggregator = FeedAggregator()
+
+
+def fetch(sources: list[FeedSource], limit: int) -> list[dict]:
+    """Atalho para aggregator.fetch (pool e sessão compartilhados do processo)."""
+    return aggregator.fetch(sources, limit)
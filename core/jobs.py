@@ -0,0 +1,278 @@
+"""
+Jobs - Rádio IA
+Fila de trabalhos do admin: as rotas de geração (roteiro por feed ou texto colado, boletim,
+lote da semana, rotas antigas /api/gerar*) só enfileiram e respondem na hora com o id; um
+pool limitado de threads executa. O cliente acompanha em /api/jobs/<id>: estado, etapa
+atual, tempo de cada etapa e resultado.
+- Pedido repetido (mesmo tipo, mesma rádio, mesmos parâmetros) enquanto o anterior está na
+  fila ou rodando devolve o mesmo trabalho.
+- O código de geração marca etapas com `with jobs.stage("voz"):`; fora de um trabalho não faz nada.
+- Cada mudança de estado é gravada em output/jobs/<id>.json: qualquer processo (vários
+  workers do gunicorn) responde o status. A deduplicação vale dentro do processo.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+from core import quota
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+JOBS_DIR = BASE_DIR / "output" / "jobs"
+# Trabalhos executando ao mesmo tempo (geração usa as mesmas APIs com cota; poucos bastam)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Máximo de trabalhos esperando na fila; além disso o pedido é recusado (429)
+MAX_PENDING = 20
+# Trabalhos terminados mantidos na memória e no disco
+HISTORY = 100
+# Arquivos de trabalhos mais velhos que isso são apagados
+JOB_TTL_SEC = 24 * 3600
+
+QUEUED, RUNNING, DONE, ERROR = "queued", "running", "done", "error"
+
+_local = threading.local()
+
+
+class JobQueueFull(RuntimeError):
+    """Fila cheia: pedido recusado."""
+
+
+def _iso(ts: float | None) -> str | None:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    station: str
+    key: str
+    # Sem exigir o segredo para consultar (rotas antigas, que também não exigem)
+    public: bool = False
+    planned: list[str] = field(default_factory=list)
+    status: str = QUEUED
+    stage: str | None = None
+    stages: list[dict] = field(default_factory=list)
+    result: dict | None = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    def to_dict(self) -> dict:
+        done = {s["name"] for s in self.stages if s.get("ms") is not None}
+        now = time.time()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "station": self.station,
+            "public": self.public,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": [dict(s) for s in self.stages],
+            "progress": round(len(done & set(self.planned)) / len(self.planned), 2) if self.planned else None,
+            "result": self.result,
+            "error": self.error,
+            "createdAt": _iso(self.created_at),
+            "startedAt": _iso(self.started_at),
+            "finishedAt": _iso(self.finished_at),
+            "queuedMs": round(((self.started_at or now) - self.created_at) * 1000),
+            "runMs": round(((self.finished_at or now) - self.started_at) * 1000) if self.started_at else None,
+        }
+
+
+def job_key(kind: str, station: str, params: dict | None = None) -> str:
+    """Chave de deduplicação: tipo + rádio + parâmetros (ordem das chaves não importa)."""
+    blob = json.dumps(params or {}, sort_keys=True, ensure_ascii=False)
+    return f"{kind}:{station}:{hashlib.sha1(blob.encode('utf-8')).hexdigest()[:16]}"
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = MAX_PENDING, state_dir: Path | None = JOBS_DIR) -> None:
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.state_dir = state_dir
+        self._lock = threading.Lock()
+        self._jobs: dict[str, Job] = {}
+        # Trabalhos na fila ou rodando, por chave (deduplicação)
+        self._active: dict[str, Job] = {}
+        self._pool: ThreadPoolExecutor | None = None
+        self._pruned_at = 0.0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            return self._pool
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[[], dict | None],
+        station: str = "",
+        params: dict | None = None,
+        planned: list[str] | None = None,
+        public: bool = False,
+    ) -> tuple[Job, bool]:
+        """
+        Enfileira fn() (retorna o resultado, um dict). Retorna (trabalho, criado); criado=False
+        quando um pedido igual já estava na fila ou rodando. A prioridade de cota de quem
+        chamou vale dentro do trabalho. Levanta JobQueueFull se a fila estiver cheia.
+        """
+        key = job_key(kind, station, params)
+        with self._lock:
+            existing = self._active.get(key)
+            if existing is not None:
+                return existing, False
+            if sum(1 for j in self._active.values() if j.status == QUEUED) >= self.max_pending:
+                raise JobQueueFull("Fila de trabalhos cheia. Tente de novo em alguns minutos.")
+            job = Job(id=uuid.uuid4().hex, kind=kind, station=station, key=key, public=public, planned=list(planned or []))
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._trim()
+        self._save(job)
+        self._executor().submit(self._run, job, fn, quota.current_priority())
+        return job, True
+
+    def _trim(self) -> None:
+        """Esquece os trabalhos terminados mais antigos além de HISTORY (com o lock)."""
+        finished = [j for j in self._jobs.values() if j.status in (DONE, ERROR)]
+        for j in sorted(finished, key=lambda j: j.created_at)[:-HISTORY]:
+            del self._jobs[j.id]
+
+    def _run(self, job: Job, fn: Callable[[], dict | None], level: int) -> None:
+        _local.job, _local.queue = job, self
+        job.status, job.started_at = RUNNING, time.time()
+        self._save(job)
+        try:
+            with quota.priority(level):
+                result = fn()
+            job.result = result if isinstance(result, dict) else None
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.status = ERROR
+        finally:
+            _local.job = _local.queue = None
+            job.stage = None
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+            self._save(job)
+            self._prune_files()
+
+    # ---------- Etapas ----------
+
+    def _begin_stage(self, job: Job, name: str) -> dict:
+        row = {"name": name, "ms": None}
+        job.stages.append(row)
+        job.stage = name
+        self._save(job)
+        return row
+
+    def _end_stage(self, job: Job, row: dict, started: float) -> None:
+        row["ms"] = round((time.perf_counter() - started) * 1000)
+        job.stage = None
+        self._save(job)
+
+    # ---------- Persistência ----------
+
+    def _path(self, job_id: str) -> Path | None:
+        if self.state_dir is None or not job_id.isalnum():
+            return None
+        return self.state_dir / f"{job_id}.json"
+
+    def _save(self, job: Job) -> None:
+        path = self._path(job.id)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(job.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def _prune_files(self) -> None:
+        now = time.time()
+        if self.state_dir is None or now - self._pruned_at < 600:
+            return
+        self._pruned_at = now
+        for p in self.state_dir.glob("*.json"):
+            try:
+                if now - p.stat().st_mtime > JOB_TTL_SEC:
+                    p.unlink()
+            except OSError:
+                pass
+
+    # ---------- Consulta ----------
+
+    def get(self, job_id: str) -> dict | None:
+        """Estado do trabalho: da memória, ou do arquivo (trabalho de outro processo)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        path = self._path(job_id)
+        if path is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "workers": self.workers,
+            "queued": sum(1 for j in jobs if j.status == QUEUED),
+            "running": sum(1 for j in jobs if j.status == RUNNING),
+            "done": sum(1 for j in jobs if j.status == DONE),
+            "errors": sum(1 for j in jobs if j.status == ERROR),
+        }
+
+
+runner = JobQueue()
+
+
+def submit(kind: str, fn: Callable[[], dict | None], station: str = "", params: dict | None = None,
+           planned: list[str] | None = None, public: bool = False) -> tuple[Job, bool]:
+    """Atalho para runner.submit (fila compartilhada do processo)."""
+    return runner.submit(kind, fn, station=station, params=params, planned=planned, public=public)
+
+
+def get(job_id: str) -> dict | None:
+    return runner.get(job_id)
+
+
+@contextmanager
+def stage(name: str):
+    """Marca uma etapa do trabalho desta thread (nome + duração). Fora de trabalho, não faz nada."""
+    job = getattr(_local, "job", None)
+    if job is None:
+        yield
+        return
+    owner: JobQueue = _local.queue
+    row = owner._begin_stage(job, name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        owner._end_stage(job, row, started)
+
@@ -0,0 +1,233 @@
+"""
+Library Index - Rádio IA
+Análise da biblioteca de músicas: duração, loudness integrado (LUFS), true peak e ganho
+sugerido para cada faixa chegar ao mesmo nível dos blocos (FINAL_LUFS), sem reencodar nada.
+O player aplica o ganho servido em /api/next. Construído de forma incremental (só faixas
+novas ou alteradas, chave = mtime + tamanho) com um pool de processos (spawn: o servidor
+tem threads com locks que um fork copiaria travados); gravado em output/library/<pasta>.json.
+Faixa que não deu para analisar fica no índice com o erro e o mesmo carimbo: só é tentada de
+novo se o arquivo mudar.
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+
+from core.loudness import CHUNK_SEC, LoudnessMeter
+from core.mixer import FINAL_LUFS, _get_music_files, codec
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+LIBRARY_DIR = BASE_DIR / "output" / "library"
+INDEX_VERSION = 1
+
+# Teto de true peak depois do ganho (dBTP): evita clipping no player
+TRUE_PEAK_CEILING = -1.0
+# Limite do ganho sugerido (faixas muito baixas ou muito altas)
+MAX_GAIN_DB = 12.0
+# Fator de sobreamostragem da medição de true peak (BS.1770: 4x)
+TRUE_PEAK_OVERSAMPLE = 4
+# Amostras de contexto de cada lado do pedaço na sobreamostragem (cobre o filtro do resample_poly)
+TRUE_PEAK_OVERLAP = 64
+# Processos de análise (decodificar MP3 e medir é pesado em CPU)
+ANALYSIS_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+# Grava o índice parcial a cada N faixas analisadas (build longo interrompido não perde tudo)
+SAVE_EVERY = 8
+
+logger = logging.getLogger(__name__)
+
+_registry: dict[str, "LibraryIndex"] = {}
+_registry_lock = threading.Lock()
+
+
+def analyze_track(path: str) -> dict:
+    """
+    Mede uma faixa (roda em processo separado). Retorna duração (s), LUFS integrado,
+    true peak (dBTP) e ganho sugerido (dB). LUFS/peak None se não der para medir.
+    """
+    import numpy as np
+
+    seg = codec().decode(Path(path))
+    if seg.sample_width != 2:
+        seg = seg.set_sample_width(2)
+    info = {"duration_sec": round(len(seg) / 1000, 2), "lufs": None, "true_peak_db": None, "gain_db": 0.0}
+    pcm = np.frombuffer(seg.raw_data, dtype=np.int16).reshape(-1, seg.channels)
+    if not len(pcm):
+        return info
+    try:
+        from scipy.signal import resample_poly
+    except ImportError:
+        resample_poly = None
+    # Em pedaços: só um pedaço (mais o contexto) em float32 e sobreamostrado por vez
+    meter = LoudnessMeter(seg.frame_rate, seg.channels)
+    step = max(1, int(CHUNK_SEC * seg.frame_rate))
+    peak = 0.0
+    for start in range(0, len(pcm), step):
+        chunk = pcm[start:start + step]
+        meter.add(chunk)
+        peak = max(peak, float(np.max(np.abs(chunk.astype(np.float32)))) / 32768.0)
+        if resample_poly is not None:
+            lo = max(0, start - TRUE_PEAK_OVERLAP)
+            window = pcm[lo:start + step + TRUE_PEAK_OVERLAP].astype(np.float32) / 32768.0
+            over = resample_poly(window, TRUE_PEAK_OVERSAMPLE, 1, axis=0)
+            # Só a parte do pedaço: as bordas do contexto são medidas no pedaço vizinho
+            first = (start - lo) * TRUE_PEAK_OVERSAMPLE
+            over = over[first:first + len(chunk) * TRUE_PEAK_OVERSAMPLE]
+            if len(over):
+                peak = max(peak, float(np.max(np.abs(over))))
+    if peak > 0:
+        info["true_peak_db"] = round(float(20 * np.log10(peak)), 2)
+    lufs = meter.integrated
+    if lufs is not None:
+        info["lufs"] = round(float(lufs), 2)
+        info["gain_db"] = suggested_gain(info["lufs"], info["true_peak_db"])
+    return info
+
+
+def suggested_gain(lufs: float, true_peak_db: float | None, target_lufs: float = FINAL_LUFS) -> float:
+    """Ganho para chegar ao alvo, limitado pelo teto de true peak e por ±MAX_GAIN_DB."""
+    gain = target_lufs - lufs
+    if true_peak_db is not None:
+        gain = min(gain, TRUE_PEAK_CEILING - true_peak_db)
+    return round(max(-MAX_GAIN_DB, min(MAX_GAIN_DB, gain)), 2)
+
+
+class LibraryIndex:
+    """Índice de uma pasta de músicas (compartilhado entre rádios com a mesma pasta)."""
+
+    def __init__(self, music_dir: Path) -> None:
+        self.music_dir = Path(music_dir)
+        key = hashlib.sha1(str(self.music_dir.resolve()).encode("utf-8")).hexdigest()[:12]
+        self.path = LIBRARY_DIR / f"{self.music_dir.name or 'musicas'}-{key}.json"
+        self._lock = threading.Lock()
+        self._building = False
+        self._tracks: dict[str, dict] = {}
+        self._file_mtime = 0
+        self._load()
+
+    def _load(self) -> None:
+        """Lê o índice do disco se mudou (o build pode rodar em outro processo, ex. --generator)."""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+            if mtime == self._file_mtime:
+                return
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION:
+            with self._lock:
+                self._tracks = data.get("tracks") or {}
+                self._file_mtime = mtime
+
+    def _save(self) -> None:
+        LIBRARY_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with self._lock:
+            payload = {"version": INDEX_VERSION, "target_lufs": FINAL_LUFS, "tracks": dict(self._tracks)}
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+        self._file_mtime = self.path.stat().st_mtime_ns
+
+    @staticmethod
+    def _stamp(path: Path) -> tuple[int, int]:
+        st = path.stat()
+        return st.st_mtime_ns, st.st_size
+
+    def get(self, track: Path) -> dict | None:
+        """Análise da faixa se estiver no índice e o arquivo não mudou desde então (None se falhou)."""
+        track = Path(track)
+        if not self._building:
+            self._load()
+        with self._lock:
+            entry = self._tracks.get(track.name)
+        if entry is None or entry.get("error"):
+            return None
+        try:
+            if tuple(entry.get("stamp") or ()) != self._stamp(track):
+                return None
+        except OSError:
+            return None
+        return entry
+
+    def build(self, workers: int = ANALYSIS_WORKERS) -> int:
+        """
+        Analisa as faixas novas ou alteradas e remove do índice as que sumiram.
+        Retorna quantas foram analisadas (com sucesso). Uma construção por vez.
+        """
+        self._load()
+        with self._lock:
+            if self._building:
+                return 0
+            self._building = True
+        try:
+            files = _get_music_files(self.music_dir)
+            todo: dict[str, tuple[Path, tuple[int, int]]] = {}
+            with self._lock:
+                present = {f.name for f in files}
+                removed = [n for n in self._tracks if n not in present]
+                for n in removed:
+                    del self._tracks[n]
+                for f in files:
+                    stamp = self._stamp(f)
+                    entry = self._tracks.get(f.name)
+                    if entry is None or tuple(entry.get("stamp") or ()) != stamp:
+                        todo[str(f)] = (f, stamp)
+            if not todo:
+                if removed:
+                    self._save()
+                return 0
+            done = 0
+            finished = 0
+            pool = ProcessPoolExecutor(
+                max_workers=max(1, min(workers, len(todo))), mp_context=multiprocessing.get_context("spawn")
+            )
+            with pool:
+                futures = {pool.submit(analyze_track, p): p for p in todo}
+                for fut in as_completed(futures):
+                    f, stamp = todo[futures[fut]]
+                    try:
+                        info = fut.result()
+                        done += 1
+                    except Exception as e:
+                        # Guardado com o carimbo: o próximo build só tenta de novo se o arquivo mudar
+                        logger.warning("Análise de %s falhou: %s: %s", f.name, type(e).__name__, e)
+                        info = {"error": f"{type(e).__name__}: {e}"}
+                    info["stamp"] = list(stamp)
+                    info["analyzed_at"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+                    with self._lock:
+                        self._tracks[f.name] = info
+                    finished += 1
+                    if finished % SAVE_EVERY == 0:
+                        self._save()
+            self._save()
+            return done
+        finally:
+            with self._lock:
+                self._building = False
+
+    def build_in_background(self) -> None:
+        """Dispara build() numa thread (não bloqueia a inicialização do servidor)."""
+        t = threading.Thread(target=self.build, daemon=True)
+        t.start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            errors = sum(1 for t in self._tracks.values() if t.get("error"))
+            return {"tracks": len(self._tracks) - errors, "errors": errors, "building": self._building}
+
+
+def for_dir(music_dir: Path) -> LibraryIndex:
+    """Índice da pasta (uma instância por pasta no processo)."""
+    key = str(Path(music_dir).resolve())
+    with _registry_lock:
+        idx = _registry.get(key)
+        if idx is None:
+            idx = _registry[key] = LibraryIndex(Path(music_dir))
+        return idx
@@ -0,0 +1,217 @@
+"""
+Loudness - Rádio IA
+Medidor de loudness ITU-R BS.1770-4 em streaming: o áudio entra em pedaços (float32), passa
+pelo filtro K (shelf + passa-altas, com estado entre pedaços) e vira energia por janela de
+100 ms. Blocos de 400 ms (75% de sobreposição) alimentam um histograma de loudness com a
+soma exata de energia por faixa: o LUFS integrado (portas absoluta -70 e relativa -10 LU)
+sai do histograma, com memória constante qualquer que seja a duração. Também informa
+loudness momentâneo (400 ms) e de curto prazo (3 s), atuais e máximos, para monitoração.
+Resultado igual ao do pyloudnorm dentro de ~0,05 LU (tools/check_loudness.py confere).
+"""
+
+import math
+from collections import deque
+
+# numpy e scipy são importados dentro das funções (o servidor web importa o mixer).
+
+# Janela de energia (s): blocos de 400 ms com passo de 100 ms = 4 janelas por bloco
+HOP_SEC = 0.1
+BLOCK_HOPS = 4
+SHORT_TERM_HOPS = 30
+# Portas do BS.1770-4
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+# Histograma dos blocos: de ABSOLUTE_GATE até HIST_MAX, em passos de HIST_STEP LU
+HIST_STEP = 0.01
+HIST_MAX = 10.0
+# Pedaço processado por vez ao medir um segmento inteiro (s)
+CHUNK_SEC = 5.0
+# Peso por canal (L, R, C, Ls, Rs)
+_CHANNEL_WEIGHTS = (1.0, 1.0, 1.0, 1.41, 1.41)
+
+
+def _k_weighting_sos(rate: int):
+    """Filtro K do BS.1770 para a taxa dada (mesmos coeficientes do pyloudnorm), em SOS."""
+    import numpy as np
+
+    def biquad(kind: str, gain_db: float, q: float, fc: float) -> list[float]:
+        a_ = 10 ** (gain_db / 40.0)
+        w0 = 2.0 * math.pi * fc / rate
+        alpha = math.sin(w0) / (2.0 * q)
+        cw = math.cos(w0)
+        if kind == "high_shelf":
+            sq = 2.0 * math.sqrt(a_) * alpha
+            b = (a_ * ((a_ + 1) + (a_ - 1) * cw + sq), -2 * a_ * ((a_ - 1) + (a_ + 1) * cw), a_ * ((a_ + 1) + (a_ - 1) * cw - sq))
+            a = ((a_ + 1) - (a_ - 1) * cw + sq, 2 * ((a_ - 1) - (a_ + 1) * cw), (a_ + 1) - (a_ - 1) * cw - sq)
+        else:
+            b = ((1 + cw) / 2, -(1 + cw), (1 + cw) / 2)
+            a = (1 + alpha, -2 * cw, 1 - alpha)
+        return [x / a[0] for x in b] + [x / a[0] for x in a]
+
+    return np.array([
+        biquad("high_shelf", 4.0, 1 / math.sqrt(2), 1500.0),
+        biquad("high_pass", 0.0, 0.5, 38.0),
+    ], dtype=np.float64)
+
+
+def _to_lufs(power: float) -> float:
+    return -0.691 + 10.0 * math.log10(power) if power > 0 else float("-inf")
+
+
+class LoudnessMeter:
+    """
+    Medidor incremental: add() com pedaços (amostras, canais) em float (-1..1) ou int16.
+    Memória constante: estado dos filtros, últimas 30 janelas e o histograma.
+    """
+
+    def __init__(self, rate: int, channels: int) -> None:
+        import numpy as np
+
+        if not 1 <= channels <= len(_CHANNEL_WEIGHTS):
+            raise ValueError(f"Canais não suportados: {channels}")
+        self.rate = rate
+        self.channels = channels
+        self._np = np
+        self._sos = _k_weighting_sos(rate).astype(np.float32)
+        # Estado do filtro por seção e canal (sosfilt: seções x 2 x canais)
+        self._zi = np.zeros((self._sos.shape[0], 2, channels), dtype=np.float32)
+        self._weights = np.array(_CHANNEL_WEIGHTS[:channels], dtype=np.float64)
+        # Amostras já vistas (fronteiras das janelas: floor(k * rate * HOP_SEC))
+        self._samples = 0
+        self._hop_index = 0
+        self._hop_energy = np.zeros(channels, dtype=np.float64)
+        # Energia ponderada das últimas janelas completas (para blocos, momentâneo e curto prazo)
+        self._hops: deque[float] = deque(maxlen=SHORT_TERM_HOPS)
+        self._lengths: deque[int] = deque(maxlen=SHORT_TERM_HOPS)
+        bins = int(round((HIST_MAX - ABSOLUTE_GATE) / HIST_STEP)) + 1
+        self._hist_count = np.zeros(bins, dtype=np.int64)
+        self._hist_power = np.zeros(bins, dtype=np.float64)
+        self.blocks = 0
+        self.max_momentary = float("-inf")
+        self.max_short_term = float("-inf")
+
+    def _hop_end(self, k: int) -> int:
+        """Fim (exclusivo, em amostras) da janela k."""
+        return int((k + 1) * HOP_SEC * self.rate)
+
+    def add(self, samples) -> None:
+        """Acrescenta um pedaço (n,) ou (n, canais): int16 é convertido para float32."""
+        np = self._np
+        from scipy.signal import sosfilt
+
+        x = np.asarray(samples)
+        if x.ndim == 1:
+            x = x.reshape(-1, self.channels)
+        if x.dtype == np.int16:
+            x = x.astype(np.float32) * (1.0 / 32768.0)
+        else:
+            x = x.astype(np.float32, copy=False)
+        if not len(x):
+            return
+        y, self._zi = sosfilt(self._sos, x, axis=0, zi=self._zi)
+        sq = np.square(y, dtype=np.float32)
+        pos = 0
+        n = len(sq)
+        while pos < n:
+            end = self._hop_end(self._hop_index) - self._samples
+            take = min(n - pos, end)
+            self._hop_energy += sq[pos:pos + take].sum(axis=0, dtype=np.float64)
+            pos += take
+            self._samples += take
+            if take == end:
+                self._close_hop()
+
+    def _close_hop(self) -> None:
+        start = int(self._hop_index * HOP_SEC * self.rate)
+        length = self._hop_end(self._hop_index) - start
+        # Soma ponderada dos canais; a média sai dividindo pelas amostras da janela
+        self._hops.append(float(self._weights @ self._hop_energy))
+        self._lengths.append(length)
+        self._hop_energy[:] = 0.0
+        self._hop_index += 1
+        if len(self._hops) >= BLOCK_HOPS:
+            power = self._window_power(BLOCK_HOPS)
+            self._add_block(power)
+            self.max_momentary = max(self.max_momentary, _to_lufs(power))
+        if len(self._hops) >= SHORT_TERM_HOPS:
+            self.max_short_term = max(self.max_short_term, _to_lufs(self._window_power(SHORT_TERM_HOPS)))
+
+    def _window_power(self, hops: int) -> float:
+        """Energia média ponderada das últimas hops janelas."""
+        energy = sum(list(self._hops)[-hops:])
+        samples = sum(list(self._lengths)[-hops:])
+        return energy / samples if samples else 0.0
+
+    def _add_block(self, power: float) -> None:
+        lufs = _to_lufs(power)
+        if lufs < ABSOLUTE_GATE:
+            return
+        i = min(len(self._hist_count) - 1, int((lufs - ABSOLUTE_GATE) / HIST_STEP))
+        self._hist_count[i] += 1
+        self._hist_power[i] += power
+        self.blocks += 1
+
+    @property
+    def integrated(self) -> float | None:
+        """LUFS integrado (com as duas portas); None se nenhum bloco passou da porta absoluta."""
+        np = self._np
+        total = int(self._hist_count.sum())
+        if not total:
+            return None
+        gate = _to_lufs(float(self._hist_power.sum()) / total) + RELATIVE_GATE
+        # Faixas inteiramente acima da porta relativa (resolução HIST_STEP)
+        first = max(0, int(math.floor((gate - ABSOLUTE_GATE) / HIST_STEP)) + 1)
+        count = int(self._hist_count[first:].sum())
+        if not count:
+            return None
+        return float(_to_lufs(float(np.sum(self._hist_power[first:])) / count))
+
+    @property
+    def momentary(self) -> float | None:
+        """Loudness dos últimos 400 ms (None antes do primeiro bloco)."""
+        if len(self._hops) < BLOCK_HOPS:
+            return None
+        return _to_lufs(self._window_power(BLOCK_HOPS))
+
+    @property
+    def short_term(self) -> float | None:
+        """Loudness dos últimos 3 s (None antes de 3 s de áudio)."""
+        if len(self._hops) < SHORT_TERM_HOPS:
+            return None
+        return _to_lufs(self._window_power(SHORT_TERM_HOPS))
+
+    def stats(self) -> dict:
+        def r(v):
+            return round(v, 2) if v is not None and math.isfinite(v) else None
+
+        return {
+            "integrated": r(self.integrated),
+            "momentary": r(self.momentary),
+            "shortTerm": r(self.short_term),
+            "maxMomentary": r(self.max_momentary),
+            "maxShortTerm": r(self.max_short_term),
+            "seconds": round(self._samples / self.rate, 2),
+            "blocks": self.blocks,
+        }
+
+
+def meter_segment(seg, chunk_sec: float = CHUNK_SEC) -> LoudnessMeter:
+    """
+    Mede um AudioSegment (16 bits) em pedaços de chunk_sec: lê os bytes crus sem copiar o
+    áudio inteiro (np.frombuffer) e converte para float32 um pedaço por vez.
+    """
+    import numpy as np
+
+    if seg.sample_width != 2:
+        seg = seg.set_sample_width(2)
+    meter = LoudnessMeter(seg.frame_rate, seg.channels)
+    pcm = np.frombuffer(seg.raw_data, dtype=np.int16).reshape(-1, seg.channels)
+    step = max(1, int(chunk_sec * seg.frame_rate))
+    for start in range(0, len(pcm), step):
+        meter.add(pcm[start:start + step])
+    return meter
+
+
+def integrated_loudness(seg) -> float | None:
+    """LUFS integrado de um AudioSegment; None se for silêncio (nenhum bloco acima de -70)."""
+    return meter_segment(seg).integrated
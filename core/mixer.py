@@ -2,13 +2,34 @@
 Mixer (Sonoplasta) - Rádio IA
 Escolhe faixas da playlist sem repetir nas últimas 10 e aplica ducking (música -20dB durante a voz).
 Normalização LUFS: blocos em -23 LUFS + 7 dB (alvo -16 LUFS).
+pydub/numpy são importados só nas funções de áudio: escolher faixas não carrega nada pesado
+(o servidor web sobe sem eles).
+concat_mp3 junta MP3s do mesmo formato por quadros, sem decodificar nem reencodar.
 """
 
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import queue
 import random
+import struct
+import subprocess
+import sys
+import threading
+from collections import OrderedDict, deque
+from io import BytesIO
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+from core.profiling import profiled
 
-import numpy as np
-from pydub import AudioSegment
+if TYPE_CHECKING:
+    from pydub import AudioSegment
 
 # Normalização de loudness para blocos (ex.: boletins)
 TARGET_LUFS = -23.0
@@ -22,119 +43,450 @@ MUSICAS_DIR = BASE_DIR / "assets" / "musicas"
 HISTORY_SIZE = 10
 # Redução de volume da música quando a voz entra (dB)
 DUCK_DB = -20
+# Rampa de volta da música ao volume normal depois da voz (ms)
+DUCK_RELEASE_MS = 300
+# Músicas já normalizadas (FINAL_LUFS) e encodadas: o resto da faixa no mix com ducking
+NORMALIZED_DIR = BASE_DIR / "output" / "normalized"
+# Máximo de músicas normalizadas guardadas (as usadas há mais tempo são apagadas)
+NORMALIZED_MAX_FILES = 64
+
+logger = logging.getLogger(__name__)
 
 # Histórico das últimas faixas tocadas (paths)
 _track_history: list[str] = []
 
+# Cache de áudio decodificado (beds e músicas), compartilhado por todas as rádios do processo
+DECODED_CACHE_MAX_BYTES = 256 * 1024 * 1024
+_decoded_cache: OrderedDict[tuple[str, int, int], AudioSegment] = OrderedDict()
+_decoded_cache_bytes = 0
+_decoded_lock = threading.Lock()
+# Últimas medições de loudness das normalizações (monitoração em /api/status)
+LOUDNESS_LOG_SIZE = 20
+_loudness_log: deque[dict] = deque(maxlen=LOUDNESS_LOG_SIZE)
+_loudness_lock = threading.Lock()
+
+
+# ---------- Codecs (decodificar / encodar) ----------
+# CODEC_BACKEND escolhe quem decodifica e encoda o áudio do mixer:
+# - "pydub": um processo ffmpeg novo por operação (comportamento original);
+# - "workers": processos de codec de vida longa (miniaudio decodifica, lameenc encoda MP3),
+#   que recebem trabalhos por pipe — sem abrir processo por operação;
+# - "auto" (padrão): workers se miniaudio e lameenc estiverem instalados, senão pydub.
+CODEC_BACKEND = os.getenv("CODEC_BACKEND", "auto").strip().lower()
+# Processos de codec mantidos abertos no backend "workers"
+CODEC_WORKERS = int(os.getenv("CODEC_WORKERS", "2"))
+# Bitrate padrão dos MP3 gerados (o mesmo que o ffmpeg usa sem -b:a)
+MP3_BITRATE = "128k"
+# Qualidade do LAME (0 = melhor e mais lenta, 9 = mais rápida; 3 é o padrão do lame)
+LAME_QUALITY = 3
+
+_FRAME_HEADER = struct.Struct("!Q")
+
+
+def _send_msg(stream, obj) -> None:
+    payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(_FRAME_HEADER.pack(len(payload)))
+    stream.write(payload)
+    stream.flush()
+
+
+def _recv_msg(stream):
+    head = stream.read(_FRAME_HEADER.size)
+    if len(head) < _FRAME_HEADER.size:
+        raise EOFError("worker de codec encerrado")
+    (size,) = _FRAME_HEADER.unpack(head)
+    payload = stream.read(size)
+    if len(payload) < size:
+        raise EOFError("worker de codec encerrado")
+    return pickle.loads(payload)
+
+
+def _decode_pcm(source: str | bytes) -> tuple[bytes, int, int]:
+    """miniaudio: arquivo ou bytes → PCM 16 bits intercalado na taxa e canais originais."""
+    import miniaudio
+
+    fmt = miniaudio.SampleFormat.SIGNED16
+    if isinstance(source, bytes):
+        info = None
+        for probe in (miniaudio.mp3_get_info, miniaudio.wav_get_info, miniaudio.flac_get_info, miniaudio.vorbis_get_info):
+            try:
+                info = probe(source)
+                break
+            except miniaudio.DecodeError:
+                continue
+        if info is None:
+            raise miniaudio.DecodeError("formato não reconhecido")
+        decoded = miniaudio.decode(source, output_format=fmt, nchannels=info.nchannels, sample_rate=info.sample_rate)
+    else:
+        info = miniaudio.get_file_info(source)
+        decoded = miniaudio.decode_file(source, output_format=fmt, nchannels=info.nchannels, sample_rate=info.sample_rate)
+    return decoded.samples.tobytes(), decoded.sample_rate, decoded.nchannels
+
+
+def _encode_mp3(pcm: bytes, rate: int, channels: int, kbps: int) -> bytes:
+    """lameenc: PCM 16 bits intercalado → MP3."""
+    import lameenc
+
+    enc = lameenc.Encoder()
+    enc.set_bit_rate(kbps)
+    enc.set_in_sample_rate(rate)
+    enc.set_channels(channels)
+    enc.set_quality(LAME_QUALITY)
+    return bytes(enc.encode(pcm) + enc.flush())
+
+
+def codec_worker_main() -> None:
+    """
+    Laço do processo de codec: lê trabalhos do stdin e responde no stdout (tamanho + pickle).
+    ("decode", caminho|bytes) → ("ok", pcm, taxa, canais); ("encode", pcm, taxa, canais, kbps)
+    → ("ok", mp3). Erro → ("error", mensagem); o processo continua vivo.
+    """
+    inp, out = sys.stdin.buffer, sys.stdout.buffer
+    # Qualquer print de biblioteca vai para o stderr, não para o canal de respostas
+    sys.stdout = sys.stderr
+    while True:
+        try:
+            job = _recv_msg(inp)
+        except EOFError:
+            return
+        try:
+            if job[0] == "decode":
+                result = ("ok", *_decode_pcm(job[1]))
+            elif job[0] == "encode":
+                result = ("ok", _encode_mp3(*job[1:]))
+            else:
+                result = ("error", f"trabalho desconhecido: {job[0]!r}")
+        except Exception as e:
+            result = ("error", f"{type(e).__name__}: {e}")
+        _send_msg(out, result)
+
+
+class PydubCodec:
+    """Um ffmpeg por operação (pydub)."""
+
+    name = "pydub"
+
+    def decode(self, source: Path | bytes) -> AudioSegment:
+        from pydub import AudioSegment
+
+        if isinstance(source, bytes):
+            return AudioSegment.from_file(BytesIO(source), format="mp3")
+        return AudioSegment.from_file(source)
+
+    def encode(self, seg: AudioSegment, output_path: Path, bitrate: str = MP3_BITRATE) -> None:
+        seg.export(output_path, format="mp3", bitrate=bitrate)
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class _Worker:
+    def __init__(self) -> None:
+        self.proc = subprocess.Popen(
+            [sys.executable, "-c", "from core.mixer import codec_worker_main; codec_worker_main()"],
+            cwd=BASE_DIR,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def call(self, job: tuple) -> tuple:
+        _send_msg(self.proc.stdin, job)
+        return _recv_msg(self.proc.stdout)
+
+    def close(self) -> None:
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=5)
+        except Exception:
+            self.proc.kill()
+
+
+class WorkerCodec:
+    """
+    Pool de processos de codec de vida longa. Cada operação pega um worker livre, manda o
+    trabalho pelo pipe e devolve o worker. Worker que morre é trocado por um novo; arquivo
+    que o miniaudio não abre (ou erro do worker) cai no pydub só naquela operação.
+    """
+
+    name = "workers"
+
+    def __init__(self, workers: int = CODEC_WORKERS) -> None:
+        self.size = max(1, workers)
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._fallback = PydubCodec()
+        self._counts = {"decode": 0, "encode": 0, "fallbacks": 0, "restarts": 0}
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            if self._idle.empty() and self._started < self.size:
+                self._started += 1
+                return _Worker()
+        return self._idle.get()
+
+    def _call(self, job: tuple) -> tuple | None:
+        worker = self._acquire()
+        reply = None
+        # Worker morto (ou pipe quebrado): troca por um novo e tenta mais uma vez
+        for _ in range(2):
+            try:
+                reply = worker.call(job)
+                break
+            except (EOFError, OSError, pickle.PickleError):
+                worker.close()
+                with self._lock:
+                    self._counts["restarts"] += 1
+                worker = _Worker()
+        self._idle.put(worker)
+        with self._lock:
+            self._counts[job[0]] += 1
+            if reply is None or reply[0] != "ok":
+                self._counts["fallbacks"] += 1
+        return reply if reply is not None and reply[0] == "ok" else None
+
+    def decode(self, source: Path | bytes) -> AudioSegment:
+        from pydub import AudioSegment
+
+        reply = self._call(("decode", source if isinstance(source, bytes) else str(source)))
+        if reply is None:
+            return self._fallback.decode(source)
+        _, pcm, rate, channels = reply
+        return AudioSegment(data=pcm, sample_width=2, frame_rate=rate, channels=channels)
+
+    def encode(self, seg: AudioSegment, output_path: Path, bitrate: str = MP3_BITRATE) -> None:
+        seg16 = seg if seg.sample_width == 2 else seg.set_sample_width(2)
+        kbps = int(bitrate.rstrip("kK"))
+        reply = self._call(("encode", seg16.raw_data, seg16.frame_rate, seg16.channels, kbps))
+        if reply is None:
+            self._fallback.encode(seg, output_path, bitrate)
+            return
+        Path(output_path).write_bytes(reply[1])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": self.name, "workers": self._started, **self._counts}
 
-def _get_music_files() -> list[Path]:
-    """Lista todos os MP3 em assets/musicas/; se vazio, usa a raiz do projeto."""
+    def close(self) -> None:
+        with self._lock:
+            self._started = 0
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+def _workers_available() -> bool:
+    try:
+        import lameenc  # noqa: F401
+        import miniaudio  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+_codec: PydubCodec | WorkerCodec | None = None
+_codec_lock = threading.Lock()
+
+
+def codec() -> PydubCodec | WorkerCodec:
+    """Codec do processo, conforme CODEC_BACKEND (criado no primeiro uso)."""
+    global _codec
+    with _codec_lock:
+        if _codec is None:
+            backend = CODEC_BACKEND
+            if backend == "auto":
+                backend = "workers" if _workers_available() else "pydub"
+            if backend not in ("pydub", "workers"):
+                raise ValueError(f"CODEC_BACKEND inválido: {CODEC_BACKEND!r} (use pydub, workers ou auto).")
+            _codec = WorkerCodec() if backend == "workers" else PydubCodec()
+        return _codec
+
+
+def load_audio(path: Path) -> AudioSegment:
+    """
+    Decodifica o arquivo com cache LRU em memória (chave: path + mtime + tamanho).
+    Beds e músicas usados por várias rádios são decodificados uma vez só.
+    """
+    global _decoded_cache_bytes
+    st = Path(path).stat()
+    key = (str(Path(path).resolve()), st.st_mtime_ns, st.st_size)
+    with _decoded_lock:
+        seg = _decoded_cache.get(key)
+        if seg is not None:
+            _decoded_cache.move_to_end(key)
+            return seg
+    seg = codec().decode(Path(path))
+    size = len(seg.raw_data)
+    if size > DECODED_CACHE_MAX_BYTES // 4:
+        return seg
+    with _decoded_lock:
+        if key not in _decoded_cache:
+            _decoded_cache[key] = seg
+            _decoded_cache_bytes += size
+        while _decoded_cache_bytes > DECODED_CACHE_MAX_BYTES and _decoded_cache:
+            _, old = _decoded_cache.popitem(last=False)
+            _decoded_cache_bytes -= len(old.raw_data)
+    return seg
+
+
+def _get_music_files(music_dir: Path | None = None) -> list[Path]:
+    """Lista todos os MP3 em assets/musicas/ (ou music_dir); se vazio, usa a raiz do projeto."""
+    music_dir = music_dir or MUSICAS_DIR
     files: list[Path] = []
-    if MUSICAS_DIR.is_dir():
-        files = sorted(MUSICAS_DIR.glob("*.mp3"), key=lambda p: p.name)
+    if music_dir.is_dir():
+        files = sorted(music_dir.glob("*.mp3"), key=lambda p: p.name)
     if not files:
         files = sorted(BASE_DIR.glob("*.mp3"), key=lambda p: p.name)
     return files
 
 
-def get_next_track() -> Path | None:
+def get_next_track(music_dir: Path | None = None, history: list[str] | None = None) -> Path | None:
     """
     Escolhe aleatoriamente uma das 32 músicas sem repetir a mesma nas últimas 10 rodadas.
+    music_dir/history permitem uma playlist e um histórico por rádio (padrão: assets/musicas).
     Retorna None se não houver músicas ou pasta inexistente.
     """
-    global _track_history
-    files = _get_music_files()
+    files = _get_music_files(music_dir)
     if not files:
         return None
+    track_history = _track_history if history is None else history
 
     # Paths como string para comparar no histórico
-    allowed = [f for f in files if str(f.resolve()) not in _track_history]
+    allowed = [f for f in files if str(f.resolve()) not in track_history]
     if not allowed:
         allowed = files
-        _track_history.clear()
+        track_history.clear()
 
     chosen = random.choice(allowed)
-    _track_history.append(str(chosen.resolve()))
-    if len(_track_history) > HISTORY_SIZE:
-        _track_history.pop(0)
+    track_history.append(str(chosen.resolve()))
+    if len(track_history) > HISTORY_SIZE:
+        track_history.pop(0)
     return chosen
 
 
+@profiled("mixer")
 def create_ducked_mix(
     music_path: Path,
     voice_path: Path,
     output_path: Path | None = None,
-) -> AudioSegment:
+) -> AudioSegment | None:
     """
     Cria um mix com ducking: a trilha musical baixa -20dB quando a voz entra
-    e volta ao volume normal quando a voz termina.
-    Retorna o segmento misturado (AudioSegment).
-    Se output_path for passado, salva o MP3 lá.
+    e volta ao volume normal (rampa de DUCK_RELEASE_MS) quando a voz termina.
+    Se output_path for passado, salva o MP3 lá: só a introdução (voz + rampa) é renderizada
+    e encodada; o resto vem, copiado quadro a quadro, da versão normalizada da música
+    (normalized_track). Nesse caso retorna None. Se a emenda não for possível (música mais
+    curta que a voz, formatos diferentes), renderiza a faixa inteira como antes e retorna o
+    segmento misturado (AudioSegment), como também faz sem output_path.
     """
-    music = AudioSegment.from_file(music_path)
-    voice = AudioSegment.from_file(voice_path)
-    voice_len_ms = len(voice)
-
-    # Parte 1: do início até o fim da voz = música em -20dB + voz por cima
-    music_during_voice = music[:voice_len_ms].apply_gain(DUCK_DB)
-    part1 = music_during_voice.overlay(voice)
-
-    # Parte 2: resto da música em volume normal
-    part2 = music[voice_len_ms:]
-
-    mixed = part1 + part2
+    if output_path is not None:
+        try:
+            if _ducked_mix_spliced(Path(music_path), Path(voice_path), Path(output_path)):
+                return None
+        except Exception as e:
+            logger.warning("Mix com ducking por emenda falhou (%s); renderizando a faixa inteira.", e)
+    music = load_audio(music_path)
+    voice = codec().decode(Path(voice_path))
+    mixed = _ducked_intro(music, voice)
     if output_path is not None:
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        mixed.export(output_path, format="mp3")
+        codec().encode(mixed, output_path)
         normalize_lufs(output_path)
     return mixed
 
 
+def _ducked_intro(music: AudioSegment, voice: AudioSegment, gain_db: float = 0.0) -> AudioSegment:
+    """
+    Música (com gain_db) em DUCK_DB durante a voz, rampa até o volume normal em
+    DUCK_RELEASE_MS e voz (com o mesmo gain_db) por cima. Mesma duração de music.
+    """
+    voice_len_ms = len(voice)
+    if gain_db:
+        music = music.apply_gain(gain_db)
+        voice = voice.apply_gain(gain_db)
+    if voice_len_ms + DUCK_RELEASE_MS >= len(music):
+        # Música mais curta que a voz (+ rampa): fica toda abaixada
+        ducked = music.apply_gain(DUCK_DB)
+    else:
+        ducked = music.fade(from_gain=DUCK_DB, to_gain=0, start=voice_len_ms, end=voice_len_ms + DUCK_RELEASE_MS)
+    return ducked.overlay(voice)
+
+
 def get_duck_db() -> int:
     """Retorna o valor de ducking em dB (negativo)."""
     return DUCK_DB
 
 
-def normalize_lufs(path: Path, target_lufs: float = FINAL_LUFS) -> None:
+def _codec_errors() -> tuple[type[BaseException], ...]:
+    """Falhas de decodificar/encodar que não derrubam o bloco (pydub levanta PydubException)."""
+    errors: tuple[type[BaseException], ...] = (ImportError, OSError, RuntimeError, ValueError)
+    try:
+        from pydub.exceptions import PydubException
+    except ImportError:
+        return errors
+    return errors + (PydubException,)
+
+
+def normalize_lufs(path: Path, target_lufs: float = FINAL_LUFS) -> float | None:
     """
     Normaliza o áudio do arquivo para o alvo em LUFS (ex.: -23 + 7 dB = -16 LUFS).
-    Sobrescreve o arquivo. Se pyloudnorm não estiver disponível, não altera.
+    Sobrescreve o arquivo (encoda num temporário + os.replace: se o encode falhar, o arquivo
+    fica como estava). Medição em streaming (core/loudness.py, float32, memória constante) e
+    ganho aplicado direto nas amostras de 16 bits (satura em vez de estourar).
+    Retorna o loudness resultante (integrado medido + ganho aplicado, LUFS), ou None se não
+    foi possível medir ou gravar; falhas de codec não sobem para quem chamou.
     """
+    from core.loudness import meter_segment
+
+    path = Path(path)
+    errors = _codec_errors()
     try:
-        import pyloudnorm as pyln
-    except ImportError:
-        return
+        seg = codec().decode(path)
+        meter = meter_segment(seg)
+    except errors as e:
+        logger.warning("Normalização LUFS de %s falhou: %s", path.name, e)
+        return None
+    lufs = meter.integrated
+    if lufs is None or lufs < -60:
+        _encode_replacing(seg.apply_gain(EXTRA_DB), path, errors)
+        return None
+    gain = target_lufs - lufs
+    out = seg.apply_gain(gain)
+    if not _encode_replacing(out, path, errors):
+        return None
+    _record_loudness(path, meter, gain)
+    # Integrado medido antes do ganho + ganho aplicado (sem decodificar o arquivo de novo)
+    return lufs + gain
+
+
+def _encode_replacing(seg: AudioSegment, path: Path, errors: tuple[type[BaseException], ...]) -> bool:
+    """Encoda seg por cima de path de forma atômica. False (e path intacto) se o codec falhar."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.stem}.{os.getpid()}.{threading.get_ident()}.lufs{path.suffix}")
     try:
-        seg = AudioSegment.from_file(path)
-        rate = seg.frame_rate
-        channels = seg.channels
-        samples = np.array(seg.get_array_of_samples(), dtype=np.float64) / 32768.0
-        if channels == 2:
-            data = samples.reshape(-1, 2)
-        else:
-            data = samples.reshape(-1, 1)
-        meter = pyln.Meter(rate)
-        lufs = meter.integrated_loudness(data)
-        if not np.isfinite(lufs) or lufs < -60:
-            seg = seg.apply_gain(EXTRA_DB)
-            seg.export(path, format="mp3")
-            return
-        normalized = pyln.normalize.loudness(data, lufs, target_lufs)
-        normalized = np.clip(normalized, -1.0, 1.0)
-        if channels == 2:
-            int16 = (normalized.reshape(-1) * 32767).astype(np.int16)
-        else:
-            int16 = (normalized.reshape(-1) * 32767).astype(np.int16)
-        new_seg = AudioSegment(
-            data=int16.tobytes(),
-            sample_width=2,
-            frame_rate=rate,
-            channels=channels,
-        )
-        path.parent.mkdir(parents=True, exist_ok=True)
-        new_seg.export(path, format="mp3")
-    except Exception:
-        pass
+        codec().encode(seg, tmp)
+        os.replace(tmp, path)
+    except errors as e:
+        tmp.unlink(missing_ok=True)
+        logger.warning("Normalização LUFS de %s falhou ao gravar: %s", path.name, e)
+        return False
+    return True
+
+
+def _record_loudness(path: Path, meter, gain_db: float) -> None:
+    """Guarda a medição (já com o ganho aplicado) para a monitoração em loudness_stats()."""
+    stats = meter.stats()
+    for key in ("momentary", "shortTerm", "maxMomentary", "maxShortTerm"):
+        if stats[key] is not None:
+            stats[key] = round(stats[key] + gain_db, 2)
+    stats.update(file=path.name, measuredLufs=stats.pop("integrated"), gainDb=round(gain_db, 2))
+    with _loudness_lock:
+        _loudness_log.append(stats)
+
+
+def loudness_stats() -> list[dict]:
+    """Últimas normalizações: LUFS medido, ganho e picos momentâneo/curto prazo resultantes."""
+    with _loudness_lock:
+        return list(_loudness_log)
 
 
 def _normalize_segments(seg: AudioSegment, segment_ms: int = 5000, target_dBFS: float = -3.0) -> AudioSegment:
@@ -160,13 +512,23 @@ def _normalize_segments(seg: AudioSegment, segment_ms: int = 5000, target_dBFS:
     return result
 
 
-def normalize_audio(path: Path, output_path: Path, target_dBFS: float = -1.5) -> None:
-    """Normaliza por segmentos e salva (volume estável, equalizado com música). Depois aplica LUFS."""
-    seg = AudioSegment.from_file(path)
+def normalize_audio(
+    path: Path,
+    output_path: Path,
+    target_dBFS: float = -1.5,
+    apply_lufs: bool = True,
+) -> AudioSegment:
+    """
+    Normaliza por segmentos e salva (volume estável, equalizado com música). Depois aplica LUFS.
+    Retorna o segmento salvo (antes do ajuste LUFS, mesma duração).
+    """
+    seg = codec().decode(Path(path))
     seg = _normalize_segments(seg, segment_ms=5000, target_dBFS=target_dBFS)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    seg.export(output_path, format="mp3")
-    normalize_lufs(output_path)
+    codec().encode(seg, output_path)
+    if apply_lufs:
+        normalize_lufs(output_path)
+    return seg
 
 
 VINHETAS_DIR = BASE_DIR / "assets" / "vinhetas"
@@ -185,17 +547,18 @@ def mix_voice_with_bed(
     bed_db: int = BED_DB,
     intro_seconds: float = INTRO_SECONDS,
     intro_bed_db: int = INTRO_BED_DB,
+    apply_lufs: bool = True,
 ) -> AudioSegment:
     """
     Intro: bed sozinho em volume mais alto (intro_seconds).
     Depois: bed abaixa (bed_db) e a locução entra por cima até o fim.
     Voz normalizada por segmentos para evitar queda de volume. Sem cortes.
     """
-    voice = AudioSegment.from_file(voice_path)
+    voice = codec().decode(Path(voice_path))
     voice_len_ms = len(voice)
     voice = _normalize_segments(voice, segment_ms=5000, target_dBFS=-3.0)
 
-    bed_raw = AudioSegment.from_file(bed_path)
+    bed_raw = load_audio(bed_path)
     intro_ms = int(intro_seconds * 1000)
     total_ms = voice_len_ms
     bed_len_ms = len(bed_raw)
@@ -211,6 +574,525 @@ def mix_voice_with_bed(
     mixed = part1 + part2
     mixed = _normalize_segments(mixed, segment_ms=8000, target_dBFS=-1.5)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    mixed.export(output_path, format="mp3")
-    normalize_lufs(output_path)
+    codec().encode(mixed, output_path)
+    if apply_lufs:
+        normalize_lufs(output_path)
     return mixed
+
+
+@profiled("mixer")
+def render_block(voice_path: Path, output_path: Path, bed_path: Path | None = None) -> tuple[int, float | None]:
+    """
+    Gera o MP3 final de um bloco: voz + bed (se bed_path existir) ou só voz normalizada,
+    sempre com normalização LUFS. Retorna (duração em ms, LUFS resultante ou None).
+    """
+    if bed_path is not None and Path(bed_path).is_file():
+        seg = mix_voice_with_bed(voice_path, bed_path, output_path, apply_lufs=False)
+    else:
+        seg = normalize_audio(voice_path, output_path, apply_lufs=False)
+    lufs = normalize_lufs(output_path)
+    return len(seg), lufs
+
+
+# ---------- Emenda de MP3 por quadros (sem decodificar nem reencodar) ----------
+# Trechos já codificados no mesmo formato (ex.: partes da locução da ElevenLabs) são juntados
+# copiando os quadros MPEG; a pausa entre eles vira quadros de silêncio (side info zerada,
+# sem bits de áudio). O cabeçalho Xing/Info/VBRI e o LAME tag de cada trecho são descartados
+# e a saída ganha um Xing/Info novo com o total de quadros e bytes. Cada trecho começa com
+# main_data_begin = 0 (início de stream), então o reservatório de bits não cruza a emenda.
+
+# Versão MPEG pelos bits do cabeçalho (1 é reservado)
+_MPEG_VERSIONS = {0: "2.5", 2: "2", 3: "1"}
+_SAMPLE_RATES = {"1": (44100, 48000, 32000), "2": (22050, 24000, 16000), "2.5": (11025, 12000, 8000)}
+# kbps por índice (0 = livre, não suportado; 15 = inválido)
+_BITRATES = {
+    ("1", 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    ("1", 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    ("1", 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    ("2", 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    ("2", 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    ("2", 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Atraso do decodificador MP3 (amostras), somado ao atraso do encoder informado no LAME tag
+_DECODER_DELAY = 529
+
+
+@dataclass
+class Mp3Stream:
+    """Quadros de áudio de um MP3 (sem ID3, sem Xing/Info) e o formato deles."""
+
+    data: bytes
+    # (início, tamanho) de cada quadro de áudio, em ordem
+    frames: list[tuple[int, int]]
+    version: str
+    layer: int
+    sample_rate: int
+    channels: int
+    samples_per_frame: int
+    # Cabeçalho (4 bytes) do primeiro quadro de áudio: modelo dos quadros de silêncio e do Xing
+    header: bytes
+    bitrates: set[int] = field(default_factory=set)
+    # Atraso do encoder e preenchimento final (amostras), do LAME tag; 0 se não houver
+    delay: int = 0
+    padding: int = 0
+
+    @property
+    def format(self) -> tuple[str, int, int, int]:
+        return self.version, self.layer, self.sample_rate, self.channels
+
+    @property
+    def duration_ms(self) -> float:
+        return len(self.frames) * self.samples_per_frame * 1000 / self.sample_rate
+
+
+def _frame_info(data: bytes, pos: int) -> tuple[str, int, int, int, int, int, int] | None:
+    """
+    Lê o cabeçalho em pos. Retorna (versão, camada, taxa, canais, amostras/quadro, tamanho do
+    quadro, índice de bitrate) ou None se não for um cabeçalho válido.
+    """
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    version = _MPEG_VERSIONS.get((b1 >> 3) & 0x03)
+    layer = 4 - ((b1 >> 1) & 0x03)
+    br_idx, sr_idx, pad = b2 >> 4, (b2 >> 2) & 0x03, (b2 >> 1) & 0x01
+    if version is None or layer == 4 or br_idx in (0, 15) or sr_idx == 3:
+        return None
+    rate = _SAMPLE_RATES[version][sr_idx]
+    bitrate = _BITRATES[("1" if version == "1" else "2", layer)][br_idx] * 1000
+    channels = 1 if (b3 >> 6) == 3 else 2
+    if layer == 1:
+        spf = 384
+        size = (12 * bitrate // rate + pad) * 4
+    else:
+        spf = 576 if (layer == 3 and version != "1") else 1152
+        size = spf // 8 * bitrate // rate + pad
+    return version, layer, rate, channels, spf, size, br_idx
+
+
+def _side_info_size(version: str, channels: int) -> int:
+    if version == "1":
+        return 17 if channels == 1 else 32
+    return 9 if channels == 1 else 17
+
+
+def _id3v2_size(data: bytes) -> int:
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    return 10 + size + (10 if data[5] & 0x10 else 0)
+
+
+def _vbr_header(data: bytes, pos: int, info: tuple) -> tuple[int, int] | None:
+    """
+    Se o quadro em pos é um cabeçalho Xing/Info/VBRI (não é áudio), retorna (atraso,
+    preenchimento) do LAME tag (0, 0 sem tag). None se for quadro de áudio.
+    """
+    version, layer, _, channels, _, size, _ = info
+    crc = 0 if data[pos + 1] & 0x01 else 2
+    off = pos + 4 + crc + _side_info_size(version, channels)
+    tag = data[off:off + 4]
+    if data[pos + 36:pos + 40] == b"VBRI":
+        return 0, 0
+    if tag not in (b"Xing", b"Info"):
+        return None
+    flags = int.from_bytes(data[off + 4:off + 8], "big")
+    lame = off + 8 + (4 if flags & 1 else 0) + (4 if flags & 2 else 0) + (100 if flags & 4 else 0) + (4 if flags & 8 else 0)
+    if lame + 24 <= pos + size and data[lame:lame + 4] in (b"LAME", b"Lavf", b"Lavc"):
+        raw = data[lame + 21:lame + 24]
+        return (raw[0] << 4) | (raw[1] >> 4), ((raw[1] & 0x0F) << 8) | raw[2]
+    return 0, 0
+
+
+def parse_mp3(data: bytes) -> Mp3Stream | None:
+    """
+    Localiza os quadros de áudio (pula ID3v2/ID3v1, lixo entre quadros e o quadro Xing/Info).
+    Um cabeçalho só conta se o próximo quadro também bate com o formato (evita falsos sync).
+    Retorna None se não houver quadros de áudio.
+    """
+    pos, end = _id3v2_size(data), len(data)
+    if end >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    stream: Mp3Stream | None = None
+    first = True
+    delay = padding = 0
+    while pos + 4 <= end:
+        info = _frame_info(data, pos)
+        if info is None or pos + info[5] > end:
+            pos += 1
+            continue
+        nxt = pos + info[5]
+        if nxt + 4 <= end:
+            following = _frame_info(data, nxt)
+            if following is None or following[:4] != info[:4]:
+                pos += 1
+                continue
+        if stream is not None and info[:4] != stream.format:
+            pos += 1
+            continue
+        if first:
+            first = False
+            gapless = _vbr_header(data, pos, info)
+            if gapless is not None:
+                delay, padding = gapless
+                pos = nxt
+                continue
+        if stream is None:
+            stream = Mp3Stream(data, [], *info[:5], header=data[pos:pos + 4], delay=delay, padding=padding)
+        stream.frames.append((pos, info[5]))
+        stream.bitrates.add(info[6])
+        pos = nxt
+    if stream is None or not stream.frames:
+        return None
+    return stream
+
+
+def _empty_frame(header: bytes, min_size: int = 0) -> bytearray:
+    """Quadro zerado com o formato de header (sem CRC, sem padding), de pelo menos min_size bytes."""
+    h = bytearray(header)
+    h[1] |= 0x01
+    h[2] &= 0xFD
+    while True:
+        info = _frame_info(bytes(h), 0)
+        if info is None:
+            raise ValueError("Cabeçalho MP3 inválido")
+        if info[5] >= min_size or (h[2] >> 4) >= 14:
+            break
+        h[2] += 0x10
+    frame = bytearray(info[5])
+    frame[:4] = h
+    return frame
+
+
+def _xing_frame(stream: Mp3Stream, frames: int, audio_bytes: int, cbr: bool) -> bytes:
+    """Quadro Xing/Info com total de quadros e bytes (incluindo ele mesmo)."""
+    off = 4 + _side_info_size(stream.version, stream.channels)
+    frame = _empty_frame(stream.header, off + 16)
+    frame[off:off + 4] = b"Info" if cbr else b"Xing"
+    frame[off + 4:off + 8] = (0x03).to_bytes(4, "big")
+    frame[off + 8:off + 12] = frames.to_bytes(4, "big")
+    frame[off + 12:off + 16] = (audio_bytes + len(frame)).to_bytes(4, "big")
+    return bytes(frame)
+
+
+def _main_data_begin(stream: Mp3Stream, pos: int) -> int:
+    """Quantos bytes do reservatório (quadros anteriores) o quadro em pos usa."""
+    data = stream.data
+    side = pos + 4 + (0 if data[pos + 1] & 0x01 else 2)
+    if stream.version == "1":
+        return (data[side] << 1) | (data[side + 1] >> 7)
+    return data[side]
+
+
+def _crc16(data: bytes) -> int:
+    """CRC-16 do MPEG (polinômio 0x8005, início 0xFFFF)."""
+    crc = 0xFFFF
+    for byte in data:
+        for bit in range(7, -1, -1):
+            top = ((crc >> 15) ^ (byte >> bit)) & 1
+            crc = ((crc << 1) & 0xFFFF) ^ (0x8005 if top else 0)
+    return crc
+
+
+def _muted_frame(stream: Mp3Stream, pos: int, size: int) -> bytes:
+    """
+    Cópia do quadro com a side info zerada: decodifica como silêncio, mas os bytes de dados
+    continuam no reservatório para os quadros seguintes.
+    """
+    frame = bytearray(stream.data[pos:pos + size])
+    crc = not (frame[1] & 0x01)
+    side = 4 + (2 if crc else 0)
+    n = _side_info_size(stream.version, stream.channels)
+    frame[side:side + n] = bytes(n)
+    if crc:
+        frame[4:6] = _crc16(bytes(frame[2:4]) + bytes(n)).to_bytes(2, "big")
+    return bytes(frame)
+
+
+def _reservoir_fix(stream: Mp3Stream) -> list[bytes]:
+    """
+    Trecho cortado no meio de outro stream: os primeiros quadros apontam para bytes do
+    reservatório que ficaram para trás. Esses quadros saem mudos (ver _muted_frame).
+    """
+    muted: list[bytes] = []
+    available = 0
+    for pos, size in stream.frames[:-1]:
+        if _main_data_begin(stream, pos) <= available:
+            break
+        muted.append(_muted_frame(stream, pos, size))
+        crc = 0 if stream.data[pos + 1] & 0x01 else 2
+        available += size - 4 - crc - _side_info_size(stream.version, stream.channels)
+    return muted
+
+
+def _frame_runs(stream: Mp3Stream, frames: list[tuple[int, int]]) -> list[memoryview]:
+    """Quadros contíguos agrupados em fatias (memoryview: cópia só na escrita)."""
+    view = memoryview(stream.data)
+    runs = []
+    start, stop = frames[0][0], frames[0][0]
+    for off, size in frames:
+        if off != stop:
+            runs.append(view[start:stop])
+            start = off
+        stop = off + size
+    runs.append(view[start:stop])
+    return runs
+
+
+def splice_mp3(streams: list[Mp3Stream], output_path: Path, gap_ms: int = 0) -> None:
+    """
+    Grava os streams (mesmo formato, camada III) em sequência com gap_ms de silêncio entre
+    eles. O silêncio desconta o preenchimento do trecho anterior e o atraso do seguinte
+    (LAME tag), para a pausa ouvida ficar perto de gap_ms. Trechos que começam no início do
+    próprio stream (o caso normal) não dependem do reservatório de bits de antes da emenda;
+    um trecho cortado no meio de outro stream tem os primeiros quadros emudecidos.
+    """
+    ref = streams[0]
+    if any(s.format != ref.format for s in streams) or ref.layer != 3:
+        raise ValueError("Formatos de MP3 diferentes: não dá para emendar por quadros")
+    silent = bytes(_empty_frame(ref.header))
+    chunks: list[bytes | memoryview] = []
+    frames = 0
+    for i, s in enumerate(streams):
+        if i and gap_ms > 0:
+            prev = streams[i - 1]
+            samples = gap_ms * ref.sample_rate / 1000 - prev.padding - (s.delay + _DECODER_DELAY if s.delay else 0)
+            n = max(0, round(samples / ref.samples_per_frame))
+            chunks.append(silent * n)
+            frames += n
+        muted = _reservoir_fix(s)
+        chunks.extend(muted)
+        chunks.extend(_frame_runs(s, s.frames[len(muted):]))
+        frames += len(s.frames)
+    audio_bytes = sum(len(c) for c in chunks)
+    bitrates = set().union(*(s.bitrates for s in streams))
+    cbr = len(bitrates) == 1 and (ref.header[2] >> 4) in bitrates
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(_xing_frame(ref, frames, audio_bytes, cbr))
+        for c in chunks:
+            f.write(c)
+
+
+def _concat_reencode(parts: list[bytes], output_path: Path, gap_ms: int, bitrate: str) -> None:
+    """Caminho antigo: decodifica tudo, junta com silêncio e reencoda (formatos diferentes)."""
+    from pydub import AudioSegment
+
+    segs = [codec().decode(p) for p in parts]
+    silence = AudioSegment.silent(duration=gap_ms, frame_rate=segs[0].frame_rate).set_channels(segs[0].channels)
+    out = segs[0]
+    for seg in segs[1:]:
+        out = out + silence + seg
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    codec().encode(out, output_path, bitrate)
+
+
+def concat_mp3(parts: list[bytes], output_path: Path, gap_ms: int = 0, bitrate: str = "128k") -> str:
+    """
+    Junta MP3s em ordem com gap_ms de silêncio entre eles. Mesmo formato (versão MPEG, camada
+    III, taxa e canais): emenda por quadros, sem decodificar. Formatos diferentes (ou arquivo
+    não reconhecido): decodifica e reencoda em bitrate. Retorna "splice" ou "reencode".
+    """
+    streams = [parse_mp3(p) for p in parts]
+    if streams and all(s is not None for s in streams):
+        fmts = {s.format for s in streams}
+        if len(fmts) == 1 and streams[0].layer == 3:
+            splice_mp3(streams, output_path, gap_ms)
+            return "splice"
+    _concat_reencode(parts, output_path, gap_ms, bitrate)
+    return "reencode"
+
+
+# ---------- Mix com ducking por emenda (só a introdução é renderizada) ----------
+# Só os primeiros len(voz) ms do mix diferem da música. A música é normalizada para
+# FINAL_LUFS e encodada uma vez (output/normalized/); cada mix renderiza só a introdução
+# (voz + música abaixada + rampa), até um limite de quadro depois da rampa, e copia o resto
+# dos quadros da versão normalizada. Os quadros logo depois da emenda buscam dados no
+# reservatório de bits (bytes dos quadros anteriores, que agora são da introdução): o último
+# quadro da introdução é regravado num bitrate maior, com os bytes que eles esperam no fim.
+
+# Atraso do encoder LAME (amostras; lameenc e libmp3lame do ffmpeg)
+_ENCODER_DELAY = 576
+# Bits de side info por granulo e canal (camada III) e onde começa o primeiro bloco
+_GRANULE_BITS = {"1": 59, "2": 63, "2.5": 63}
+_GRANULE_START = {("1", 1): 18, ("1", 2): 20, ("2", 1): 9, ("2", 2): 10, ("2.5", 1): 9, ("2.5", 2): 10}
+
+_normalized_lock = threading.Lock()
+
+
+def measure_lufs(seg: AudioSegment) -> float | None:
+    """Loudness integrado (LUFS) do segmento; None se for silêncio."""
+    from core.loudness import integrated_loudness
+
+    lufs = integrated_loudness(seg)
+    if lufs is None or lufs < -60:
+        return None
+    return lufs
+
+
+def normalized_track(music_path: Path) -> tuple[Path, float] | None:
+    """
+    Versão da música normalizada para FINAL_LUFS, encodada uma vez e reaproveitada
+    (chave: caminho + mtime + tamanho). Retorna (arquivo MP3, ganho aplicado em dB) ou None
+    se não der para medir o loudness.
+    """
+    st = Path(music_path).stat()
+    blob = f"{Path(music_path).resolve()}|{st.st_mtime_ns}|{st.st_size}|{FINAL_LUFS}|{MP3_BITRATE}"
+    key = hashlib.sha1(blob.encode("utf-8")).hexdigest()[:20]
+    mp3, meta = NORMALIZED_DIR / f"{key}.mp3", NORMALIZED_DIR / f"{key}.json"
+    with _normalized_lock:
+        if mp3.is_file() and meta.is_file():
+            try:
+                gain = json.loads(meta.read_text(encoding="utf-8"))["gain_db"]
+                os.utime(meta)
+                return mp3, float(gain)
+            except (OSError, ValueError, KeyError):
+                pass
+        seg = load_audio(music_path)
+        lufs = measure_lufs(seg)
+        if lufs is None:
+            return None
+        gain = FINAL_LUFS - lufs
+        NORMALIZED_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = mp3.with_name(f".{mp3.name}.{os.getpid()}.tmp")
+        codec().encode(seg.apply_gain(gain), tmp)
+        os.replace(tmp, mp3)
+        tmp = meta.with_name(f".{meta.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"source": str(music_path), "lufs": round(lufs, 2), "gain_db": round(gain, 3)}), encoding="utf-8")
+        os.replace(tmp, meta)
+        _prune_normalized()
+        return mp3, gain
+
+
+def _prune_normalized() -> None:
+    """Mantém as NORMALIZED_MAX_FILES músicas normalizadas usadas mais recentemente."""
+    metas = sorted(NORMALIZED_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for meta in metas[:-NORMALIZED_MAX_FILES]:
+        meta.with_suffix(".mp3").unlink(missing_ok=True)
+        meta.unlink(missing_ok=True)
+
+
+def _payload_start(stream: Mp3Stream, pos: int) -> int:
+    """Início dos dados do quadro em pos (depois do cabeçalho, CRC e side info)."""
+    crc = 0 if stream.data[pos + 1] & 0x01 else 2
+    return pos + 4 + crc + _side_info_size(stream.version, stream.channels)
+
+
+def _main_data_size(stream: Mp3Stream, pos: int) -> int:
+    """Bytes de dados de áudio do quadro (soma de part2_3_length de granulos e canais)."""
+    n = _side_info_size(stream.version, stream.channels)
+    side = _payload_start(stream, pos) - n
+    bits = int.from_bytes(stream.data[side:side + n], "big")
+    first, block = _GRANULE_START[(stream.version, stream.channels)], _GRANULE_BITS[stream.version]
+    granules = (2 if stream.version == "1" else 1) * stream.channels
+    total = sum((bits >> (n * 8 - first - g * block - 12)) & 0xFFF for g in range(granules))
+    return (total + 7) // 8
+
+
+def _reservoir_before(stream: Mp3Stream, index: int) -> bytes:
+    """
+    Bytes do reservatório que os quadros a partir de index buscam antes dele: os últimos
+    bytes de dados dos quadros anteriores, na ordem do stream.
+    """
+    need, ahead = 0, 0
+    for pos, size in stream.frames[index:]:
+        if ahead >= 511:
+            break
+        need = max(need, _main_data_begin(stream, pos) - ahead)
+        ahead += pos + size - _payload_start(stream, pos)
+    chunks: list[bytes] = []
+    have = 0
+    k = index - 1
+    while have < need and k >= 0:
+        pos, size = stream.frames[k]
+        chunk = stream.data[_payload_start(stream, pos):pos + size]
+        chunks.insert(0, chunk)
+        have += len(chunk)
+        k -= 1
+    return b"".join(chunks)[-need:] if need else b""
+
+
+def _bridge_frame(stream: Mp3Stream, index: int, reservoir: bytes) -> bytes | None:
+    """
+    Quadro index regravado com bitrate maior (mesma duração, mesma side info e dados) e os
+    bytes de reservoir no fim: o que os quadros seguintes (de outro stream) esperam encontrar.
+    None se nem o maior bitrate couber.
+    """
+    pos, size = stream.frames[index]
+    start = _payload_start(stream, pos)
+    head = start - pos
+    used = max(0, _main_data_size(stream, pos) - _main_data_begin(stream, pos))
+    if used > pos + size - start:
+        return None
+    h = bytearray(stream.data[pos:pos + 4])
+    h[2] &= 0xFD
+    while True:
+        info = _frame_info(bytes(h), 0)
+        if info is None:
+            return None
+        if info[5] - head >= used + len(reservoir):
+            break
+        if (h[2] >> 4) >= 14:
+            return None
+        h[2] += 0x10
+    frame = bytearray(info[5])
+    frame[:4] = h
+    frame[4:start - pos + used] = stream.data[pos + 4:start + used]
+    if reservoir:
+        frame[len(frame) - len(reservoir):] = reservoir
+    if not (h[1] & 0x01):
+        side = bytes(frame[6:head])
+        frame[4:6] = _crc16(bytes(h[2:4]) + side).to_bytes(2, "big")
+    return bytes(frame)
+
+
+def _ducked_mix_spliced(music_path: Path, voice_path: Path, output_path: Path) -> bool:
+    """
+    Mix com ducking por emenda de quadros (ver o comentário da seção). False quando não dá
+    para emendar (o chamador renderiza a faixa inteira).
+    """
+    normalized = normalized_track(music_path)
+    if normalized is None:
+        return False
+    tail_path, gain_db = normalized
+    tail = parse_mp3(tail_path.read_bytes())
+    music = load_audio(music_path)
+    if tail is None or tail.layer != 3 or (tail.sample_rate, tail.channels) != (music.frame_rate, music.channels):
+        return False
+    voice = codec().decode(voice_path)
+    spf = tail.samples_per_frame
+    lead = (tail.delay or _ENCODER_DELAY) + _DECODER_DELAY
+    release_end = (len(voice) + DUCK_RELEASE_MS) * music.frame_rate // 1000
+    # Primeiro quadro da versão normalizada: depois do fim da rampa (com um quadro de folga)
+    seam = -(-(release_end + lead) // spf) + 1
+    if seam + 2 >= len(tail.frames):
+        return False
+    # A introdução vai um pouco além da emenda: o encoder olha amostras à frente
+    intro_samples = min(int(music.frame_count()), seam * spf - lead + 2 * spf)
+    intro = _ducked_intro(music.get_sample_slice(0, intro_samples), voice, gain_db)
+    tmp = output_path.with_name(f".{output_path.name}.intro.{os.getpid()}.tmp")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        codec().encode(intro, tmp)
+        head = parse_mp3(tmp.read_bytes())
+    finally:
+        tmp.unlink(missing_ok=True)
+    if head is None or head.format != tail.format or len(head.frames) < seam:
+        return False
+    if head.delay and tail.delay and head.delay != tail.delay:
+        return False
+    bridge = _bridge_frame(head, seam - 1, _reservoir_before(tail, seam))
+    if bridge is None:
+        return False
+    chunks: list[bytes | memoryview] = []
+    if seam > 1:
+        chunks.extend(_frame_runs(head, head.frames[:seam - 1]))
+    chunks.append(bridge)
+    chunks.extend(_frame_runs(tail, tail.frames[seam:]))
+    frames = len(tail.frames)
+    audio_bytes = sum(len(c) for c in chunks)
+    with open(output_path, "wb") as f:
+        f.write(_xing_frame(tail, frames, audio_bytes, cbr=False))
+        for c in chunks:
+            f.write(c)
+    return True
@@ -6,11 +6,16 @@ Scraper Louveira: notícias locais do site da prefeitura para roteiro ~2 min, pe
 
 import os
 import re
+import threading
+import time
+from collections import deque
+
 from dotenv import load_dotenv
-import feedparser
-import google.generativeai as genai
-import requests
-from bs4 import BeautifulSoup
+
+from core import feeds, jobs, quota
+
+# feedparser, requests, bs4 e google.generativeai são importados dentro das funções que os
+# usam: o servidor web importa este módulo sem carregar nenhuma dessas bibliotecas.
 
 # URL do RSS Google News (pt-BR). Altere 'q=' para testar outras fontes:
 # Ex.: "dicas+de+IA" | "Louveira+SP" | "notícias+Louveira"
@@ -45,6 +50,10 @@ def fetch_news_louveira(feed_url: str | None = None) -> list[dict]:
     informado, usa essa URL; senão usa LOUVEIRA_JSON_FEED. Entra em cada URL e extrai
     o corpo da matéria (scraping). Retorna lista com 'title', 'url' e 'summary'.
     """
+    import feedparser
+    import requests
+    from bs4 import BeautifulSoup
+
     url = (feed_url or "").strip() or LOUVEIRA_JSON_FEED
     try:
         r = requests.get(url, timeout=LOUVEIRA_TIMEOUT, headers=LOUVEIRA_HEADERS)
@@ -107,14 +116,17 @@ def fetch_news_louveira(feed_url: str | None = None) -> list[dict]:
     return out
 
 
-def fetch_news() -> list[dict]:
+def fetch_news(rss_url: str | None = None, limit: int = TOP_N) -> list[dict]:
     """
-    Busca as notícias no RSS do Google News (GOOGLE_NEWS_RSS).
+    Busca as notícias no RSS do Google News (GOOGLE_NEWS_RSS) ou em rss_url (rádio com fonte própria).
+    limit: quantos itens ler (o índice de matérias pede uma janela maior que TOP_N).
     Retorna lista de entradas com 'title' e 'summary' (ou 'description').
     """
-    feed = feedparser.parse(GOOGLE_NEWS_RSS)
+    import feedparser
+
+    feed = feedparser.parse(rss_url or GOOGLE_NEWS_RSS)
     entries = []
-    for entry in feed.entries[:TOP_N]:
+    for entry in feed.entries[:limit]:
         title = entry.get("title", "").strip()
         summary = (
             entry.get("summary", "")
@@ -141,6 +153,14 @@ def build_script_prompt(news: list[dict]) -> str:
 
 MIN_WORDS = 280
 MAX_RETRIES = 2
+# Alvo de tamanho usado para pedir a continuação (meio da faixa 320–380)
+TARGET_WORDS = 350
+# "stream": streaming + continuação só do que falta; "retry": regenera o roteiro inteiro (modo antigo)
+SCRIPT_MODE = (os.getenv("SCRIPT_GENERATION_MODE") or "stream").strip().lower()
+# Últimas gerações de roteiro (latência, tokens, chamadas) para script_stats()
+SCRIPT_LOG_SIZE = 200
+_script_log: deque = deque(maxlen=SCRIPT_LOG_SIZE)
+_stats_lock = threading.Lock()
 
 
 def _count_words(text: str) -> int:
@@ -152,8 +172,11 @@ def generate_radio_script(news: list[dict], long_form: bool = False) -> str:
     """
     Usa o Gemini para roteiro de rádio.
     long_form=True: exige ~2 min (320–380 palavras), para boletim Louveira.
-    Faz retry automático se o texto vier com menos de MIN_WORDS palavras.
+    Se o texto vier com menos de MIN_WORDS palavras: no modo "stream" (padrão) pede só a
+    continuação; no modo "retry" (SCRIPT_GENERATION_MODE=retry) gera o roteiro de novo.
     """
+    import google.generativeai as genai
+
     api_key = _get_api_key()
     genai.configure(api_key=api_key)
 
@@ -191,30 +214,159 @@ Regras OBRIGATÓRIAS (siga TODAS sem exceção):
     else:
         user_prompt = user_head + news_text + "\n\nGere somente o texto do roteiro. Lembre-se: mínimo 320 palavras, desenvolva cada notícia."
 
+    if SCRIPT_MODE == "retry":
+        return _generate_with_retries(model, user_prompt, news_text, long_form, max_tokens)
+    return _generate_streaming(model, user_prompt, news_text, long_form, max_tokens)
+
+
+def _usage(response) -> tuple[int | None, int | None]:
+    """Tokens de entrada e de saída informados pelo Gemini (None se não vier)."""
+    meta = getattr(response, "usage_metadata", None)
+    if meta is None:
+        return None, None
+    return getattr(meta, "prompt_token_count", None), getattr(meta, "candidates_token_count", None)
+
+
+def _record_script(mode: str, attempts: list[dict], words: int) -> None:
+    """Guarda a geração de um roteiro (latência total, tokens, chamadas) para script_stats()."""
+    with _stats_lock:
+        _script_log.append({
+            "mode": mode,
+            "latency_ms": sum(a["latency_ms"] for a in attempts),
+            "calls": len(attempts),
+            "prompt_tokens": sum(a.get("prompt_tokens") or 0 for a in attempts),
+            "output_tokens": sum(a.get("output_tokens") or 0 for a in attempts),
+            "words": words,
+            "attempts": attempts,
+        })
+
+
+def _stream_attempt(model, prompt: str, temperature: float, max_tokens: int, kind: str) -> tuple[str, dict]:
+    """
+    Uma chamada em streaming: junta o texto conforme chega (palavras contadas no texto
+    final; um pedaço pode cortar uma palavra no meio). Retorna (texto, métricas da chamada).
+    """
+    t0 = time.perf_counter()
+    first_ms = None
+    parts: list[str] = []
+    response = model.generate_content(
+        prompt,
+        generation_config={"temperature": temperature, "max_output_tokens": max_tokens},
+        stream=True,
+    )
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Pedaço sem texto (ex.: só metadados ou bloqueio de segurança)
+            continue
+        if not text:
+            continue
+        if first_ms is None:
+            first_ms = int((time.perf_counter() - t0) * 1000)
+        parts.append(text)
+    prompt_tokens, output_tokens = _usage(response)
+    text = "".join(parts).strip()
+    return text, {
+        "kind": kind,
+        "latency_ms": int((time.perf_counter() - t0) * 1000),
+        "first_token_ms": first_ms,
+        "words": _count_words(text),
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+    }
+
+
+def _continuation_prompt(script: str, news_text: str, long_form: bool) -> str:
+    """Pede só o trecho que falta, a partir de onde o roteiro parou (sem reescrever o começo)."""
+    wc = _count_words(script)
+    missing = max(60, TARGET_WORDS - wc)
+    order = (
+        "Mantenha as 3 matérias na ordem das notícias, com [pausa] entre elas; desenvolva as que ficaram curtas ou faltaram."
+        if long_form else
+        "Desenvolva as notícias que ficaram curtas ou faltaram, com contexto e detalhes, usando [pausa] entre blocos."
+    )
+    return (
+        f"O roteiro abaixo está incompleto: tem {wc} palavras e precisa de pelo menos {MIN_WORDS}. "
+        f"Escreva APENAS a continuação, com cerca de {missing} palavras, começando exatamente de onde o texto parou. "
+        f"Não repita nada do que já foi dito e não faça nova abertura. {order}\n\n"
+        f"Notícias:\n\n{news_text}\n\nRoteiro até agora:\n\n{script}\n\nContinuação:"
+    )
+
+
+def _generate_streaming(model, user_prompt: str, news_text: str, long_form: bool, max_tokens: int) -> str:
+    """
+    Modo streaming: uma geração completa; se vier curta, pede só a continuação (até
+    MAX_RETRIES vezes) em vez de regenerar o roteiro inteiro.
+    """
+    attempts: list[dict] = []
+    script = ""
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            if not script:
+                temp = 0.6 + (attempt * 0.15)
+                text, info = quota.call("gemini", _stream_attempt, model, user_prompt, min(temp, 1.0), max_tokens, "initial")
+                script = text
+            else:
+                prompt = _continuation_prompt(script, news_text, long_form)
+                text, info = quota.call("gemini", _stream_attempt, model, prompt, 0.6, max_tokens, "continuation")
+                if text:
+                    script = script.rstrip() + " " + text
+            attempts.append(info)
+            if script and _count_words(script) >= MIN_WORDS:
+                break
+    finally:
+        if attempts:
+            _record_script("stream", attempts, _count_words(script) if script else 0)
+
+    if not script:
+        raise RuntimeError("Gemini não retornou texto para o roteiro.")
+    return script
+
+
+def _timed_generate(model, prompt: str, temperature: float, max_tokens: int):
+    """Chamada sem streaming; retorna (resposta, latência em ms sem a espera na fila de cota)."""
+    t0 = time.perf_counter()
+    response = model.generate_content(
+        prompt,
+        generation_config={
+            "temperature": temperature,
+            "max_output_tokens": max_tokens,
+        },
+    )
+    return response, int((time.perf_counter() - t0) * 1000)
+
+
+def _generate_with_retries(model, user_prompt: str, news_text: str, long_form: bool, max_tokens: int) -> str:
+    """Modo antigo: regenera o roteiro inteiro (temperatura maior) enquanto vier curto."""
     best_script = ""
     best_words = 0
+    attempts: list[dict] = []
 
     for attempt in range(MAX_RETRIES + 1):
         temp = 0.6 + (attempt * 0.15)
-        response = model.generate_content(
-            user_prompt,
-            generation_config={
-                "temperature": min(temp, 1.0),
-                "max_output_tokens": max_tokens,
-            },
-        )
+        response, latency_ms = quota.call("gemini", _timed_generate, model, user_prompt, min(temp, 1.0), max_tokens)
+        prompt_tokens, output_tokens = _usage(response)
+        attempts.append({
+            "kind": "initial" if attempt == 0 else "retry",
+            "latency_ms": latency_ms,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+        })
 
         if not response.text:
             continue
 
         script = response.text.strip()
         wc = _count_words(script)
+        attempts[-1]["words"] = wc
 
         if wc > best_words:
             best_script = script
             best_words = wc
 
         if wc >= MIN_WORDS:
+            _record_script("retry", attempts, wc)
             return script
 
         if long_form:
@@ -232,20 +384,57 @@ Regras OBRIGATÓRIAS (siga TODAS sem exceção):
                 "\n\nGere somente o texto do roteiro completo. MÍNIMO 350 palavras."
             )
 
+    _record_script("retry", attempts, best_words)
     if not best_script:
         raise RuntimeError("Gemini não retornou texto para o roteiro.")
 
     return best_script
 
 
-def run() -> str:
+def _percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def script_stats() -> dict:
     """
-    Fluxo principal (RSS Google News): busca notícias, gera roteiro e retorna o texto.
+    Resumo das últimas gerações por modo: latência p50/p95 do roteiro (todas as chamadas
+    somadas), chamadas e tokens médios por roteiro, roteiros que ficaram abaixo de MIN_WORDS.
     """
-    news = fetch_news()
+    with _stats_lock:
+        rows = list(_script_log)
+    out: dict[str, dict] = {}
+    for mode in sorted({r["mode"] for r in rows}):
+        mine = [r for r in rows if r["mode"] == mode]
+        lat = [r["latency_ms"] for r in mine]
+        n = len(mine)
+        out[mode] = {
+            "scripts": n,
+            "latencyP50Ms": _percentile(lat, 0.5),
+            "latencyP95Ms": _percentile(lat, 0.95),
+            "avgCalls": round(sum(r["calls"] for r in mine) / n, 2),
+            "avgPromptTokens": round(sum(r["prompt_tokens"] for r in mine) / n),
+            "avgOutputTokens": round(sum(r["output_tokens"] for r in mine) / n),
+            "short": sum(1 for r in mine if r["words"] < MIN_WORDS),
+        }
+    return out
+
+
+def run(rss_url: str | None = None, news: list[dict] | None = None, sources: list | None = None) -> str:
+    """
+    Fluxo principal (RSS Google News ou rss_url): busca notícias, gera roteiro e retorna o texto.
+    news: matérias já escolhidas (ex.: pelo índice de matérias da semana); não busca o RSS.
+    sources: várias fontes (core.feeds.FeedSource); as TOP_N melhores do agregador.
+    """
+    if news is None:
+        with jobs.stage("noticias"):
+            news = feeds.fetch(sources, TOP_N) if sources else fetch_news(rss_url)
     if not news:
         raise RuntimeError("Nenhuma notícia encontrada no RSS.")
-    return generate_radio_script(news)
+    with jobs.stage("roteiro"):
+        return generate_radio_script(news)
 
 
 def run_louveira(feed_url: str | None = None) -> str:
@@ -253,10 +442,12 @@ def run_louveira(feed_url: str | None = None) -> str:
     Fluxo boletim por feed: usa a URL do feed (JSON ou RSS/Atom) informada ou o padrão,
     pega as 3 notícias mais recentes, scraping do corpo, gera roteiro ~2 min (long_form).
     """
-    news = fetch_news_louveira(feed_url=feed_url)
+    with jobs.stage("feed"):
+        news = fetch_news_louveira(feed_url=feed_url)
     if not news:
         raise RuntimeError("Nenhuma notícia encontrada no feed.")
-    return generate_radio_script(news, long_form=True)
+    with jobs.stage("roteiro"):
+        return generate_radio_script(news, long_form=True)
 
 
 def parse_pasted_source(text: str) -> list[dict]:
@@ -267,6 +458,8 @@ def parse_pasted_source(text: str) -> list[dict]:
     - Quebra em blocos por linha em branco dupla, '---' ou 'Notícia N:'.
     - Cada bloco: primeira linha = título, resto = resumo (até TOP_N blocos).
     """
+    from bs4 import BeautifulSoup
+
     if not (text or "").strip():
         return []
     raw = text.strip()
@@ -307,7 +500,8 @@ def run_from_pasted_source(text: str) -> str:
             "Nenhuma notícia encontrada no texto. Cole o conteúdo de uma ou mais notícias "
             "(título e texto), separando cada notícia por uma linha em branco ou por '---'."
         )
-    return generate_radio_script(news, long_form=True)
+    with jobs.stage("roteiro"):
+        return generate_radio_script(news, long_form=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+"""
+Playout - Rádio IA
+Motor de reprodução do player de linha de comando (pygame). Enfileira o próximo item no
+mixer (pygame.mixer.music.queue) enquanto o atual toca, assim a troca acontece dentro do
+SDL sem reabrir o arquivo na hora; o loop dorme em pygame.event.wait() e acorda pelo evento
+de fim de faixa (set_endevent), sem polling. Mede o intervalo entre o fim de um item (chegada
+do evento de fim, postado pelo SDL quando a faixa para de tocar) e o início real do próximo
+(get_pos() volta a zero na faixa nova: início = agora - get_pos()), para confirmar que a troca
+é praticamente sem silêncio. Fechar a janela/encerrar (pygame.QUIT) para o loop.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import pygame
+
+# Sem item para enfileirar: pergunta de novo nesse intervalo enquanto o atual toca
+LOOKAHEAD_RETRY_SEC = 2.0
+# Quantas medições de intervalo guardar para as estatísticas
+GAP_HISTORY = 200
+# Quanto esperar o áudio de um item carregado na mão começar (get_pos() > 0) ao medir o intervalo
+START_PROBE_SEC = 1.0
+
+
+@dataclass
+class PlayoutItem:
+    """Um item da programação; on_done é chamado quando ele termina (ex.: apagar arquivos)."""
+
+    path: Path
+    kind: str = "music"
+    on_done: Callable[[], None] | None = None
+
+
+class PlayoutEngine:
+    """
+    next_item(final): próximo item da programação. final=False é a antecipação (pode retornar
+    None para "ainda não": o motor tenta de novo depois); final=True é a hora de tocar (o atual
+    acabou e não havia nada na fila), quando a programação deve decidir (ex.: música no lugar
+    de um segmento atrasado). None com final=True = nada para tocar agora.
+    """
+
+    def __init__(
+        self,
+        next_item: Callable[[bool], PlayoutItem | None],
+        retry_sec: float = LOOKAHEAD_RETRY_SEC,
+    ) -> None:
+        self.next_item = next_item
+        self.retry_sec = retry_sec
+        self.end_event = pygame.USEREVENT + 1
+        self.current: PlayoutItem | None = None
+        self.queued: PlayoutItem | None = None
+        self._gaps_ms: list[float] = []
+        self._transitions = 0
+        self._queued_hits = 0
+        self._lock = threading.Lock()
+
+    def _init_events(self) -> None:
+        # A fila de eventos do pygame exige o subsistema de vídeo; sem janela, driver "dummy"
+        if not pygame.display.get_init():
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            pygame.display.init()
+        pygame.mixer.music.set_endevent(self.end_event)
+
+    def _start(self, item: PlayoutItem) -> None:
+        pygame.mixer.music.load(str(item.path))
+        pygame.mixer.music.play()
+        self.current = item
+
+    def _try_queue(self) -> None:
+        """Antecipação: coloca o próximo item na fila do mixer, se a programação já o tem."""
+        if self.queued is not None or self.current is None:
+            return
+        item = self.next_item(False)
+        if item is None:
+            return
+        pygame.mixer.music.queue(str(item.path))
+        self.queued = item
+
+    def _finish(self, item: PlayoutItem | None) -> None:
+        if item is not None and item.on_done is not None:
+            try:
+                item.on_done()
+            except Exception:
+                pass
+
+    def _record_gap(self, gap_ms: float, queued: bool) -> None:
+        with self._lock:
+            self._transitions += 1
+            if queued:
+                self._queued_hits += 1
+            self._gaps_ms.append(gap_ms)
+            if len(self._gaps_ms) > GAP_HISTORY:
+                del self._gaps_ms[0]
+
+    @staticmethod
+    def _audio_started_at(timeout: float = START_PROBE_SEC) -> float | None:
+        """
+        Instante (perf_counter) em que a faixa atual começou a soar: get_pos() conta o áudio
+        já tocado desde o início dela. Logo após play() ainda pode ser 0/-1: espera avançar.
+        None se não começou dentro do prazo.
+        """
+        deadline = time.perf_counter() + timeout
+        while True:
+            pos = pygame.mixer.music.get_pos()
+            now = time.perf_counter()
+            if pos > 0:
+                return now - pos / 1000
+            if now >= deadline:
+                return None
+            time.sleep(0.005)
+
+    def _on_end(self, t_end: float) -> None:
+        """
+        Fim do item atual (t_end = chegada do evento de fim): o enfileirado já começou (troca
+        no SDL) ou carregamos o próximo. Intervalo = início real do novo - t_end.
+        """
+        finished, self.current = self.current, None
+        queued = False
+        if self.queued is not None:
+            self.current, self.queued = self.queued, None
+            queued = pygame.mixer.music.get_busy()
+            if not queued:
+                # A fila não engatou (arquivo inválido?): carrega na mão
+                self._start(self.current)
+        else:
+            self._finish(finished)
+            finished = None
+            item = self.next_item(True)
+            if item is None:
+                return
+            self._start(item)
+        started = self._audio_started_at()
+        if started is not None:
+            self._record_gap(max(0.0, started - t_end) * 1000, queued=queued)
+        self._finish(finished)
+
+    def run(self, stop: threading.Event | None = None) -> None:
+        """Toca até stop ser sinalizado (ou para sempre). Bloqueia a thread chamadora."""
+        self._init_events()
+        try:
+            while stop is None or not stop.is_set():
+                if self.current is None:
+                    item = self.next_item(True)
+                    if item is None:
+                        if pygame.event.wait(int(self.retry_sec * 1000)).type == pygame.QUIT:
+                            break
+                        continue
+                    self._start(item)
+                self._try_queue()
+                # Com o próximo já na fila, só o fim de faixa interessa; sem ele, acorda para tentar de novo
+                if self.queued is None:
+                    event = pygame.event.wait(int(self.retry_sec * 1000))
+                else:
+                    event = pygame.event.wait()
+                if event.type == pygame.QUIT:
+                    break
+                if event.type == self.end_event:
+                    self._on_end(time.perf_counter())
+        finally:
+            pygame.mixer.music.set_endevent()
+            self._finish(self.current)
+            self._finish(self.queued)
+            self.current = self.queued = None
+
+    def stats(self) -> dict:
+        """Transições, quantas foram pela fila do mixer e intervalo entre itens (ms)."""
+        with self._lock:
+            gaps = sorted(self._gaps_ms)
+            transitions, hits = self._transitions, self._queued_hits
+        if not gaps:
+            return {"transitions": transitions, "queued": hits, "gapAvgMs": None, "gapP95Ms": None, "gapMaxMs": None}
+        return {
+            "transitions": transitions,
+            "queued": hits,
+            "gapAvgMs": round(sum(gaps) / len(gaps), 2),
+            "gapP95Ms": round(gaps[min(len(gaps) - 1, int(len(gaps) * 0.95))], 2),
+            "gapMaxMs": round(gaps[-1], 2),
+        }
@@ -0,0 +1,348 @@
+"""
+Playout Plan - Rádio IA
+Plano da programação da semana, calculado de uma vez: sequência de posições (notícia ou
+música) a partir da posição atual do ciclo, com a rotação das músicas já respeitando a
+janela de não repetição (HISTORY_SIZE) e, opcionalmente, notícia a cada N minutos no lugar
+do ciclo fixo. "O que toca agora" vira consulta por índice: posição do ciclo (StateStore) -
+posição inicial do plano.
+
+Arquivo binário compacto (<work_dir>/playout_plan.bin), gravado de forma atômica e lido por
+todos os processos (servidor web, gerador, pré-aquecimento):
+  cabeçalho  struct HEADER (magic, versão, ciclo, criado em, posição inicial, posições, tamanho da tabela)
+  tabela     JSON utf-8: semana ISO, blocos (na ordem da fila) e faixas
+  posições   uint32 por posição: NEWS_FLAG | ordem do bloco, ou índice da faixa
+  início     uint32 por posição: segundos estimados desde o início do plano
+Notícia com ordem >= len(blocos) = bloco ainda não produzido (a fila decide na hora).
+Quando só a fila de blocos muda, with_blocks() reaproveita o plano: as músicas já planejadas
+ficam e só a tabela de blocos e os inícios estimados são refeitos.
+"""
+
+import json
+import os
+import random
+import struct
+import sys
+import threading
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from core.mixer import HISTORY_SIZE
+
+PLAN_NAME = "playout_plan.bin"
+PLAN_MAGIC = b"RPLN"
+PLAN_VERSION = 1
+# magic, versão, ciclo, criado em (epoch s), posição inicial, nº de posições, bytes da tabela
+HEADER = struct.Struct("<4sHHqqII")
+# Bit de notícia na posição; sem ele, o valor é o índice da faixa
+NEWS_FLAG = 1 << 31
+# Posição de música sem faixa (pasta vazia): a programação decide na hora
+NO_TRACK = NEWS_FLAG - 1
+# Horizonte do plano (h de programação estimada) e teto de posições
+PLAN_HOURS = 7 * 24
+MAX_SLOTS = 20000
+# Duração estimada quando o manifest/índice da biblioteca ainda não sabe (s)
+DEFAULT_BLOCK_SEC = 120.0
+DEFAULT_TRACK_SEC = 210.0
+
+_lock = threading.Lock()
+# Cache por arquivo: ((mtime_ns, tamanho), plano)
+_cache: dict[str, tuple[tuple[int, int], "PlayoutPlan"]] = {}
+
+
+def week_id(now: datetime | None = None) -> str:
+    """Semana ISO ("2026-W42"): plano de outra semana é refeito."""
+    now = now or datetime.now(timezone.utc)
+    year, week, _ = now.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+@dataclass(frozen=True)
+class Slot:
+    """Uma posição do plano: kind "news" (name = bloco ou None) ou "music" (name = faixa)."""
+
+    position: int
+    kind: str
+    name: str | None
+    start_sec: int
+
+
+class PlayoutPlan:
+    """Plano carregado: arrays de posições e inícios + tabela de nomes. Consultas O(1)."""
+
+    def __init__(
+        self,
+        start_position: int,
+        cycle_len: int,
+        built_at: int,
+        week: str,
+        blocks: list[str],
+        tracks: list[str],
+        slots: array,
+        starts: array,
+    ) -> None:
+        self.start_position = start_position
+        self.cycle_len = cycle_len
+        self.built_at = built_at
+        self.week = week
+        self.blocks = blocks
+        self.tracks = tracks
+        self._slots = slots
+        self._starts = starts
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def covers(self, position: int) -> bool:
+        return 0 <= position - self.start_position < len(self._slots)
+
+    def kind_at(self, position: int) -> str | None:
+        """"news"/"music" na posição; None fora do plano (o ciclo fixo decide)."""
+        i = position - self.start_position
+        if not 0 <= i < len(self._slots):
+            return None
+        return "news" if self._slots[i] & NEWS_FLAG else "music"
+
+    def slot(self, position: int) -> Slot | None:
+        i = position - self.start_position
+        if not 0 <= i < len(self._slots):
+            return None
+        value = self._slots[i]
+        if value & NEWS_FLAG:
+            ordinal = value & ~NEWS_FLAG
+            name = self.blocks[ordinal] if ordinal < len(self.blocks) else None
+            return Slot(position, "news", name, self._starts[i])
+        name = self.tracks[value] if value != NO_TRACK else None
+        return Slot(position, "music", name, self._starts[i])
+
+    def track_at(self, position: int) -> str | None:
+        """Faixa planejada para a posição (None se não for música ou estiver fora do plano)."""
+        i = position - self.start_position
+        if not 0 <= i < len(self._slots):
+            return None
+        value = self._slots[i]
+        if value & NEWS_FLAG or value == NO_TRACK:
+            return None
+        return self.tracks[value]
+
+    def upcoming(self, position: int, n: int) -> list[Slot]:
+        """As próximas n posições a partir de position (inclusive)."""
+        end = min(position + n, self.start_position + len(self._slots))
+        return [self.slot(p) for p in range(max(position, self.start_position), end)]
+
+    def music_before(self, position: int, n: int) -> list[str]:
+        """Últimas n faixas planejadas antes de position (semente da rotação do próximo plano)."""
+        found: list[str] = []
+        p = min(position, self.start_position + len(self._slots)) - 1
+        while p >= self.start_position and len(found) < n:
+            track = self.track_at(p)
+            if track is not None:
+                found.append(track)
+            p -= 1
+        return found[::-1]
+
+    def with_blocks(self, start_position: int, blocks: list[tuple[str, float | None]]) -> "PlayoutPlan":
+        """
+        O mesmo plano a partir de start_position com outra fila de blocos (nome, duração s):
+        as posições de música e de notícia ficam; a ordem dos blocos recomeça da frente da fila
+        e os inícios são recalculados (música com a duração que já tinha no plano).
+        ValueError se start_position estiver fora do plano.
+        """
+        first = start_position - self.start_position
+        if not 0 <= first < len(self._slots):
+            raise ValueError("Posição fora do plano")
+        block_sec = _block_sec(blocks)
+        last = len(self._slots) - 1
+        slots, starts = array("I"), array("I")
+        elapsed = 0.0
+        ordinal = 0
+        for i in range(first, last + 1):
+            value = self._slots[i]
+            starts.append(int(elapsed))
+            if value & NEWS_FLAG:
+                slots.append(NEWS_FLAG | ordinal)
+                duration = (blocks[ordinal][1] if ordinal < len(blocks) else None) or block_sec
+                ordinal += 1
+            else:
+                slots.append(value)
+                duration = self._starts[i + 1] - self._starts[i] if i < last else DEFAULT_TRACK_SEC
+            elapsed += duration
+        return PlayoutPlan(
+            start_position=start_position,
+            cycle_len=self.cycle_len,
+            built_at=int(datetime.now(timezone.utc).timestamp()),
+            week=self.week,
+            blocks=[name for name, _ in blocks],
+            tracks=self.tracks,
+            slots=slots,
+            starts=starts,
+        )
+
+    def stats(self, position: int | None = None) -> dict:
+        last = self._starts[-1] if len(self._starts) else 0
+        news = sum(1 for v in self._slots if v & NEWS_FLAG)
+        out = {
+            "week": self.week,
+            "builtAt": datetime.fromtimestamp(self.built_at, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "startPosition": self.start_position,
+            "slots": len(self._slots),
+            "newsSlots": news,
+            "blocksKnown": len(self.blocks),
+            "tracks": len(self.tracks),
+            "hours": round(last / 3600, 1),
+            "bytes": HEADER.size + len(self._slots) * 8,
+        }
+        if position is not None:
+            out["position"] = position
+            out["remainingSlots"] = max(0, self.start_position + len(self._slots) - position)
+        return out
+
+    def to_bytes(self) -> bytes:
+        table = json.dumps(
+            {"week": self.week, "blocks": self.blocks, "tracks": self.tracks}, ensure_ascii=False
+        ).encode("utf-8")
+        slots, starts = array("I", self._slots), array("I", self._starts)
+        if sys.byteorder == "big":
+            slots.byteswap()
+            starts.byteswap()
+        header = HEADER.pack(
+            PLAN_MAGIC, PLAN_VERSION, self.cycle_len, self.built_at, self.start_position, len(slots), len(table)
+        )
+        return header + table + slots.tobytes() + starts.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "PlayoutPlan":
+        """Lê o arquivo; ValueError se não for um plano desta versão ou estiver truncado."""
+        if len(data) < HEADER.size:
+            raise ValueError("Plano truncado")
+        magic, version, cycle_len, built_at, start, count, table_len = HEADER.unpack_from(data)
+        if magic != PLAN_MAGIC or version != PLAN_VERSION:
+            raise ValueError("Plano de outra versão")
+        offset = HEADER.size
+        if len(data) != offset + table_len + count * 8:
+            raise ValueError("Plano truncado")
+        table = json.loads(data[offset:offset + table_len].decode("utf-8"))
+        offset += table_len
+        slots, starts = array("I"), array("I")
+        slots.frombytes(data[offset:offset + count * 4])
+        starts.frombytes(data[offset + count * 4:offset + count * 8])
+        if sys.byteorder == "big":
+            slots.byteswap()
+            starts.byteswap()
+        return cls(start, cycle_len, built_at, table.get("week") or "", table.get("blocks") or [], table.get("tracks") or [], slots, starts)
+
+
+def _block_sec(blocks: list[tuple[str, float | None]]) -> float:
+    """Duração estimada de notícia sem duração conhecida: média das conhecidas da fila."""
+    known = [d for _, d in blocks if d]
+    return sum(known) / len(known) if known else DEFAULT_BLOCK_SEC
+
+
+def build_plan(
+    start_position: int,
+    blocks: list[tuple[str, float | None]],
+    tracks: list[tuple[str, float | None]],
+    cycle_len: int = 3,
+    hours: float = PLAN_HOURS,
+    news_every_sec: float | None = None,
+    recent: list[str] | None = None,
+    seed: int | str = 0,
+) -> PlayoutPlan:
+    """
+    Monta o plano a partir de start_position até cobrir hours de programação estimada.
+    blocks: fila atual (nome, duração s); tracks: faixas (caminho, duração s); recent: últimas
+    faixas tocadas (a rotação não as repete no começo). Sem news_every_sec, notícia quando
+    posição % cycle_len == 0 (o ciclo de sempre); com ele, notícia quando passou esse tempo
+    desde a última (e pelo menos uma música entre duas notícias).
+    """
+    block_sec = _block_sec(blocks)
+    track_sec = [d or DEFAULT_TRACK_SEC for _, d in tracks]
+    index = {path: i for i, (path, _) in enumerate(tracks)}
+    # Janela de não repetição: como get_next_track, limitada pelo tamanho da biblioteca
+    window = max(0, min(HISTORY_SIZE, len(tracks) - 1))
+    last = [index[p] for p in (recent or []) if p in index][-window:] if window else []
+    rng = random.Random(f"{seed}:{start_position}")
+
+    slots, starts = array("I"), array("I")
+    elapsed = 0.0
+    since_news = news_every_sec if news_every_sec and start_position % cycle_len == 0 else 0.0
+    music_run = 1
+    ordinal = 0
+    position = start_position
+    limit = hours * 3600
+    while elapsed < limit and len(slots) < MAX_SLOTS:
+        if news_every_sec:
+            is_news = since_news >= news_every_sec and music_run > 0
+        else:
+            is_news = position % cycle_len == 0
+        starts.append(int(elapsed))
+        if is_news:
+            slots.append(NEWS_FLAG | ordinal)
+            duration = (blocks[ordinal][1] if ordinal < len(blocks) else None) or block_sec
+            ordinal += 1
+            since_news = 0.0
+            music_run = 0
+        elif tracks:
+            blocked = set(last)
+            choice = rng.choice([i for i in range(len(tracks)) if i not in blocked])
+            slots.append(choice)
+            if window:
+                last.append(choice)
+                if len(last) > window:
+                    del last[0]
+            duration = track_sec[choice]
+            since_news += duration
+            music_run += 1
+        else:
+            slots.append(NO_TRACK)
+            duration = DEFAULT_TRACK_SEC
+            since_news += duration
+            music_run += 1
+        elapsed += duration
+        position += 1
+    return PlayoutPlan(
+        start_position=start_position,
+        cycle_len=cycle_len,
+        built_at=int(datetime.now(timezone.utc).timestamp()),
+        week=week_id(),
+        blocks=[name for name, _ in blocks],
+        tracks=[path for path, _ in tracks],
+        slots=slots,
+        starts=starts,
+    )
+
+
+def write_plan(path: Path, plan: PlayoutPlan) -> None:
+    """Grava o plano de forma atômica (arquivo temporário + os.replace)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(plan.to_bytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_plan(path: Path) -> PlayoutPlan | None:
+    """Plano gravado (None se não existir ou for inválido). Relê o arquivo só se o mtime mudou."""
+    path = Path(path)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    key = str(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+    try:
+        with open(path, "rb") as f:
+            plan = PlayoutPlan.from_bytes(f.read())
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        _cache[key] = (stamp, plan)
+    return plan
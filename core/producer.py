@@ -0,0 +1,161 @@
+"""
+Producer - Rádio IA
+Produção de blocos sob demanda: mede a taxa com que a programação consome blocos de notícia
+e mantém um estoque entre a marca baixa e a alta, dimensionado para a demanda prevista:
+quando o estoque cai abaixo da marca baixa, produz em lote até a marca alta (histerese,
+não um bloco a cada bloco consumido). Gera um bloco por vez, respeitando um orçamento
+diário guardado no StateStore (sobrevive a reinícios e vale para todos os processos), e
+acorda quando a fila baixa (em vez de dormir horas entre verificações). O loop que executa a produção fica no
+agendador central (core/station.py), que reparte o trabalho entre as rádios.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+# Estoque mínimo de blocos prontos: abaixo disso a produção começa na hora
+LOW_WATERMARK = 3
+# Estoque máximo: nunca produz além disso, mesmo com audiência alta
+HIGH_WATERMARK = 15
+# Horizonte de previsão: estoque alvo = consumo previsto nesse período
+LOOKAHEAD_SEC = 12 * 3600
+# Meia-vida da média móvel da taxa de consumo
+RATE_HALF_LIFE_SEC = 3 * 3600
+# Máximo de blocos gerados por dia (orçamento de Gemini + ElevenLabs)
+DAILY_BUDGET = 30
+# Reposição mínima: a marca alta fica pelo menos isso acima da marca baixa (produção em lote)
+MIN_REFILL = 3
+
+
+class BlockProducer:
+    """
+    produce(): gera UM bloco e coloca na fila; retorna True se deu certo.
+    ready_count(): blocos prontos na fila.
+    consumed_count(): contador monotônico de blocos consumidos (pode vir de outro processo).
+    spent_today(dia) / spend(dia): blocos já gerados no dia "AAAA-MM-DD" e registro de mais um
+    (StateStore, compartilhado); sem eles, contagem em memória.
+    """
+
+    def __init__(
+        self,
+        produce: Callable[[], bool],
+        ready_count: Callable[[], int],
+        consumed_count: Callable[[], int],
+        low: int = LOW_WATERMARK,
+        high: int = HIGH_WATERMARK,
+        lookahead_sec: float = LOOKAHEAD_SEC,
+        daily_budget: int = DAILY_BUDGET,
+        wake_event: threading.Event | None = None,
+        spent_today: Callable[[str], int] | None = None,
+        spend: Callable[[str], None] | None = None,
+    ) -> None:
+        self.produce = produce
+        self.ready_count = ready_count
+        self.consumed_count = consumed_count
+        self.low = low
+        self.high = max(high, low)
+        self.lookahead_sec = lookahead_sec
+        self.daily_budget = daily_budget
+        # Evento compartilhado com o agendador (acorda o loop de geração)
+        self._wake = wake_event or threading.Event()
+        self._lock = threading.Lock()
+        self._rate_per_sec = 0.0
+        self._last_sample: tuple[float, int] | None = None
+        self._spent: dict[str, int] = {}
+        self.spent_today = spent_today or (lambda day: self._spent.get(day, 0))
+        self.spend = spend or (lambda day: self._spent.__setitem__(day, self._spent.get(day, 0) + 1))
+        # Reposição em andamento: ligada abaixo da marca baixa, desligada ao chegar na alta
+        self._filling = False
+        self._failures = 0
+
+    def wake(self) -> None:
+        """Acorda o produtor (chamado quando a programação consome um bloco)."""
+        self._wake.set()
+
+    def sample_rate(self) -> float:
+        """Atualiza a média móvel exponencial da taxa de consumo (blocos/s) e retorna."""
+        now = time.monotonic()
+        consumed = self.consumed_count()
+        with self._lock:
+            if self._last_sample is None:
+                self._last_sample = (now, consumed)
+                return self._rate_per_sec
+            t0, c0 = self._last_sample
+            dt = now - t0
+            if dt <= 0:
+                return self._rate_per_sec
+            # Contador reiniciado (processo/estado novo): recomeça a amostragem
+            delta = max(0, consumed - c0)
+            inst = delta / dt
+            alpha = 1.0 - math.exp(-dt * math.log(2) / RATE_HALF_LIFE_SEC)
+            self._rate_per_sec += alpha * (inst - self._rate_per_sec)
+            self._last_sample = (now, consumed)
+            return self._rate_per_sec
+
+    def target(self) -> int:
+        """
+        Marca alta (até onde a reposição enche): consumo previsto no horizonte, entre
+        low + MIN_REFILL e high.
+        """
+        expected = math.ceil(self._rate_per_sec * self.lookahead_sec)
+        return min(self.high, max(self.low + MIN_REFILL, expected))
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _budget_left(self) -> int:
+        return self.daily_budget - self.spent_today(self._today())
+
+    def deficit(self) -> int:
+        """
+        Quantos blocos faltam: 0 enquanto o estoque não cair abaixo da marca baixa; a partir
+        daí, o que falta para a marca alta, até alcançá-la (0 também se o orçamento acabou).
+        """
+        self.sample_rate()
+        if self._budget_left() <= 0:
+            return 0
+        ready = self.ready_count()
+        target = self.target()
+        with self._lock:
+            if not self._filling and ready < self.low:
+                self._filling = True
+            elif self._filling and ready >= target:
+                self._filling = False
+            filling = self._filling
+        return max(0, target - ready) if filling else 0
+
+    def fill_ratio(self) -> float:
+        """Estoque atual / alvo (0 = fila vazia; quanto menor, mais urgente)."""
+        return self.ready_count() / max(1, self.target())
+
+    def produce_one(self) -> bool:
+        """Gera um bloco (conta no orçamento do dia, mesmo se falhar)."""
+        if self._budget_left() <= 0:
+            return False
+        try:
+            ok = self.produce()
+        except Exception:
+            ok = False
+        # Falhas também gastam chamadas de API: contam no orçamento
+        self.spend(self._today())
+        if not ok:
+            with self._lock:
+                self._failures += 1
+        return ok
+
+    def stats(self) -> dict:
+        """Resumo para /api/status e admin."""
+        produced = self.spent_today(self._today())
+        return {
+            "ratePerHour": round(self._rate_per_sec * 3600, 2),
+            "target": self.target(),
+            "low": self.low,
+            "high": self.high,
+            "filling": self._filling,
+            "producedToday": produced,
+            "budgetLeft": self.daily_budget - produced,
+            "failures": self._failures,
+        }
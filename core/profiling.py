@@ -0,0 +1,195 @@
+"""
+Profiling - Rádio IA
+Perfis sob demanda da geração de blocos e do mixer. O admin "arma" as próximas N chamadas de
+um alvo ("block" = geração de um bloco inteiro, "mixer" = render_block/create_ducked_mix);
+cada chamada armada roda sob cProfile (pstats, .prof) ou sob um amostrador de pilhas
+(pilhas colapsadas, .folded, prontas para flamegraph). Perfis ficam em output/profiles/.
+Desarmado, o custo é uma leitura de variável por chamada. O estado armado vale para o
+processo que recebeu o pedido (com "--generator" à parte, arme no processo do gerador).
+"""
+
+import functools
+import itertools
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PROFILES_DIR = BASE_DIR / "output" / "profiles"
+TARGETS = ("block", "mixer")
+MODES = ("cprofile", "sample")
+# Intervalo do amostrador (s)
+SAMPLE_INTERVAL_SEC = 0.005
+# Máximo de perfis guardados (os mais antigos são apagados)
+MAX_PROFILES = 50
+# Limite de chamadas armadas de uma vez
+MAX_ARMED = 20
+
+_lock = threading.Lock()
+# Chamadas restantes por alvo e modo de cada alvo
+_armed: dict[str, int] = {}
+_modes: dict[str, str] = {}
+# Verificação rápida: False = nenhum alvo armado (caminho sem custo)
+_enabled = False
+# Evita perfil dentro de perfil na mesma thread (ex.: mixer dentro de um bloco perfilado)
+_local = threading.local()
+_seq = itertools.count(1)
+
+
+def arm(target: str, count: int = 1, mode: str = "cprofile") -> dict:
+    """Arma as próximas count chamadas do alvo ("block", "mixer" ou "all"). count=0 desarma."""
+    global _enabled
+    targets = TARGETS if target == "all" else (target,)
+    if any(t not in TARGETS for t in targets):
+        raise ValueError(f"Alvo inválido: {target!r}")
+    if mode not in MODES:
+        raise ValueError(f"Modo inválido: {mode!r}")
+    count = max(0, min(MAX_ARMED, int(count)))
+    with _lock:
+        for t in targets:
+            if count:
+                _armed[t] = count
+                _modes[t] = mode
+            else:
+                _armed.pop(t, None)
+        _enabled = bool(_armed)
+    return status()
+
+
+def status() -> dict:
+    with _lock:
+        return {"armed": dict(_armed), "modes": {t: _modes[t] for t in _armed}}
+
+
+def _take(target: str) -> str | None:
+    """Consome uma chamada armada do alvo; retorna o modo ou None."""
+    global _enabled
+    with _lock:
+        left = _armed.get(target, 0)
+        if left <= 0:
+            return None
+        if left == 1:
+            del _armed[target]
+        else:
+            _armed[target] = left - 1
+        _enabled = bool(_armed)
+        return _modes.get(target, "cprofile")
+
+
+class _Sampler:
+    """Amostra a pilha de uma thread a cada SAMPLE_INTERVAL_SEC (sys._current_frames)."""
+
+    def __init__(self, thread_id: int) -> None:
+        self.thread_id = thread_id
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(SAMPLE_INTERVAL_SEC):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).stem}.{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+def _profile_path(target: str, name: str, ext: str) -> Path:
+    PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return PROFILES_DIR / f"{stamp}_{target}_{name}_{os.getpid()}_{next(_seq)}.{ext}"
+
+
+def _prune() -> None:
+    files = sorted(PROFILES_DIR.glob("*.*"), key=lambda p: p.stat().st_mtime)
+    for p in files[:-MAX_PROFILES]:
+        p.unlink(missing_ok=True)
+
+
+def _run_profiled(target: str, mode: str, fn: Callable, args, kwargs):
+    _local.active = True
+    try:
+        if mode == "sample":
+            sampler = _Sampler(threading.get_ident())
+            sampler.start()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                sampler.stop()
+                sampler.dump(_profile_path(target, fn.__name__, "folded"))
+        import cProfile
+
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            prof.disable()
+            prof.dump_stats(str(_profile_path(target, fn.__name__, "prof")))
+    finally:
+        _local.active = False
+        _prune()
+
+
+def profiled(target: str) -> Callable:
+    """Decorador: a chamada é perfilada se houver execução armada para o alvo."""
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled or getattr(_local, "active", False):
+                return fn(*args, **kwargs)
+            mode = _take(target)
+            if mode is None:
+                return fn(*args, **kwargs)
+            return _run_profiled(target, mode, fn, args, kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def list_profiles() -> list[dict]:
+    """Perfis gravados, do mais novo ao mais antigo."""
+    if not PROFILES_DIR.is_dir():
+        return []
+    out = []
+    for p in sorted(PROFILES_DIR.glob("*.*"), key=lambda p: p.stat().st_mtime, reverse=True):
+        if p.suffix not in (".prof", ".folded"):
+            continue
+        st = p.stat()
+        out.append({
+            "name": p.name,
+            "size": st.st_size,
+            "format": "pstats" if p.suffix == ".prof" else "collapsed",
+            "created_at": datetime.fromtimestamp(st.st_mtime, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        })
+    return out
+
+
+def profile_path(name: str) -> Path | None:
+    """Caminho de um perfil pelo nome (só nomes simples, sem subpastas)."""
+    if not re.match(r"^[\w.-]+\.(prof|folded)$", name or "") or ".." in name:
+        return None
+    path = PROFILES_DIR / name
+    return path if path.is_file() else None
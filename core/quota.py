@@ -0,0 +1,376 @@
+"""
+Quota - Rádio IA
+Governador único das chamadas às APIs (Gemini e ElevenLabs) de todo o processo: gerador,
+rotas do admin, rotas antigas e o "perguntar à IA" do chat passam por aqui.
+- Um balde de fichas por provedor (requisições por minuto + rajada).
+- Classes de prioridade: admin > chat > lote. Quem tem prioridade maior passa na frente da
+  fila; o lote só usa a sobra (deixa uma reserva de fichas para o admin e o chat).
+- 429/5xx: espera crescente e taxa reduzida pela metade; volta aos poucos com sucessos.
+- Livro diário de uso (chamadas, unidades, erros, throttles).
+Saldo dos baldes e livro ficam em output/quota.sqlite3 (QUOTA_DB), compartilhados por todos
+os processos: vários workers do servidor web + o gerador gastam o mesmo RPM.
+A prioridade é da thread: use `with quota.priority(quota.ADMIN):` ou o decorador.
+"""
+
+import functools
+import heapq
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# Banco dos baldes e do livro (compartilhado entre processos)
+QUOTA_DB = BASE_DIR / (os.getenv("QUOTA_DB") or "output/quota.sqlite3")
+# Tempo máximo esperando outro processo liberar o banco (ms)
+SQLITE_BUSY_TIMEOUT_MS = 5000
+# Dias mantidos no livro de uso
+LEDGER_DAYS = 30
+# /api/status relê o banco no máximo uma vez nesse intervalo
+STATS_TTL_SEC = 5.0
+
+# Classes de prioridade (menor = mais importante)
+ADMIN = 0
+CHAT = 1
+BATCH = 2
+PRIORITY_NAMES = {ADMIN: "admin", CHAT: "chat", BATCH: "batch"}
+
+# Limites por provedor: requisições/minuto e rajada (env sobrescreve)
+PROVIDER_LIMITS = {
+    "gemini": {"rpm": float(os.getenv("GEMINI_RPM", "10")), "burst": float(os.getenv("GEMINI_BURST", "4"))},
+    "elevenlabs": {"rpm": float(os.getenv("ELEVENLABS_RPM", "60")), "burst": float(os.getenv("ELEVENLABS_BURST", "6"))},
+}
+# Fichas que o lote deixa para admin/chat
+BATCH_RESERVE = 1.0
+# Quantas vezes repetir uma chamada que levou 429/5xx (esperando o backoff entre elas)
+THROTTLE_RETRIES = 3
+# Backoff após 429/5xx: começa aqui e dobra a cada erro seguido, até o teto
+BACKOFF_BASE_SEC = 2.0
+BACKOFF_MAX_SEC = 120.0
+# Piso da taxa reduzida (fração da configurada) e recuperação por sucesso
+MIN_RATE_FRACTION = 0.1
+RECOVERY_STEP = 0.1
+
+_local = threading.local()
+
+
+class QuotaTimeout(RuntimeError):
+    """Não houve ficha disponível dentro do prazo pedido."""
+
+
+def current_priority() -> int:
+    return getattr(_local, "priority", BATCH)
+
+
+@contextmanager
+def priority(level: int):
+    """Define a prioridade das chamadas feitas por esta thread dentro do bloco."""
+    previous = current_priority()
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def with_priority(level: int) -> Callable:
+    """Decorador: a função inteira roda com a prioridade dada (ex.: rotas do admin)."""
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with priority(level):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _status_of(exc: BaseException) -> int | None:
+    """Código HTTP de um erro dos SDKs (ElevenLabs: status_code; Google: code) ou do texto."""
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    m = re.search(r"\b(429|50[0-9])\b", str(exc))
+    return int(m.group(1)) if m else None
+
+
+def is_throttle(exc: BaseException) -> bool:
+    """429 (limite) ou 5xx (provedor sobrecarregado): vale esperar e tentar de novo."""
+    status = _status_of(exc)
+    return status is not None and (status == 429 or 500 <= status < 600)
+
+
+class _Bucket:
+    """Configuração do provedor e fila de espera deste processo; o saldo fica no banco."""
+
+    def __init__(self, rpm: float, burst: float) -> None:
+        self.base_rate = max(rpm, 0.1) / 60.0
+        self.capacity = max(1.0, burst)
+        self.waiters: list[tuple[int, int]] = []
+
+
+class QuotaGovernor:
+    """
+    Baldes compartilhados por todos os processos (servidor web com vários workers + gerador):
+    saldo de fichas, taxa atual, bloqueio e erros seguidos ficam em SQLite (db_path) e cada
+    retirada é uma transação BEGIN IMMEDIATE, então a soma dos processos respeita o RPM do
+    provedor. A fila por prioridade vale dentro do processo; entre processos, a reserva do
+    lote (BATCH_RESERVE) deixa fichas para admin e chat.
+    """
+
+    def __init__(self, limits: dict[str, dict] | None = None, db_path: Path = QUOTA_DB) -> None:
+        limits = limits or PROVIDER_LIMITS
+        self._cond = threading.Condition()
+        self._buckets = {name: _Bucket(cfg["rpm"], cfg["burst"]) for name, cfg in limits.items()}
+        self._seq = itertools.count()
+        self._db_path = Path(db_path)
+        self._local = threading.local()
+        self._ready = False
+        self._init_lock = threading.Lock()
+        self._pruned_day = ""
+        self._stats_cache: tuple[float, dict] | None = None
+
+    # ---------- Banco compartilhado ----------
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexão desta thread (cria as tabelas na primeira vez)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self._db_path), timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        with self._init_lock:
+            if not self._ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS buckets (
+                        provider TEXT PRIMARY KEY,
+                        tokens REAL NOT NULL,
+                        updated REAL NOT NULL,
+                        rate REAL NOT NULL,
+                        blocked_until REAL NOT NULL,
+                        errors INTEGER NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS ledger (
+                        day TEXT NOT NULL,
+                        provider TEXT NOT NULL,
+                        field TEXT NOT NULL,
+                        n INTEGER NOT NULL,
+                        PRIMARY KEY (day, provider, field)
+                    );
+                    """
+                )
+                self._ready = True
+        return conn
+
+    @contextmanager
+    def _tx(self):
+        """Transação com trava de escrita desde o início: retiradas de processos diferentes não se cruzam."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _state(self, conn: sqlite3.Connection, provider: str, now: float) -> dict:
+        """Saldo do provedor já reabastecido até now (cria com o balde cheio)."""
+        bucket = self._buckets[provider]
+        row = conn.execute(
+            "SELECT tokens, updated, rate, blocked_until, errors FROM buckets WHERE provider = ?", (provider,)
+        ).fetchone()
+        if row is None:
+            state = {"tokens": bucket.capacity, "updated": now, "rate": bucket.base_rate, "blocked_until": 0.0, "errors": 0}
+        else:
+            state = dict(zip(("tokens", "updated", "rate", "blocked_until", "errors"), row))
+        state["tokens"] = min(bucket.capacity, state["tokens"] + max(0.0, now - state["updated"]) * state["rate"])
+        state["updated"] = now
+        return state
+
+    @staticmethod
+    def _save(conn: sqlite3.Connection, provider: str, state: dict) -> None:
+        conn.execute(
+            "INSERT INTO buckets(provider, tokens, updated, rate, blocked_until, errors) VALUES(?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(provider) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, "
+            "rate = excluded.rate, blocked_until = excluded.blocked_until, errors = excluded.errors",
+            (provider, state["tokens"], state["updated"], state["rate"], state["blocked_until"], state["errors"]),
+        )
+
+    def _take(self, provider: str, need: float) -> float:
+        """Tenta tirar uma ficha (exigindo saldo need). 0 = conseguiu; senão, segundos a esperar."""
+        now = time.time()
+        with self._tx() as conn:
+            state = self._state(conn, provider, now)
+            if state["blocked_until"] > now:
+                wait = state["blocked_until"] - now
+            elif state["tokens"] >= need:
+                state["tokens"] -= 1.0
+                wait = 0.0
+            else:
+                wait = (need - state["tokens"]) / state["rate"]
+            self._save(conn, provider, state)
+        return wait
+
+    # ---------- Fichas ----------
+
+    def acquire(self, provider: str, level: int | None = None, timeout: float | None = None) -> float:
+        """
+        Espera uma ficha do provedor respeitando a prioridade. Retorna quantos segundos esperou.
+        Levanta QuotaTimeout se timeout (s) passar antes.
+        """
+        bucket = self._buckets[provider]
+        level = current_priority() if level is None else level
+        ticket = (level, next(self._seq))
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        need = min(1.0 + (BATCH_RESERVE if level >= BATCH else 0.0), bucket.capacity)
+        with self._cond:
+            heapq.heappush(bucket.waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = 1.0
+                    if bucket.waiters[0] == ticket:
+                        wait = self._take(provider, need)
+                        if wait <= 0:
+                            waited = now - start
+                            if waited >= 0.05:
+                                self._count(provider, queued=1)
+                            return waited
+                    if deadline is not None:
+                        if now >= deadline:
+                            raise QuotaTimeout(f"Sem cota de {provider} dentro de {timeout:.0f}s")
+                        wait = min(wait, deadline - now)
+                    self._cond.wait(timeout=max(0.01, min(wait, 5.0)))
+            finally:
+                bucket.waiters.remove(ticket)
+                heapq.heapify(bucket.waiters)
+                self._cond.notify_all()
+
+    def _on_success(self, provider: str) -> None:
+        bucket = self._buckets[provider]
+        with self._tx() as conn:
+            state = self._state(conn, provider, time.time())
+            state["errors"] = 0
+            if state["rate"] < bucket.base_rate:
+                state["rate"] = min(bucket.base_rate, state["rate"] + bucket.base_rate * RECOVERY_STEP)
+            self._save(conn, provider, state)
+
+    def _on_throttle(self, provider: str, retry_after: float | None = None) -> None:
+        """Erro de limite/sobrecarga: bloqueia o provedor (em todos os processos) e reduz a taxa."""
+        bucket = self._buckets[provider]
+        now = time.time()
+        with self._tx() as conn:
+            state = self._state(conn, provider, now)
+            state["errors"] += 1
+            backoff = min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** (state["errors"] - 1)))
+            if retry_after:
+                backoff = max(backoff, retry_after)
+            state["blocked_until"] = max(state["blocked_until"], now + backoff)
+            state["rate"] = max(bucket.base_rate * MIN_RATE_FRACTION, state["rate"] / 2)
+            state["tokens"] = 0.0
+            self._save(conn, provider, state)
+        with self._cond:
+            self._cond.notify_all()
+
+    def call(self, provider: str, fn: Callable, *args, units: int = 1, **kwargs):
+        """
+        Executa fn(*args, **kwargs) com uma ficha do provedor. Em 429/5xx aplica o backoff e
+        tenta de novo (até THROTTLE_RETRIES vezes); outros erros sobem direto.
+        units: quantidade registrada no livro (ex.: caracteres enviados ao TTS).
+        """
+        for attempt in range(THROTTLE_RETRIES + 1):
+            self.acquire(provider)
+            level = f"calls_{PRIORITY_NAMES.get(current_priority(), 'batch')}"
+            self._count(provider, calls=1, units=units, **{level: 1})
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if is_throttle(e):
+                    self._count(provider, throttled=1)
+                    retry_after = getattr(e, "retry_after", None)
+                    self._on_throttle(provider, retry_after if isinstance(retry_after, (int, float)) else None)
+                    if attempt < THROTTLE_RETRIES:
+                        continue
+                self._count(provider, errors=1)
+                raise
+            self._on_success(provider)
+            return result
+
+    # ---------- Livro diário ----------
+
+    def _count(self, provider: str, **fields: int) -> None:
+        """Soma as contagens do dia no livro (UPSERT numa transação; vários processos)."""
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        with self._tx() as conn:
+            conn.executemany(
+                "INSERT INTO ledger(day, provider, field, n) VALUES(?, ?, ?, ?) "
+                "ON CONFLICT(day, provider, field) DO UPDATE SET n = n + excluded.n",
+                [(day, provider, field, n) for field, n in fields.items()],
+            )
+            if day != self._pruned_day:
+                self._pruned_day = day
+                conn.execute(
+                    "DELETE FROM ledger WHERE day NOT IN (SELECT DISTINCT day FROM ledger ORDER BY day DESC LIMIT ?)",
+                    (LEDGER_DAYS,),
+                )
+
+    def ledger(self, day: str | None = None) -> dict[str, dict[str, int]]:
+        """Uso do dia (padrão: hoje) por provedor."""
+        day = day or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        rows = self._conn().execute("SELECT provider, field, n FROM ledger WHERE day = ?", (day,)).fetchall()
+        out: dict[str, dict[str, int]] = {}
+        for provider, field, n in rows:
+            out.setdefault(provider, {})[field] = n
+        return out
+
+    def stats(self) -> dict:
+        """
+        Estado dos baldes e uso de hoje (para /api/status e admin). Só leitura, e no máximo uma
+        a cada STATS_TTL_SEC: pedidos de status não tocam o banco a cada chamada.
+        """
+        now = time.monotonic()
+        cached = self._stats_cache
+        if cached is not None and now - cached[0] < STATS_TTL_SEC:
+            return cached[1]
+        wall = time.time()
+        conn = self._conn()
+        rows = {
+            r[0]: r[1:]
+            for r in conn.execute("SELECT provider, tokens, updated, rate, blocked_until FROM buckets").fetchall()
+        }
+        today = self.ledger()
+        out: dict[str, dict] = {}
+        for name, b in self._buckets.items():
+            tokens, updated, rate, blocked = rows.get(name, (b.capacity, wall, b.base_rate, 0.0))
+            out[name] = {
+                "tokens": round(min(b.capacity, tokens + max(0.0, wall - updated) * rate), 2),
+                "ratePerMin": round(rate * 60, 2),
+                "baseRatePerMin": round(b.base_rate * 60, 2),
+                "blockedForSec": round(max(0.0, blocked - wall), 1),
+                "waiting": len(b.waiters),
+                "today": today.get(name, {}),
+            }
+        self._stats_cache = (now, out)
+        return out
+
+
+governor = QuotaGovernor()
+
+
+def call(provider: str, fn: Callable, *args, units: int = 1, **kwargs):
+    """Atalho para governor.call (governador compartilhado do processo)."""
+    return governor.call(provider, fn, *args, units=units, **kwargs)
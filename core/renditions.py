@@ -0,0 +1,245 @@
+"""
+Renditions - Rádio IA
+Versões leves dos blocos e músicas para ouvintes com conexão fraca: MP3 de bitrate baixo
+e Opus. Geradas em segundo plano (ao gravar um bloco ou no primeiro pedido) e guardadas em
+output/renditions/; o índice (index.json) registra tamanho e tempo de encode de cada uma,
+e as falhas (não reagendadas antes de FAILED_RETRY_SEC). O índice é relido e gravado sob o
+lock entre processos de block_manifest.locked(): workers do servidor e gerador gravam nele.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from core import block_manifest
+from core.mixer import codec
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RENDITIONS_DIR = BASE_DIR / "output" / "renditions"
+INDEX_NAME = "index.json"
+
+# Variantes disponíveis (o original continua sendo a versão "high")
+RENDITIONS = {
+    "mp3_low": {"format": "mp3", "ext": "mp3", "mimetype": "audio/mpeg", "bitrate": "48k", "parameters": ["-ac", "1"]},
+    "opus": {"format": "ogg", "ext": "ogg", "mimetype": "audio/ogg", "bitrate": "40k", "codec": "libopus"},
+}
+# Encodes simultâneos em segundo plano (cada um ocupa um ffmpeg)
+ENCODE_WORKERS = 2
+# Variante que falhou só volta a ser agendada depois desse intervalo (s)
+FAILED_RETRY_SEC = 6 * 3600
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+# Chaves com encode em andamento (evita encodar o mesmo arquivo duas vezes)
+_pending: set[str] = set()
+# Cache do índice: ((mtime_ns, tamanho) do index.json, linhas por chave)
+_index_cache: tuple[tuple[int, int], dict[str, dict]] | None = None
+
+
+def _source_key(source: Path, rendition: str) -> str:
+    """Chave da variante: caminho + mtime + tamanho do original (arquivo trocado = variante nova)."""
+    st = source.stat()
+    raw = f"{source.resolve()}|{st.st_mtime_ns}|{st.st_size}|{rendition}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def _rendition_file(key: str, rendition: str) -> Path:
+    return RENDITIONS_DIR / rendition / f"{key}.{RENDITIONS[rendition]['ext']}"
+
+
+def _load_index() -> dict[str, dict]:
+    """Índice gravado (relido só se o arquivo mudou: outro processo pode ter gravado). Não alterar."""
+    global _index_cache
+    path = RENDITIONS_DIR / INDEX_NAME
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return {}
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        if _index_cache is not None and _index_cache[0] == stamp:
+            return _index_cache[1]
+    try:
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f).get("renditions") or {}
+    except (OSError, ValueError):
+        return {}
+    with _lock:
+        _index_cache = (stamp, rows)
+    return rows
+
+
+def _update_index(changes: dict[str, dict | None]) -> None:
+    """Relê, aplica as mudanças (None apaga a chave) e grava o índice, sob o lock entre processos."""
+    with block_manifest.locked(RENDITIONS_DIR):
+        rows = dict(_load_index())
+        for key, row in changes.items():
+            if row is None:
+                rows.pop(key, None)
+            else:
+                rows[key] = row
+        path = RENDITIONS_DIR / INDEX_NAME
+        tmp = path.with_name(f".{INDEX_NAME}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"renditions": rows}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+
+def _failed_recently(key: str) -> bool:
+    row = _load_index().get(key)
+    return bool(row and row.get("error") and time.time() - (row.get("failed_ts") or 0) < FAILED_RETRY_SEC)
+
+
+def mimetype(rendition: str) -> str:
+    return RENDITIONS[rendition]["mimetype"]
+
+
+def lookup(source: Path, rendition: str) -> Path | None:
+    """Caminho da variante se já estiver pronta; None caso contrário."""
+    if rendition not in RENDITIONS:
+        return None
+    try:
+        path = _rendition_file(_source_key(Path(source), rendition), rendition)
+    except OSError:
+        return None
+    return path if path.is_file() else None
+
+
+def encode(source: Path, rendition: str) -> Path:
+    """Gera a variante agora (bloqueante) e registra tamanho e tempo no índice."""
+    source = Path(source)
+    spec = RENDITIONS[rendition]
+    key = _source_key(source, rendition)
+    dest = _rendition_file(key, rendition)
+    if dest.is_file():
+        return dest
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    # Decodifica direto (sem o cache do mixer: músicas inteiras só passam por aqui uma vez)
+    seg = codec().decode(source)
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        seg.export(
+            tmp,
+            format=spec["format"],
+            bitrate=spec["bitrate"],
+            codec=spec.get("codec"),
+            parameters=spec.get("parameters"),
+        )
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+    encode_ms = int((time.perf_counter() - t0) * 1000)
+    _update_index({key: {
+        "source": source.name,
+        "rendition": rendition,
+        "file": dest.name,
+        "size": dest.stat().st_size,
+        "source_size": source.stat().st_size,
+        "encode_ms": encode_ms,
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }})
+    return dest
+
+
+def _encode_job(source: Path, rendition: str, key: str) -> None:
+    try:
+        encode(source, rendition)
+    except Exception as e:
+        # Registrada no índice: a mesma versão do original não é reagendada a cada pedido
+        logger.warning("Variante %s de %s falhou: %s: %s", rendition, source.name, type(e).__name__, e)
+        try:
+            _update_index({key: {
+                "source": source.name,
+                "rendition": rendition,
+                "error": f"{type(e).__name__}: {e}",
+                "failed_ts": time.time(),
+                "failed_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }})
+        except OSError as err:
+            logger.warning("Falha ao registrar a variante %s de %s no índice: %s", rendition, source.name, err)
+    finally:
+        with _lock:
+            _pending.discard(key)
+
+
+def schedule(source: Path, renditions: list[str] | None = None) -> None:
+    """Enfileira o encode em segundo plano das variantes que ainda não existem."""
+    global _executor
+    source = Path(source)
+    for rendition in renditions or list(RENDITIONS):
+        if lookup(source, rendition) is not None:
+            continue
+        try:
+            key = _source_key(source, rendition)
+        except OSError:
+            continue
+        if _failed_recently(key):
+            continue
+        with _lock:
+            if key in _pending:
+                continue
+            _pending.add(key)
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="rendition")
+            executor = _executor
+        executor.submit(_encode_job, source, rendition, key)
+
+
+def get_or_schedule(source: Path, rendition: str | None) -> Path | None:
+    """Variante pronta ou None (nesse caso agenda o encode e o chamador serve o original)."""
+    if not rendition or rendition not in RENDITIONS:
+        return None
+    path = lookup(source, rendition)
+    if path is None:
+        schedule(source, [rendition])
+    return path
+
+
+def discard(source: Path) -> None:
+    """Apaga as variantes de um original que vai ser removido (chamar antes de apagá-lo)."""
+    source = Path(source)
+    drop: dict[str, dict | None] = {}
+    for rendition in RENDITIONS:
+        try:
+            key = _source_key(source, rendition)
+        except OSError:
+            continue
+        try:
+            _rendition_file(key, rendition).unlink()
+        except OSError:
+            pass
+        if key in _load_index():
+            drop[key] = None
+    if drop:
+        _update_index(drop)
+
+
+def stats() -> dict:
+    """Totais por variante: quantidade, bytes, razão de tamanho, tempo médio de encode e falhas."""
+    rows = list(_load_index().values())
+    with _lock:
+        pending = len(_pending)
+    out: dict[str, dict] = {}
+    for r in rows:
+        s = out.setdefault(r["rendition"], {"count": 0, "failed": 0, "bytes": 0, "sourceBytes": 0, "encodeMs": 0})
+        if r.get("error"):
+            s["failed"] += 1
+            continue
+        s["count"] += 1
+        s["bytes"] += r.get("size") or 0
+        s["sourceBytes"] += r.get("source_size") or 0
+        s["encodeMs"] += r.get("encode_ms") or 0
+    for s in out.values():
+        s["sizeRatio"] = round(s["bytes"] / s["sourceBytes"], 3) if s["sourceBytes"] else None
+        encode_ms = s.pop("encodeMs")
+        s["avgEncodeMs"] = round(encode_ms / s["count"]) if s["count"] else 0
+    return {"renditions": out, "pending": pending}
@@ -0,0 +1,506 @@
+"""
+State Store - Rádio IA
+Estado compartilhado da programação: fila de blocos, ciclo notícia/música, contador de blocos,
+índice do encerramento e chat. Backend em memória (um processo) ou SQLite em modo WAL
+(vários workers do servidor web + gerador em processo separado usando o mesmo arquivo).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DB_PATH = BASE_DIR / "output" / "state.sqlite3"
+# Tempo máximo esperando outro processo liberar o banco (ms)
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+
+def _slot_kind(kind_at: Callable[[int], str | None] | None, position: int, cycle_len: int) -> str:
+    """Tipo da posição: o do plano, se houver; senão o ciclo fixo (notícia a cada cycle_len)."""
+    kind = kind_at(position) if kind_at is not None else None
+    return kind or ("news" if position % cycle_len == 0 else "music")
+
+
+class StateStore(ABC):
+    """
+    Interface do estado compartilhado. Todas as operações são atômicas entre threads
+    (e entre processos, no backend SQLite). Backend incompleto falha ao ser criado.
+    """
+
+    @abstractmethod
+    def next_block_id(self) -> int:
+        """Reserva e retorna o próximo ID de bloco (nunca repete)."""
+
+    @abstractmethod
+    def bump_block_counter(self, at_least: int) -> None:
+        """Garante que o contador de blocos seja >= at_least (após ler blocos do disco)."""
+
+    @abstractmethod
+    def next_closing_index(self) -> int:
+        """Retorna o índice da próxima mensagem de encerramento e avança."""
+
+    @abstractmethod
+    def queue_list(self) -> list[str]:
+        """Cópia da fila de blocos prontos, na ordem de reprodução."""
+
+    @abstractmethod
+    def queue_len(self) -> int:
+        ...
+
+    @abstractmethod
+    def queue_append(self, name: str) -> None:
+        ...
+
+    @abstractmethod
+    def queue_push_front(self, name: str, clear: bool = False) -> None:
+        """Coloca o bloco no início da fila (clear=True: esvazia a fila antes)."""
+
+    @abstractmethod
+    def queue_replace(self, names: list[str]) -> None:
+        """Substitui a fila inteira de uma vez."""
+
+    @abstractmethod
+    def queue_swap(self, remove: set[str], append: list[str]) -> list[str]:
+        """
+        Troca de lote numa operação: relê a fila, tira os nomes de remove, acrescenta append no
+        fim e retorna a fila nova. O que entrou na fila no meio tempo (ex.: boletim) é mantido.
+        """
+
+    @abstractmethod
+    def queue_pop_front(self) -> str | None:
+        ...
+
+    def take_next_slot(self, cycle_len: int = 3) -> tuple[str, str | None]:
+        """
+        Avança o ciclo notícia → música → música de forma atômica.
+        Retorna ("news", bloco) quando é vez de notícia e há bloco (consome da fila),
+        ("empty", None) quando é vez de notícia e a fila está vazia (ciclo não avança),
+        ("music", None) quando é vez de música.
+        """
+        kind, name, _ = self.take_planned_slot(None, cycle_len)
+        return kind, name
+
+    @abstractmethod
+    def take_planned_slot(
+        self, kind_at: Callable[[int], str | None] | None, cycle_len: int = 3
+    ) -> tuple[str, str | None, int]:
+        """
+        Como take_next_slot, mas o tipo da posição vem do plano da semana (kind_at(posição) →
+        "news"/"music"; None = fora do plano, vale o ciclo fixo). Retorna também a posição
+        consumida (índice no plano).
+        """
+
+    @abstractmethod
+    def cycle_position(self) -> int:
+        """Posição atual do ciclo (próxima a tocar), sem avançar."""
+
+    @abstractmethod
+    def news_consumed(self) -> int:
+        """Total de blocos consumidos pela programação (contador monotônico)."""
+
+    @abstractmethod
+    def counter(self, name: str) -> int:
+        """Valor de um contador nomeado (0 se não existir)."""
+
+    @abstractmethod
+    def incr_counter(self, name: str, delta: int = 1) -> int:
+        """Soma delta ao contador nomeado e retorna o valor novo."""
+
+    @abstractmethod
+    def acquire_lease(self, name: str, owner: str, ttl_sec: float) -> bool:
+        """
+        Reserva exclusiva com validade (ex.: lote semanal, um processo por vez). True se ficou
+        com owner: livre, vencida ou já era dele (renova a validade).
+        """
+
+    @abstractmethod
+    def release_lease(self, name: str, owner: str) -> None:
+        """Libera a reserva se ainda for de owner."""
+
+    @abstractmethod
+    def lease_owner(self, name: str) -> str | None:
+        """Dono atual da reserva (None se livre ou vencida)."""
+
+    @abstractmethod
+    def chat_append(self, user: str, text: str, kind: str, max_messages: int) -> int:
+        """Grava mensagem no chat e retorna o ID (cursor). Mantém só as últimas max_messages."""
+
+    @abstractmethod
+    def chat_messages(self, after: int = 0, limit: int = 50) -> list[dict]:
+        """Últimas mensagens com id > after (no máximo limit), em ordem cronológica."""
+
+
+class MemoryStateStore(StateStore):
+    """Estado em memória protegido por lock (comportamento original, um processo)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._queue: list[str] = []
+        self._block_counter = 0
+        self._closing_index = 0
+        self._cycle_index = 0
+        self._news_consumed = 0
+        self._chat: list[dict] = []
+        self._chat_last_id = 0
+        self._leases: dict[str, tuple[str, float]] = {}
+        self._counters: dict[str, int] = {}
+
+    def next_block_id(self) -> int:
+        with self._lock:
+            self._block_counter += 1
+            return self._block_counter
+
+    def bump_block_counter(self, at_least: int) -> None:
+        with self._lock:
+            self._block_counter = max(self._block_counter, at_least)
+
+    def next_closing_index(self) -> int:
+        with self._lock:
+            idx = self._closing_index
+            self._closing_index += 1
+            return idx
+
+    def queue_list(self) -> list[str]:
+        with self._lock:
+            return list(self._queue)
+
+    def queue_len(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def queue_append(self, name: str) -> None:
+        with self._lock:
+            self._queue.append(name)
+
+    def queue_push_front(self, name: str, clear: bool = False) -> None:
+        with self._lock:
+            if clear:
+                self._queue.clear()
+            self._queue.insert(0, name)
+
+    def queue_replace(self, names: list[str]) -> None:
+        with self._lock:
+            self._queue = list(names)
+
+    def queue_swap(self, remove: set[str], append: list[str]) -> list[str]:
+        with self._lock:
+            self._queue = [n for n in self._queue if n not in remove] + list(append)
+            return list(self._queue)
+
+    def queue_pop_front(self) -> str | None:
+        with self._lock:
+            if not self._queue:
+                return None
+            self._news_consumed += 1
+            return self._queue.pop(0)
+
+    def take_planned_slot(
+        self, kind_at: Callable[[int], str | None] | None, cycle_len: int = 3
+    ) -> tuple[str, str | None, int]:
+        with self._lock:
+            position = self._cycle_index
+            if _slot_kind(kind_at, position, cycle_len) == "news":
+                if not self._queue:
+                    return "empty", None, position
+                self._cycle_index += 1
+                self._news_consumed += 1
+                return "news", self._queue.pop(0), position
+            self._cycle_index += 1
+            return "music", None, position
+
+    def cycle_position(self) -> int:
+        with self._lock:
+            return self._cycle_index
+
+    def news_consumed(self) -> int:
+        with self._lock:
+            return self._news_consumed
+
+    def counter(self, name: str) -> int:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def incr_counter(self, name: str, delta: int = 1) -> int:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + delta
+            return self._counters[name]
+
+    def acquire_lease(self, name: str, owner: str, ttl_sec: float) -> bool:
+        now = time.time()
+        with self._lock:
+            current = self._leases.get(name)
+            if current is not None and current[0] != owner and current[1] > now:
+                return False
+            self._leases[name] = (owner, now + ttl_sec)
+            return True
+
+    def release_lease(self, name: str, owner: str) -> None:
+        with self._lock:
+            if (self._leases.get(name) or ("",))[0] == owner:
+                del self._leases[name]
+
+    def lease_owner(self, name: str) -> str | None:
+        with self._lock:
+            current = self._leases.get(name)
+            return current[0] if current is not None and current[1] > time.time() else None
+
+    def chat_append(self, user: str, text: str, kind: str, max_messages: int) -> int:
+        with self._lock:
+            self._chat_last_id += 1
+            self._chat.append({"id": self._chat_last_id, "user": user, "text": text, "kind": kind})
+            if len(self._chat) > max_messages:
+                del self._chat[: len(self._chat) - max_messages]
+            return self._chat_last_id
+
+    def chat_messages(self, after: int = 0, limit: int = 50) -> list[dict]:
+        with self._lock:
+            msgs = [dict(m) for m in self._chat if m["id"] > after]
+        return msgs[-limit:]
+
+
+class SqliteStateStore(StateStore):
+    """
+    Estado em SQLite (journal WAL): vários processos leem e escrevem o mesmo arquivo.
+    Operações de escrita usam BEGIN IMMEDIATE para serem atômicas entre processos.
+    Uma conexão por thread.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS block_queue (
+                pos INTEGER PRIMARY KEY,
+                name TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chat (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user TEXT NOT NULL,
+                text TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                str(self.path),
+                timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _tx(self):
+        """Transação de escrita exclusiva (BEGIN IMMEDIATE ... COMMIT/ROLLBACK)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _get_counter(conn: sqlite3.Connection, name: str) -> int:
+        row = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _set_counter(conn: sqlite3.Connection, name: str, value: int) -> None:
+        conn.execute(
+            "INSERT INTO counters(name, value) VALUES(?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, value),
+        )
+
+    def _incr(self, conn: sqlite3.Connection, name: str) -> int:
+        """Incrementa o contador e retorna o valor ANTERIOR."""
+        value = self._get_counter(conn, name)
+        self._set_counter(conn, name, value + 1)
+        return value
+
+    @staticmethod
+    def _pop_front(conn: sqlite3.Connection) -> str | None:
+        row = conn.execute("SELECT pos, name FROM block_queue ORDER BY pos LIMIT 1").fetchone()
+        if row is None:
+            return None
+        conn.execute("DELETE FROM block_queue WHERE pos = ?", (row[0],))
+        return row[1]
+
+    def next_block_id(self) -> int:
+        with self._tx() as conn:
+            return self._incr(conn, "block_counter") + 1
+
+    def bump_block_counter(self, at_least: int) -> None:
+        with self._tx() as conn:
+            if self._get_counter(conn, "block_counter") < at_least:
+                self._set_counter(conn, "block_counter", at_least)
+
+    def next_closing_index(self) -> int:
+        with self._tx() as conn:
+            return self._incr(conn, "closing_index")
+
+    def queue_list(self) -> list[str]:
+        rows = self._conn().execute("SELECT name FROM block_queue ORDER BY pos").fetchall()
+        return [r[0] for r in rows]
+
+    def queue_len(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM block_queue").fetchone()[0]
+
+    def queue_append(self, name: str) -> None:
+        with self._tx() as conn:
+            conn.execute(
+                "INSERT INTO block_queue(pos, name) "
+                "VALUES((SELECT COALESCE(MAX(pos), 0) + 1 FROM block_queue), ?)",
+                (name,),
+            )
+
+    def queue_push_front(self, name: str, clear: bool = False) -> None:
+        with self._tx() as conn:
+            if clear:
+                conn.execute("DELETE FROM block_queue")
+            conn.execute(
+                "INSERT INTO block_queue(pos, name) "
+                "VALUES((SELECT COALESCE(MIN(pos), 1) - 1 FROM block_queue), ?)",
+                (name,),
+            )
+
+    def queue_replace(self, names: list[str]) -> None:
+        with self._tx() as conn:
+            conn.execute("DELETE FROM block_queue")
+            conn.executemany(
+                "INSERT INTO block_queue(pos, name) VALUES(?, ?)",
+                list(enumerate(names, 1)),
+            )
+
+    def queue_swap(self, remove: set[str], append: list[str]) -> list[str]:
+        with self._tx() as conn:
+            rows = conn.execute("SELECT name FROM block_queue ORDER BY pos").fetchall()
+            names = [r[0] for r in rows if r[0] not in remove] + list(append)
+            conn.execute("DELETE FROM block_queue")
+            conn.executemany(
+                "INSERT INTO block_queue(pos, name) VALUES(?, ?)",
+                list(enumerate(names, 1)),
+            )
+            return names
+
+    def queue_pop_front(self) -> str | None:
+        with self._tx() as conn:
+            name = self._pop_front(conn)
+            if name is not None:
+                self._incr(conn, "news_consumed")
+            return name
+
+    def take_planned_slot(
+        self, kind_at: Callable[[int], str | None] | None, cycle_len: int = 3
+    ) -> tuple[str, str | None, int]:
+        with self._tx() as conn:
+            cycle = self._get_counter(conn, "cycle_index")
+            if _slot_kind(kind_at, cycle, cycle_len) == "news":
+                name = self._pop_front(conn)
+                if name is None:
+                    return "empty", None, cycle
+                self._set_counter(conn, "cycle_index", cycle + 1)
+                self._incr(conn, "news_consumed")
+                return "news", name, cycle
+            self._set_counter(conn, "cycle_index", cycle + 1)
+            return "music", None, cycle
+
+    def cycle_position(self) -> int:
+        return self._get_counter(self._conn(), "cycle_index")
+
+    def news_consumed(self) -> int:
+        return self._get_counter(self._conn(), "news_consumed")
+
+    def counter(self, name: str) -> int:
+        return self._get_counter(self._conn(), f"named:{name}")
+
+    def incr_counter(self, name: str, delta: int = 1) -> int:
+        with self._tx() as conn:
+            value = self._get_counter(conn, f"named:{name}") + delta
+            self._set_counter(conn, f"named:{name}", value)
+            return value
+
+    def acquire_lease(self, name: str, owner: str, ttl_sec: float) -> bool:
+        now = time.time()
+        with self._tx() as conn:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            conn.execute(
+                "INSERT INTO leases(name, owner, expires_at) VALUES(?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at",
+                (name, owner, now + ttl_sec),
+            )
+            return True
+
+    def release_lease(self, name: str, owner: str) -> None:
+        with self._tx() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def lease_owner(self, name: str) -> str | None:
+        row = self._conn().execute(
+            "SELECT owner FROM leases WHERE name = ? AND expires_at > ?", (name, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def chat_append(self, user: str, text: str, kind: str, max_messages: int) -> int:
+        with self._tx() as conn:
+            cur = conn.execute(
+                "INSERT INTO chat(user, text, kind, created_at) VALUES(?, ?, ?, ?)",
+                (user, text, kind, time.time()),
+            )
+            msg_id = cur.lastrowid
+            conn.execute("DELETE FROM chat WHERE id <= ?", (msg_id - max_messages,))
+            return msg_id
+
+    def chat_messages(self, after: int = 0, limit: int = 50) -> list[dict]:
+        rows = self._conn().execute(
+            "SELECT id, user, text, kind FROM chat WHERE id > ? ORDER BY id DESC LIMIT ?",
+            (after, limit),
+        ).fetchall()
+        return [
+            {"id": r[0], "user": r[1], "text": r[2], "kind": r[3]}
+            for r in reversed(rows)
+        ]
+
+
+def open_store(backend: str | None = None, path: Path | None = None) -> StateStore:
+    """
+    Cria o store conforme RADIO_STATE_BACKEND ("memory" ou "sqlite") e RADIO_STATE_DB.
+    Com vários workers (ex.: gunicorn -w 4) use "sqlite": todos compartilham fila e chat.
+    """
+    backend = (backend or os.getenv("RADIO_STATE_BACKEND") or "memory").strip().lower()
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "sqlite":
+        db = path or Path(os.getenv("RADIO_STATE_DB") or DEFAULT_DB_PATH)
+        return SqliteStateStore(db)
+    raise ValueError(f"RADIO_STATE_BACKEND inválido: {backend!r} (use 'memory' ou 'sqlite').")
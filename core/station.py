@@ -0,0 +1,216 @@
+"""
+Station - Rádio IA
+Várias rádios no mesmo processo: cada Station tem fila, ciclo, chat (StateStore próprio),
+playlist, bed e pastas de blocos. Caches de áudio decodificado (core.mixer.load_audio) e
+clients das APIs (Gemini/ElevenLabs) são compartilhados. Um agendador central reparte a
+geração de blocos entre as rádios de forma justa (a mais desabastecida primeiro).
+
+Configuração: stations.json na raiz (ou RADIO_STATIONS_FILE), lista de objetos:
+  {"slug": "louveira", "name": "Rádio Louveira", "music_dir": "assets/stations/louveira/musicas",
+   "bed": "assets/stations/louveira/news_bed.mp3", "rss_url": "https://...", "admin_secret": "...",
+   "feeds": ["https://...", {"url": "https://...", "name": "Prefeitura", "weight": 2}]}
+"feeds" (opcional): várias fontes agregadas (core/feeds.py); sem ele, só o rss_url.
+A rádio padrão (slug DEFAULT_SLUG) usa as pastas originais (output/blocks, assets/musicas).
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from core.feeds import FeedSource, parse_sources
+from core.library_index import LibraryIndex
+from core.producer import BlockProducer
+from core.state_store import StateStore, open_store
+from core.story_index import StoryIndex
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+OUTPUT_DIR = BASE_DIR / "output"
+STATIONS_DIR = OUTPUT_DIR / "stations"
+STATIONS_FILE = BASE_DIR / "stations.json"
+DEFAULT_SLUG = "iae"
+# Sem eventos, o agendador reavalia a cada POLL_SEC (gerador em outro processo depende disso)
+POLL_SEC = 10 * 60
+# Pausa de uma rádio depois de uma falha de geração (evita martelar as APIs)
+FAILURE_BACKOFF_SEC = 60
+
+
+@dataclass
+class Station:
+    """Uma rádio: identidade, pastas, estado compartilhado e produtor de blocos."""
+
+    slug: str
+    name: str
+    music_dir: Path
+    bed_path: Path | None
+    blocks_dir: Path
+    staging_dir: Path
+    work_dir: Path
+    state: StateStore
+    rss_url: str | None = None
+    # Várias fontes agregadas e ranqueadas; vazio = só rss_url (ou o Google News padrão)
+    feeds: list[FeedSource] = field(default_factory=list)
+    admin_secret: str | None = None
+    producer: BlockProducer | None = None
+    # Matérias da semana (deduplicadas; as que já foram ao ar não voltam)
+    stories: StoryIndex | None = None
+    # Análise das músicas (duração, LUFS, ganho sugerido); compartilhada entre rádios da mesma pasta
+    library: LibraryIndex | None = None
+    # Histórico de músicas (não repetir) e lock: locais ao processo
+    track_history: list[str] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # Lote semanal em andamento (passos executados pelo agendador); abrir/fechar sob batch_lock
+    batch: dict | None = None
+    batch_lock: threading.Lock = field(default_factory=threading.Lock)
+    # Não agendar antes deste instante (monotonic), após falha
+    backoff_until: float = 0.0
+
+    @property
+    def url_prefix(self) -> str:
+        """Prefixo das rotas: "" para a rádio padrão, "/s/<slug>" para as demais."""
+        return "" if self.slug == DEFAULT_SLUG else f"/s/{self.slug}"
+
+    def new_voice_file(self) -> Path:
+        """
+        Arquivo temporário e único para a locução de um bloco: produtores em paralelo (agendador,
+        trabalhos do admin) não sobrescrevem a voz uns dos outros. Quem cria apaga depois.
+        """
+        return self.work_dir / f".voice_{os.getpid()}_{uuid.uuid4().hex[:12]}.mp3"
+
+    @property
+    def last_weekly_file(self) -> Path:
+        return self.work_dir / "last_weekly_generation.txt"
+
+    @property
+    def aired_stories_file(self) -> Path:
+        return self.work_dir / "aired_stories.json"
+
+    @property
+    def plan_file(self) -> Path:
+        """Plano da programação da semana (core/playout_plan.py), lido por todos os processos."""
+        return self.work_dir / "playout_plan.bin"
+
+
+def _safe_slug(slug: str) -> bool:
+    return bool(re.match(r"^[a-z0-9][a-z0-9_-]{0,40}$", slug or ""))
+
+
+def _resolve(path: str | None) -> Path | None:
+    if not path:
+        return None
+    p = Path(path)
+    return p if p.is_absolute() else BASE_DIR / p
+
+
+def _station_store(work_dir: Path) -> StateStore:
+    """Um store por rádio: no backend SQLite, um arquivo por rádio."""
+    backend = (os.getenv("RADIO_STATE_BACKEND") or "memory").strip().lower()
+    if backend == "sqlite":
+        return open_store("sqlite", work_dir / "state.sqlite3")
+    return open_store(backend)
+
+
+def load_stations(default: Station, config_path: Path | None = None) -> dict[str, Station]:
+    """Rádio padrão + rádios do arquivo de configuração (se existir), por slug."""
+    stations = {default.slug: default}
+    path = config_path or Path(os.getenv("RADIO_STATIONS_FILE") or STATIONS_FILE)
+    if not path.is_file():
+        return stations
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    for entry in entries:
+        slug = (entry.get("slug") or "").strip().lower()
+        if not _safe_slug(slug) or slug in stations:
+            raise ValueError(f"Slug de rádio inválido ou repetido: {slug!r}")
+        work_dir = STATIONS_DIR / slug
+        work_dir.mkdir(parents=True, exist_ok=True)
+        stations[slug] = Station(
+            slug=slug,
+            name=entry.get("name") or slug,
+            music_dir=_resolve(entry.get("music_dir")) or default.music_dir,
+            bed_path=_resolve(entry.get("bed")),
+            blocks_dir=work_dir / "blocks",
+            staging_dir=work_dir / "blocks_staging",
+            work_dir=work_dir,
+            state=_station_store(work_dir),
+            rss_url=entry.get("rss_url") or None,
+            feeds=parse_sources(entry.get("feeds")),
+            admin_secret=entry.get("admin_secret") or None,
+        )
+    return stations
+
+
+class GenerationScheduler:
+    """
+    Loop único de geração para todas as rádios. A cada rodada escolhe UMA unidade de trabalho
+    (um bloco) da rádio mais necessitada: lote semanal pendente ou fila abaixo do alvo, menor
+    razão estoque/alvo primeiro e, em empate, a atendida há mais tempo. Assim uma rádio com
+    lote grande não trava as outras.
+    """
+
+    def __init__(self, stations: Callable[[], list[Station]], poll_sec: float = POLL_SEC) -> None:
+        self.stations = stations
+        self.poll_sec = poll_sec
+        self.event = threading.Event()
+        self._last_served: dict[str, float] = {}
+
+    def wake(self) -> None:
+        self.event.set()
+
+    def _urgency(self, station: Station) -> float | None:
+        """Menor = mais urgente; None = nada a fazer agora."""
+        if station.backoff_until > time.monotonic():
+            return None
+        if station.batch is not None:
+            return station.batch["done"] / max(1, station.batch["count"])
+        if station.producer is not None and station.producer.deficit() > 0:
+            return station.producer.fill_ratio()
+        return None
+
+    def pick(self) -> Station | None:
+        best: tuple[float, float] | None = None
+        chosen = None
+        for st in self.stations():
+            u = self._urgency(st)
+            if u is None:
+                continue
+            key = (u, self._last_served.get(st.slug, 0.0))
+            if best is None or key < best:
+                best, chosen = key, st
+        return chosen
+
+    def run_forever(
+        self,
+        work: Callable[[Station], bool],
+        before_round: Callable[[Station], None] | None = None,
+    ) -> None:
+        """
+        before_round(st): verificação barata por rádio (ex.: abrir lote semanal de segunda).
+        work(st): executa uma unidade de trabalho; False = falhou (rádio entra em espera).
+        """
+        while True:
+            try:
+                if before_round is not None:
+                    for st in self.stations():
+                        before_round(st)
+                st = self.pick()
+                if st is not None:
+                    self._last_served[st.slug] = time.monotonic()
+                    if not work(st):
+                        st.backoff_until = time.monotonic() + FAILURE_BACKOFF_SEC
+                    continue
+            except Exception:
+                time.sleep(FAILURE_BACKOFF_SEC)
+            self.event.wait(timeout=self._next_timeout())
+            self.event.clear()
+
+    def _next_timeout(self) -> float:
+        """POLL_SEC, ou menos se alguma rádio sai da espera pós-falha antes disso."""
+        now = time.monotonic()
+        waits = [st.backoff_until - now for st in self.stations() if st.backoff_until > now]
+        return max(1.0, min([self.poll_sec] + waits))
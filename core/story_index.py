@@ -0,0 +1,204 @@
+"""
+Story Index - Rádio IA
+Índice de matérias da semana: busca uma janela maior do RSS uma vez por lote, remove
+manchetes quase duplicadas (título normalizado + similaridade MinHash de shingles) e
+reparte as matérias distintas entre os blocos. Matérias já levadas ao ar na semana ficam
+gravadas em disco e nunca são sintetizadas de novo (nem reescritas por outro veículo).
+"""
+
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+import time
+import unicodedata
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+# Quantos itens do feed olhar por lote (antes da deduplicação)
+STORY_WINDOW = 40
+# Similaridade de Jaccard estimada a partir da qual duas manchetes são a mesma matéria
+DUP_THRESHOLD = 0.5
+# Número de funções de hash da assinatura MinHash
+NUM_PERM = 64
+# Tamanho dos shingles (palavras consecutivas)
+SHINGLE_WORDS = 2
+# Não rebuscar o feed mais de uma vez nesse intervalo quando as matérias acabam
+REFRESH_MIN_SEC = 3 * 3600
+
+# Palavras muito comuns que não ajudam a distinguir manchetes
+_STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "no", "na", "nos", "nas",
+    "um", "uma", "para", "por", "com", "que", "se", "ao", "aos", "sobre", "apos", "pela", "pelo",
+}
+_MAX_HASH = (1 << 64) - 1
+
+
+def normalize_title(title: str) -> str:
+    """
+    Minúsculas, sem acentos, sem pontuação e sem o sufixo " - Veículo" do Google News.
+    """
+    t = (title or "").strip()
+    if " - " in t:
+        head, tail = t.rsplit(" - ", 1)
+        # Sufixo curto = nome do veículo
+        if head and len(tail.split()) <= 5:
+            t = head
+    t = unicodedata.normalize("NFKD", t)
+    t = "".join(c for c in t if not unicodedata.combining(c)).lower()
+    t = re.sub(r"[^a-z0-9 ]+", " ", t)
+    return " ".join(t.split())
+
+
+def _shingles(text: str) -> set[str]:
+    words = [w for w in text.split() if w not in _STOPWORDS]
+    if len(words) < SHINGLE_WORDS:
+        return set(words)
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    # Palavras isoladas também contam: reordenações da mesma manchete continuam parecidas
+    return shingles | set(words)
+
+
+def minhash(text: str, num_perm: int = NUM_PERM) -> list[int]:
+    """Assinatura MinHash do texto normalizado (hashes determinísticos, estáveis entre execuções)."""
+    shingles = _shingles(text)
+    if not shingles:
+        return [_MAX_HASH] * num_perm
+    sig = [_MAX_HASH] * num_perm
+    for sh in shingles:
+        digest = hashlib.blake2b(sh.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        # Família de hashes h1 + i*h2 (técnica de Kirsch-Mitzenmacher)
+        for i in range(num_perm):
+            v = (h1 + i * h2) & _MAX_HASH
+            if v < sig[i]:
+                sig[i] = v
+    return sig
+
+
+def similarity(sig_a: list[int], sig_b: list[int]) -> float:
+    """Jaccard estimado: fração de posições iguais nas assinaturas."""
+    if not sig_a or len(sig_a) != len(sig_b):
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+def story_key(title: str) -> str:
+    """Chave estável da matéria (hash do título normalizado)."""
+    return hashlib.sha1(normalize_title(title).encode("utf-8")).hexdigest()[:16]
+
+
+def _week_id(now: datetime | None = None) -> str:
+    now = now or datetime.now(timezone.utc)
+    year, week, _ = now.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def dedupe(items: list[dict]) -> list[dict]:
+    """
+    Agrupa manchetes da mesma matéria e devolve um representante por grupo (o de resumo
+    mais longo), na ordem em que o grupo apareceu no feed. Cada item ganha 'key' e 'sig'.
+    """
+    groups: list[list[dict]] = []
+    for item in items:
+        norm = normalize_title(item.get("title", ""))
+        if not norm:
+            continue
+        item = dict(item, key=story_key(item["title"]), sig=minhash(norm))
+        for group in groups:
+            head = group[0]
+            if head["key"] == item["key"] or similarity(head["sig"], item["sig"]) >= DUP_THRESHOLD:
+                group.append(item)
+                break
+        else:
+            groups.append([item])
+    return [max(g, key=lambda it: len(it.get("summary") or "")) for g in groups]
+
+
+class StoryIndex:
+    """
+    fetch(limit): retorna itens do feed ({'title', 'summary'}), do mais recente ao mais antigo.
+    aired_path: JSON com as matérias já sintetizadas na semana corrente.
+    """
+
+    def __init__(self, fetch: Callable[[int], list[dict]], aired_path: Path, window: int = STORY_WINDOW) -> None:
+        self.fetch = fetch
+        self.aired_path = Path(aired_path)
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending: list[dict] = []
+        self._last_refresh = 0.0
+        self._aired: list[dict] = []
+        self._aired_week = ""
+        self._load_aired()
+
+    def _load_aired(self) -> None:
+        try:
+            with open(self.aired_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("week") == _week_id():
+            self._aired = data.get("stories") or []
+            self._aired_week = data["week"]
+        else:
+            self._aired, self._aired_week = [], _week_id()
+
+    def _save_aired(self) -> None:
+        self.aired_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.aired_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"week": self._aired_week, "stories": self._aired}, f, ensure_ascii=False)
+        os.replace(tmp, self.aired_path)
+
+    def _was_aired(self, item: dict) -> bool:
+        for a in self._aired:
+            if a["key"] == item["key"] or similarity(a["sig"], item["sig"]) >= DUP_THRESHOLD:
+                return True
+        return False
+
+    def refresh(self) -> int:
+        """Busca a janela do feed, deduplica e descarta o que já foi ao ar. Retorna quantas sobraram."""
+        items = self.fetch(self.window)
+        with self._lock:
+            if self._aired_week != _week_id():
+                self._aired, self._aired_week = [], _week_id()
+            fresh = [it for it in dedupe(items) if not self._was_aired(it)]
+            self._pending = fresh
+            self._last_refresh = time.monotonic()
+            return len(fresh)
+
+    def take(self, n: int) -> list[dict]:
+        """
+        Reserva até n matérias distintas para um bloco. Rebusca o feed se acabaram (no máximo
+        a cada REFRESH_MIN_SEC). Lista vazia = não há matéria nova (o bloco vira dica).
+        """
+        with self._lock:
+            stale = time.monotonic() - self._last_refresh >= REFRESH_MIN_SEC
+            need_refresh = not self._pending and (stale or not self._last_refresh)
+        if need_refresh:
+            self.refresh()
+        with self._lock:
+            taken, self._pending = self._pending[:n], self._pending[n:]
+            return taken
+
+    def release(self, items: list[dict]) -> None:
+        """Devolve matérias reservadas (o bloco falhou antes de ir ao ar)."""
+        with self._lock:
+            self._pending = list(items) + self._pending
+
+    def mark_aired(self, items: list[dict]) -> None:
+        """Registra matérias sintetizadas: não voltam nesta semana."""
+        with self._lock:
+            if self._aired_week != _week_id():
+                self._aired, self._aired_week = [], _week_id()
+            for it in items:
+                self._aired.append({"key": it["key"], "title": it.get("title", ""), "sig": it["sig"]})
+            self._save_aired()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": len(self._pending), "airedThisWeek": len(self._aired), "week": self._aired_week}
@@ -0,0 +1,117 @@
+"""
+TTS Cache - Rádio IA
+Áudio de cada trecho do roteiro (entre [pausa]) guardado em disco, chave = texto normalizado
++ voz + modelo + formato. Quando o admin corrige uma frase e reenvia o boletim, só os trechos
+alterados vão para a ElevenLabs; os demais (e os encerramentos, que se repetem) saem daqui
+e são costurados de novo. O contexto dos vizinhos (previous/next_text) fica fora da chave:
+editar um parágrafo não invalida os outros.
+
+Arquivos em output/tts_cache/<chave>.mp3, limitados a TTS_CACHE_MB (os usados há mais tempo
+saem primeiro; um acerto renova o mtime).
+"""
+
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+TTS_CACHE_DIR = BASE_DIR / "output" / "tts_cache"
+# Espaço em disco do cache (MB); 0 desliga
+TTS_CACHE_MB = int(os.getenv("TTS_CACHE_MB", "200"))
+# Entra na chave: muda aqui quando a normalização mudar (trechos antigos deixam de valer)
+KEY_VERSION = 1
+
+
+def normalize_text(text: str) -> str:
+    """Texto do trecho como a chave o vê: NFC, espaços colapsados, sem espaço nas pontas."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class TtsCache:
+    def __init__(self, directory: Path = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MB * 1024 * 1024) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stores = self.evictions = 0
+        # Caracteres que deixaram de ir para a ElevenLabs (acertos) e que foram (faltas)
+        self.chars_saved = self.chars_synthesized = 0
+
+    @staticmethod
+    def key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+        blob = f"{KEY_VERSION}|{voice_id}|{model_id}|{output_format}|{normalize_text(text)}"
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.mp3"
+
+    def get(self, text: str, voice_id: str, model_id: str, output_format: str) -> bytes | None:
+        """MP3 do trecho já sintetizado, ou None (falta: sintetize e chame put)."""
+        if self.max_bytes <= 0:
+            return None
+        path = self._path(self.key(text, voice_id, model_id, output_format))
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            data = b""
+        with self._lock:
+            if data:
+                self.hits += 1
+                self.chars_saved += len(text)
+            else:
+                self.misses += 1
+                self.chars_synthesized += len(text)
+        return data or None
+
+    def put(self, text: str, voice_id: str, model_id: str, output_format: str, data: bytes) -> None:
+        """Guarda o MP3 do trecho (gravação atômica) e apaga os mais antigos se passar do limite."""
+        if self.max_bytes <= 0 or not data:
+            return
+        path = self._path(self.key(text, voice_id, model_id, output_format))
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self.stores += 1
+        self._prune()
+
+    def _prune(self) -> None:
+        files = []
+        for p in self.directory.glob("*.mp3"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in files)
+        for _, size, p in sorted(files):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 3) if lookups else None,
+                "charsSaved": self.chars_saved,
+                "charsSynthesized": self.chars_synthesized,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+cache = TtsCache()
@@ -1,21 +1,49 @@
 """
 Voice Agent - Rádio IA
 Transforma o roteiro em áudio usando ElevenLabs e salva em output/news_latest.mp3.
+Roteiros com [pausa] são divididos nos trechos entre pausas, sintetizados em paralelo
+(concorrência limitada) e costurados com silêncio de duração fixa, por quadros MP3 (sem
+reencode; ver mixer.concat_mp3); só os trechos que falharam são pedidos de novo.
+Trechos já sintetizados com a mesma voz e modelo saem do cache (core/tts_cache.py): roteiro
+revisado e reenviado só manda à ElevenLabs os parágrafos alterados.
 """
 
+from __future__ import annotations
+
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
-from elevenlabs.client import ElevenLabs
+
+from core import quota, tts_cache
+from core.mixer import concat_mp3
+
+if TYPE_CHECKING:
+    from elevenlabs.client import ElevenLabs
 
 # Modelo e voz conforme instruções
 MODEL_ID = "eleven_multilingual_v2"
 # Rachel: voz estável (alternativa: Brian)
 DEFAULT_VOICE_ID = "21m00Tcm4TlvDq8ikWAM"
+# Formato pedido à ElevenLabs (igual em todos os trechos: emenda por quadros, sem reencode)
+OUTPUT_FORMAT = "mp3_44100_128"
 OUTPUT_DIR = Path(__file__).resolve().parent.parent / "output"
 OUTPUT_FILE = OUTPUT_DIR / "news_latest.mp3"
 
+PAUSE_MARK = "[pausa]"
+# Silêncio entre trechos (ms) no lugar de cada [pausa]
+PAUSE_MS = int(os.getenv("TTS_PAUSE_MS", "600"))
+# Chamadas simultâneas à ElevenLabs por roteiro (limite do plano)
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "3"))
+# Novas tentativas por trecho que falhou (só os que falharam)
+CHUNK_RETRIES = 2
+CHUNK_RETRY_DELAY_SEC = 1.5
+# Trechos menores que isso (caracteres) são juntados ao anterior: poucas chamadas minúsculas
+MIN_CHUNK_CHARS = 80
+
 # Client reutilizado para evitar muitas requisições GET (voices/models) a cada bloco
 _client: ElevenLabs | None = None
 
@@ -24,6 +52,9 @@ def _get_client() -> ElevenLabs:
     """Retorna o client ElevenLabs (criado uma vez e reutilizado)."""
     global _client
     if _client is None:
+        # Import tardio: o SDK é pesado e só a geração de voz precisa dele
+        from elevenlabs.client import ElevenLabs
+
         load_dotenv()
         key = os.getenv("ELEVENLABS_API_KEY")
         if not key:
@@ -50,25 +81,8 @@ def _text_for_tts(script: str) -> str:
     return script.replace("[pausa]", " ... ").strip()
 
 
-def generate_audio(script: str, voice_id: str | None = None) -> Path:
-    """
-    Gera áudio do roteiro via ElevenLabs e salva em output/news_latest.mp3.
-    Retorna o path do arquivo gerado.
-    """
-    client = _get_client()
-    voice_id = voice_id or os.getenv("ELEVENLABS_VOICE_ID") or DEFAULT_VOICE_ID
-    text = _text_for_tts(script)
-
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-    audio = client.text_to_speech.convert(
-        voice_id=voice_id,
-        text=text,
-        model_id=MODEL_ID,
-        output_format="mp3_44100_128",
-    )
-
-    # SDK pode retornar bytes ou generator de chunks
+def _read_audio(audio) -> bytes:
+    """SDK pode retornar bytes ou generator de chunks."""
     data = b""
     if hasattr(audio, "read"):
         data = audio.read()
@@ -80,16 +94,140 @@ def generate_audio(script: str, voice_id: str | None = None) -> Path:
                 data += chunk
             else:
                 data += getattr(chunk, "content", chunk) or b""
+    return data
+
+
+def split_script(script: str) -> list[str]:
+    """
+    Divide o roteiro nas marcações [pausa]. Trechos muito curtos vão junto com o anterior
+    (a pausa entre eles vira " ... ", como antes).
+    """
+    chunks: list[str] = []
+    for part in script.split(PAUSE_MARK):
+        part = part.strip()
+        if not part:
+            continue
+        if chunks and (len(part) < MIN_CHUNK_CHARS or len(chunks[-1]) < MIN_CHUNK_CHARS):
+            chunks[-1] = chunks[-1] + " ... " + part
+        else:
+            chunks.append(part)
+    return chunks
+
+
+def _synthesize(text: str, voice_id: str, previous_text: str | None = None, next_text: str | None = None) -> bytes:
+    """Um pedido à ElevenLabs; previous/next_text mantêm a entonação contínua entre trechos."""
+    client = _get_client()
+    kwargs = {}
+    if previous_text:
+        kwargs["previous_text"] = previous_text
+    if next_text:
+        kwargs["next_text"] = next_text
+    tts_text = _text_for_tts(text)
+
+    def convert() -> bytes:
+        # O SDK pode baixar o áudio só durante a leitura: a leitura fica dentro da cota
+        return _read_audio(client.text_to_speech.convert(
+            voice_id=voice_id,
+            text=tts_text,
+            model_id=MODEL_ID,
+            output_format=OUTPUT_FORMAT,
+            **kwargs,
+        ))
+
+    data = quota.call("elevenlabs", convert, units=len(tts_text))
+    if not data:
+        raise RuntimeError("ElevenLabs retornou áudio vazio.")
+    return data
+
+
+def _synthesize_chunks(chunks: list[str], voice_id: str) -> list[bytes]:
+    """
+    Sintetiza os trechos em paralelo (até TTS_MAX_WORKERS ao mesmo tempo); os que já estão no
+    cache não são pedidos. Trechos que falham são repetidos sozinhos, até CHUNK_RETRIES vezes;
+    se algum continuar falhando, levanta erro.
+    """
+    results: list[bytes | None] = [tts_cache.cache.get(c, voice_id, MODEL_ID, OUTPUT_FORMAT) for c in chunks]
+    pending = [i for i, data in enumerate(results) if data is None]
+    if not pending:
+        return results  # type: ignore[return-value]
+    errors: dict[int, Exception] = {}
+    workers = max(1, min(TTS_MAX_WORKERS, len(pending)))
+    # Threads do pool não herdam a prioridade de cota de quem chamou
+    level = quota.current_priority()
+
+    def job(i: int) -> bytes:
+        with quota.priority(level):
+            return _synthesize(
+                chunks[i],
+                voice_id,
+                chunks[i - 1] if i > 0 else None,
+                chunks[i + 1] if i + 1 < len(chunks) else None,
+            )
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts") as pool:
+        for attempt in range(CHUNK_RETRIES + 1):
+            if attempt:
+                time.sleep(CHUNK_RETRY_DELAY_SEC * attempt)
+            futures = {i: pool.submit(job, i) for i in pending}
+            failed = []
+            for i, fut in futures.items():
+                try:
+                    results[i] = fut.result()
+                    tts_cache.cache.put(chunks[i], voice_id, MODEL_ID, OUTPUT_FORMAT, results[i])
+                except Exception as e:
+                    errors[i] = e
+                    failed.append(i)
+            pending = failed
+            if not pending:
+                break
+    if pending:
+        raise RuntimeError(
+            f"ElevenLabs falhou em {len(pending)} de {len(chunks)} trechos: {errors[pending[0]]}"
+        )
+    return results  # type: ignore[return-value]
+
+
+def _stitch(parts: list[bytes], output_path: Path, pause_ms: int = PAUSE_MS) -> None:
+    """
+    Junta os MP3 dos trechos com silêncio fixo de pause_ms entre eles. Todos vêm no mesmo
+    formato (mp3_44100_128): emenda por quadros; só reencoda se o formato variar.
+    """
+    concat_mp3(parts, output_path, gap_ms=pause_ms, bitrate="128k")
+
+
+def generate_audio(script: str, voice_id: str | None = None, output_path: Path | None = None) -> Path:
+    """
+    Gera áudio do roteiro via ElevenLabs e salva em output/news_latest.mp3 (ou output_path).
+    Com [pausa]: um pedido por trecho, em paralelo, costurados com PAUSE_MS de silêncio.
+    Trechos já sintetizados (mesmo texto normalizado, voz e modelo) vêm do cache.
+    Retorna o path do arquivo gerado.
+    """
+    voice_id = voice_id or os.getenv("ELEVENLABS_VOICE_ID") or DEFAULT_VOICE_ID
+
+    output_path = output_path or OUTPUT_FILE
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    chunks = split_script(script)
+    if len(chunks) <= 1:
+        # Sem pausas: um pedido só, bytes gravados como vieram (sem reencode)
+        text = chunks[0] if chunks else script
+        data = tts_cache.cache.get(text, voice_id, MODEL_ID, OUTPUT_FORMAT)
+        if data is None:
+            data = _synthesize(text, voice_id)
+            tts_cache.cache.put(text, voice_id, MODEL_ID, OUTPUT_FORMAT, data)
+        output_path.write_bytes(data)
+        return output_path
 
-    OUTPUT_FILE.write_bytes(data)
-    return OUTPUT_FILE
+    parts = _synthesize_chunks(chunks, voice_id)
+    _stitch(parts, output_path)
+    return output_path
 
 
-def run(script: str) -> Path:
+def run(script: str, output_path: Path | None = None) -> Path:
     """
     Fluxo principal: gera áudio do roteiro e retorna o path do MP3.
     """
-    return generate_audio(script)
+    return generate_audio(script, output_path=output_path)
 
 
 if __name__ == "__main__":
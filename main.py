@@ -1,82 +1,162 @@
 """
 Rádio IA News - Loop principal (Orquestrador)
 Fluxo: Música 1 → Música 2 → Notícias + Voz → Música 3 com Ducking (locutor) → Repetir.
+O segmento de notícias (roteiro → voz → mix com ducking) é preparado numa thread enquanto
+as músicas 1 e 2 tocam; se não ficar pronto a tempo, toca uma música comum no lugar.
+A reprodução fica a cargo de core.playout (próximo item já enfileirado no mixer, sem pausa).
 """
 
+import itertools
+import queue
+import threading
 import time
+from dataclasses import dataclass
 from pathlib import Path
 
 import pygame
 
 from core.mixer import create_ducked_mix, get_next_track
 from core.news_agent import run as news_run
+from core.playout import PlayoutEngine, PlayoutItem
 from core.voice_agent import run as voice_run
 
 # Pasta de saída para áudio da locução e mix com ducking
 OUTPUT_DIR = Path(__file__).resolve().parent / "output"
-DUCKED_FILE = OUTPUT_DIR / "ducked_latest.mp3"
+# Segmentos preparados em segundo plano (um par voz/mix por segmento)
+PREPARED_DIR = OUTPUT_DIR / "prepared"
+# Quantos segmentos prontos podem esperar na fila (o preparo para quando enche)
+PREPARED_QUEUE_SIZE = 2
+# Na hora do segmento, quanto esperar pelo preparo antes de tocar música comum
+PREPARE_DEADLINE_SEC = 5
+# Segmento pronto há mais tempo que isso está velho (notícia desatualizada): descarta
+PREPARED_MAX_AGE_SEC = 2 * 3600
+# Pausa depois de uma falha no preparo (API fora, sem notícias...)
+PREPARE_RETRY_SEC = 30
 
+# get_next_track usa um histórico global: a thread de preparo e o loop principal dividem
+_track_lock = threading.Lock()
+_segment_ids = itertools.count(1)
 
-def _play_audio(path: Path, block: bool = True) -> None:
-    """Toca um arquivo de áudio (MP3) e, se block=True, espera terminar."""
-    if not path.is_file():
-        return
-    pygame.mixer.music.load(str(path))
-    pygame.mixer.music.play()
-    if block:
-        while pygame.mixer.music.get_busy():
-            time.sleep(0.1)
 
+@dataclass
+class PreparedSegment:
+    """Segmento de notícias pronto: locução e mix com a música de fundo (ou só a voz)."""
 
-def _play_music_track() -> bool:
-    """Toca a próxima faixa da playlist. Retorna True se tocou, False se não houver músicas."""
-    track = get_next_track()
-    if track is None:
-        return False
-    _play_audio(track)
-    return True
+    voice_path: Path
+    mix_path: Path | None
+    created_at: float
 
+    def discard(self) -> None:
+        for p in (self.voice_path, self.mix_path):
+            if p is not None:
+                p.unlink(missing_ok=True)
 
-def _play_news_with_ducking() -> bool:
+
+def _next_track() -> Path | None:
+    with _track_lock:
+        return get_next_track()
+
+
+def _prepare_segment() -> PreparedSegment:
+    """Roteiro → voz → mix com ducking sobre a próxima faixa (arquivos próprios do segmento)."""
+    n = next(_segment_ids)
+    PREPARED_DIR.mkdir(parents=True, exist_ok=True)
+    script = news_run()
+    voice_path = voice_run(script, output_path=PREPARED_DIR / f"voice_{n}.mp3")
+    track = _next_track()
+    mix_path = None
+    if track is not None:
+        mix_path = PREPARED_DIR / f"ducked_{n}.mp3"
+        create_ducked_mix(track, voice_path, mix_path)
+    return PreparedSegment(voice_path=voice_path, mix_path=mix_path, created_at=time.monotonic())
+
+
+def _prepare_worker(prepared: queue.Queue, stop: threading.Event) -> None:
+    """Mantém a fila de segmentos cheia; put() bloqueia quando ela está cheia."""
+    while not stop.is_set():
+        try:
+            segment = _prepare_segment()
+        except Exception as e:
+            print(f"Preparo do segmento falhou: {e}")
+            stop.wait(PREPARE_RETRY_SEC)
+            continue
+        while not stop.is_set():
+            try:
+                prepared.put(segment, timeout=1)
+                break
+            except queue.Full:
+                continue
+        else:
+            segment.discard()
+
+
+def _take_segment(prepared: queue.Queue, wait: bool) -> PreparedSegment | None:
     """
-    Toca a Música 3 com ducking: locutor fala sobre a introdução da música.
-    Usa output/news_latest.mp3 como voz e a próxima faixa como trilha.
-    Retorna True se tocou, False se faltar música ou voz.
+    Próximo segmento pronto e recente. wait=False: só se já estiver pronto; wait=True: espera
+    até PREPARE_DEADLINE_SEC. None se o preparo não cumpriu o prazo.
     """
-    voice_path = OUTPUT_DIR / "news_latest.mp3"
-    if not voice_path.is_file():
-        return False
-    track = get_next_track()
-    if track is None:
-        _play_audio(voice_path)
-        return True
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    create_ducked_mix(track, voice_path, DUCKED_FILE)
-    _play_audio(DUCKED_FILE)
-    return True
-
-
-def run_cycle() -> None:
-    """Executa um ciclo completo do fluxo da rádio."""
-    # 1. Tocar Música 1
-    _play_music_track()
-    # 2. Tocar Música 2
-    _play_music_track()
-    # 3. Atualizar notícias e gerar áudio da locução
-    script = news_run()
-    voice_run(script)
-    # 4. Tocar Música 3 com Ducking (locutor na introdução)
-    _play_news_with_ducking()
+    deadline = time.monotonic() + (PREPARE_DEADLINE_SEC if wait else 0)
+    while True:
+        try:
+            if wait:
+                segment = prepared.get(timeout=max(0.0, deadline - time.monotonic()))
+            else:
+                segment = prepared.get_nowait()
+        except queue.Empty:
+            return None
+        if time.monotonic() - segment.created_at <= PREPARED_MAX_AGE_SEC:
+            return segment
+        segment.discard()
+
+
+class Programming:
+    """
+    Ciclo da rádio para o motor de reprodução: Música 1 → Música 2 → Música 3 com ducking
+    (segmento de notícias preparado em segundo plano) → repetir.
+    """
+
+    def __init__(self, prepared: queue.Queue) -> None:
+        self.prepared = prepared
+        self.slot = 0
+
+    def next_item(self, final: bool) -> PlayoutItem | None:
+        if self.slot < 2:
+            track = _next_track()
+            if track is None:
+                return None
+            self.slot += 1
+            return PlayoutItem(track)
+        # Vez das notícias: na antecipação só serve se já estiver pronto; na hora, espera o prazo
+        segment = _take_segment(self.prepared, wait=final)
+        if segment is None:
+            if not final:
+                return None
+            # Preparo atrasado: música comum no lugar, e o ciclo recomeça
+            track = _next_track()
+            if track is None:
+                return None
+            self.slot = 0
+            return PlayoutItem(track)
+        self.slot = 0
+        return PlayoutItem(segment.mix_path or segment.voice_path, kind="news", on_done=segment.discard)
 
 
 def main() -> None:
     pygame.mixer.init()
+    prepared: queue.Queue = queue.Queue(maxsize=PREPARED_QUEUE_SIZE)
+    stop = threading.Event()
+    worker = threading.Thread(target=_prepare_worker, args=(prepared, stop), daemon=True)
+    worker.start()
+    engine = PlayoutEngine(Programming(prepared).next_item)
     try:
-        while True:
-            run_cycle()
+        engine.run()
     except KeyboardInterrupt:
         print("\nRádio IA encerrada.")
+        print(f"Transições: {engine.stats()}")
     finally:
+        stop.set()
+        while not prepared.empty():
+            prepared.get_nowait().discard()
         pygame.mixer.quit()
 
 
@@ -0,0 +1,121 @@
+"""
+Benchmark dos codecs do mixer - Rádio IA
+Repete as operações de codec de um bloco com bed (decodifica voz, decodifica bed, exporta o
+mix, decodifica para medir LUFS, exporta normalizado) em cada backend disponível:
+"pydub" (um ffmpeg por operação) e "workers" (processos de codec de vida longa). Mostra o
+custo de abrir um ffmpeg, o tempo por operação e por bloco.
+
+Entrada: --input (MP3 de ~2 min, como a locução); sem --input, um tom de --seconds gerado e
+encodado pelo backend disponível.
+
+Uso: python tools/bench_codec.py [--input voz.mp3] [--blocks 5] [--backends pydub,workers]
+"""
+
+import argparse
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from core.mixer import PydubCodec, WorkerCodec, _workers_available  # noqa: E402
+
+# Operações de codec de um bloco com bed (render_block + normalize_lufs)
+BLOCK_OPS = ("decode", "decode", "encode", "decode", "encode")
+
+
+def spawn_ms(runs: int = 10) -> float | None:
+    """Tempo médio para abrir e fechar um ffmpeg (sem trabalho nenhum)."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([ffmpeg, "-hide_banner", "-version"], stdout=subprocess.DEVNULL, check=False)
+        times.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(times), 1)
+
+
+def make_input(codecs: dict, seconds: float, dest: Path) -> Path:
+    from pydub.generators import Sine
+
+    seg = Sine(220, sample_rate=44100).to_audio_segment(duration=int(seconds * 1000), volume=-12).set_channels(1)
+    next(iter(codecs.values())).encode(seg, dest)
+    return dest
+
+
+def run_block(codec, source: Path, work: Path) -> dict[str, list[float]]:
+    """Uma rodada das operações de BLOCK_OPS; tempos (ms) por tipo de operação."""
+    times: dict[str, list[float]] = {"decode": [], "encode": []}
+    seg = None
+    for i, op in enumerate(BLOCK_OPS):
+        t0 = time.perf_counter()
+        if op == "decode":
+            seg = codec.decode(source)
+        else:
+            codec.encode(seg, work / f"op{i}.mp3")
+        times[op].append((time.perf_counter() - t0) * 1000)
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Custo de codec por bloco: ffmpeg por operação x workers")
+    parser.add_argument("--input", help="MP3 de entrada (padrão: tom gerado)")
+    parser.add_argument("--seconds", type=float, default=120.0, help="duração do tom gerado (s)")
+    parser.add_argument("--blocks", type=int, default=5, help="blocos simulados por backend")
+    parser.add_argument("--backends", default="pydub,workers", help="backends a medir")
+    opts = parser.parse_args()
+
+    codecs = {}
+    for name in opts.backends.split(","):
+        name = name.strip()
+        if name == "pydub":
+            if shutil.which("ffmpeg") is None:
+                print("pydub: indisponível (ffmpeg não encontrado)")
+                continue
+            codecs[name] = PydubCodec()
+        elif name == "workers":
+            if not _workers_available():
+                print("workers: indisponível (instale lameenc e miniaudio)")
+                continue
+            codecs[name] = WorkerCodec()
+    if not codecs:
+        print("Nenhum backend disponível.")
+        return 1
+
+    spawn = spawn_ms()
+    print(f"Abrir um ffmpeg: {spawn if spawn is not None else '-'} ms | {len(BLOCK_OPS)} operações de codec por bloco")
+    with tempfile.TemporaryDirectory(prefix="radio-codec-") as tmp:
+        work = Path(tmp)
+        source = Path(opts.input) if opts.input else make_input(codecs, opts.seconds, work / "entrada.mp3")
+        for name, codec in codecs.items():
+            # Primeira rodada fora da conta: sobe os workers e aquece caches
+            run_block(codec, source, work)
+            per_op: dict[str, list[float]] = {"decode": [], "encode": []}
+            blocks = []
+            for _ in range(opts.blocks):
+                t0 = time.perf_counter()
+                times = run_block(codec, source, work)
+                blocks.append((time.perf_counter() - t0) * 1000)
+                for op, values in times.items():
+                    per_op[op].extend(values)
+            print(
+                f"{name:<8} bloco {statistics.median(blocks):>8.1f} ms | "
+                f"decode {statistics.median(per_op['decode']):>7.1f} ms | "
+                f"encode {statistics.median(per_op['encode']):>7.1f} ms"
+            )
+            if name == "pydub" and spawn is not None:
+                print(f"         só abrir processos: ~{spawn * len(BLOCK_OPS):.0f} ms por bloco")
+            if isinstance(codec, WorkerCodec):
+                codec.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
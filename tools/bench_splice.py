@@ -0,0 +1,132 @@
+"""
+Benchmark da emenda de MP3 - Rádio IA
+Monta um bloco de ~2 min a partir de N trechos MP3 com pausa fixa entre eles, como a locução
+por trechos faz, de dois jeitos: emenda por quadros (mixer.splice_mp3, sem decodificar) e o
+caminho pydub (decodifica, junta com silêncio, exporta MP3; precisa de ffmpeg). Mostra tempo
+de parede, CPU (incluindo o ffmpeg) e tamanho da saída.
+
+Trechos: cortados (nos limites de quadro) de --input, repetido até dar --block-sec; sem
+--input, gerados com pydub (tom senoidal, 44,1 kHz mono 128k, como a ElevenLabs entrega).
+
+Uso: python tools/bench_splice.py [--input voz.mp3] [--pieces 8] [--block-sec 120] [--runs 5]
+"""
+
+import argparse
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from core.mixer import _concat_reencode, parse_mp3, splice_mp3  # noqa: E402
+
+
+def _synth_source(seconds: float) -> bytes:
+    """Tom de teste codificado em MP3 pelo pydub/ffmpeg (formato da ElevenLabs)."""
+    from io import BytesIO
+
+    from pydub.generators import Sine
+
+    seg = Sine(220, sample_rate=44100).to_audio_segment(duration=int(seconds * 1000), volume=-12).set_channels(1)
+    buf = BytesIO()
+    seg.export(buf, format="mp3", bitrate="128k")
+    return buf.getvalue()
+
+
+def make_pieces(source: bytes, pieces: int, block_sec: float) -> list[bytes]:
+    """Corta a fonte (repetida até block_sec) em pieces trechos, nos limites de quadro."""
+    stream = parse_mp3(source)
+    if stream is None:
+        raise SystemExit("Entrada não reconhecida como MP3.")
+    frame_ms = stream.samples_per_frame * 1000 / stream.sample_rate
+    need = int(block_sec * 1000 / frame_ms)
+    frames = [stream.frames[i % len(stream.frames)] for i in range(need)]
+    per = max(1, need // pieces)
+    out = []
+    for k in range(pieces):
+        chunk = frames[k * per:(k + 1) * per] if k < pieces - 1 else frames[k * per:]
+        out.append(b"".join(source[off:off + size] for off, size in chunk))
+    return out
+
+
+def _cpu() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + kids.ru_utime + kids.ru_stime
+
+
+def bench(label: str, fn, runs: int, out: Path) -> dict | None:
+    walls, cpus = [], []
+    for _ in range(runs):
+        c0, t0 = _cpu(), time.perf_counter()
+        try:
+            fn(out)
+        except Exception as e:
+            print(f"{label:<10} indisponível: {e}")
+            return None
+        walls.append((time.perf_counter() - t0) * 1000)
+        cpus.append((_cpu() - c0) * 1000)
+    result = {
+        "wall_ms": round(statistics.median(walls), 1),
+        "wall_min_ms": round(min(walls), 1),
+        "cpu_ms": round(statistics.median(cpus), 1),
+        "bytes": out.stat().st_size,
+    }
+    print(
+        f"{label:<10} mediana {result['wall_ms']:>9.1f} ms | mín {result['wall_min_ms']:>9.1f} ms | "
+        f"CPU {result['cpu_ms']:>9.1f} ms | {result['bytes'] / 1024:.0f} KB"
+    )
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Emenda por quadros x pydub para montar um bloco")
+    parser.add_argument("--input", help="MP3 de origem dos trechos (padrão: tom gerado pelo pydub)")
+    parser.add_argument("--pieces", type=int, default=8, help="quantidade de trechos")
+    parser.add_argument("--block-sec", type=float, default=120.0, help="duração total do bloco (s)")
+    parser.add_argument("--pause-ms", type=int, default=600, help="pausa entre trechos (ms)")
+    parser.add_argument("--runs", type=int, default=5, help="repetições de cada caminho")
+    opts = parser.parse_args()
+
+    if opts.input:
+        source = Path(opts.input).read_bytes()
+    else:
+        try:
+            source = _synth_source(min(opts.block_sec, 30.0))
+        except Exception as e:
+            print(f"Sem --input e sem ffmpeg para gerar o tom de teste ({e}). Use --input arquivo.mp3.")
+            return 1
+    parts = make_pieces(source, opts.pieces, opts.block_sec)
+    streams = [parse_mp3(p) for p in parts]
+    fmt = streams[0].format
+    total_ms = sum(s.duration_ms for s in streams) + opts.pause_ms * (len(parts) - 1)
+    print(
+        f"{len(parts)} trechos | MPEG {fmt[0]} camada {fmt[1]} {fmt[2]} Hz {fmt[3]} canal(is) | "
+        f"bloco {total_ms / 1000:.1f} s | pausa {opts.pause_ms} ms | {opts.runs} execuções"
+    )
+
+    with tempfile.TemporaryDirectory(prefix="radio-splice-") as tmp:
+        tmp = Path(tmp)
+        splice = bench(
+            "quadros",
+            lambda out: splice_mp3([parse_mp3(p) for p in parts], out, opts.pause_ms),
+            opts.runs,
+            tmp / "splice.mp3",
+        )
+        pydub = bench(
+            "pydub",
+            lambda out: _concat_reencode(parts, out, opts.pause_ms, "128k"),
+            opts.runs,
+            tmp / "pydub.mp3",
+        )
+    if splice and pydub and splice["wall_ms"] > 0:
+        print(f"Emenda por quadros {pydub['wall_ms'] / splice['wall_ms']:.0f}x mais rápida (mediana)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Orçamento de inicialização do servidor web - Rádio IA
+Mede o tempo de "import app" com python -X importtime (melhor de N execuções, processo novo
+a cada vez) e confere que nenhuma biblioteca pesada de geração foi carregada. Sai com código 1
+se passar do orçamento; serve de verificação no CI ou antes de publicar.
+
+Uso: python tools/check_import_time.py [--budget-ms 800] [--runs 3]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# Orçamento padrão do "import app" (ms, tempo cumulativo informado pelo -X importtime)
+DEFAULT_BUDGET_MS = int(os.getenv("APP_IMPORT_BUDGET_MS", "800"))
+# Só os caminhos de geração podem carregar estes módulos
+HEAVY_MODULES = (
+    "google.generativeai",
+    "elevenlabs",
+    "pydub",
+    "numpy",
+    "scipy",
+    "pyloudnorm",
+    "feedparser",
+    "bs4",
+    "requests",
+)
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_once(module: str = "app") -> tuple[float, list[tuple[float, str]]]:
+    """Tempo cumulativo do import (ms) e os maiores imports de primeiro nível."""
+    env = dict(os.environ, RADIO_GENERATOR="0")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} falhou:\n{proc.stderr[-2000:]}")
+    total_us = None
+    top: list[tuple[float, str]] = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        cumulative, indent, name = int(m.group(2)), len(m.group(3)), m.group(4)
+        # Filhos aparecem antes do pai: zera a lista a cada import de primeiro nível alheio
+        if indent <= 1:
+            if name == module:
+                total_us = cumulative
+                break
+            top = []
+        elif indent <= 3:
+            top.append((cumulative / 1000, name))
+    if total_us is None:
+        raise RuntimeError(f"{module} não apareceu na saída do -X importtime")
+    return total_us / 1000, sorted(top, reverse=True)[:8]
+
+
+def loaded_heavy_modules(module: str = "app") -> list[str]:
+    """Módulos pesados presentes em sys.modules depois de importar o app."""
+    code = (
+        f"import sys, {module}\n"
+        f"heavy = {HEAVY_MODULES!r}\n"
+        "print(' '.join(h for h in heavy if h in sys.modules))"
+    )
+    env = dict(os.environ, RADIO_GENERATOR="0")
+    out = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    return out.stdout.split()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Confere o tempo de import do app contra um orçamento.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--module", default="app")
+    args = parser.parse_args()
+
+    results = [measure_once(args.module) for _ in range(max(1, args.runs))]
+    best_ms, top = min(results, key=lambda r: r[0])
+    print(f"import {args.module}: {best_ms:.0f} ms (melhor de {len(results)}; orçamento {args.budget_ms:.0f} ms)")
+    for ms, name in top:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    ok = True
+    heavy = loaded_heavy_modules(args.module)
+    if heavy:
+        print(f"FALHOU: módulos pesados carregados no import: {', '.join(heavy)}")
+        ok = False
+    if best_ms > args.budget_ms:
+        print("FALHOU: import acima do orçamento")
+        ok = False
+    if ok:
+        print("OK")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
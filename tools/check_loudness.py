@@ -0,0 +1,111 @@
+"""
+Conferência do medidor de loudness - Rádio IA
+Mede os mesmos sinais com core.loudness (streaming, float32) e com o pyloudnorm (buffer
+inteiro em float64, o caminho antigo do normalize_lufs): diferença do LUFS integrado, tempo
+e pico de memória do Python (tracemalloc) de cada um. Falha se a diferença passar de
+--tolerance LU.
+
+Entrada: arquivos de áudio (--files, decodificados pelo codec do mixer); sem --files, sinais
+sintéticos em várias taxas/canais, com trechos baixos e silêncio (exercitam as duas portas).
+
+Uso: python tools/check_loudness.py [--files a.mp3 b.mp3] [--tolerance 0.1]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import numpy as np  # noqa: E402
+
+from core.loudness import LoudnessMeter  # noqa: E402
+
+# Pedaço entregue ao medidor em streaming (s)
+CHUNK_SEC = 5.0
+
+
+def synthetic(rate: int, channels: int, seconds: float, seed: int = 0) -> np.ndarray:
+    """Tom + ruído com trechos 34 dB abaixo (porta relativa) e 2 s de silêncio (absoluta)."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * seconds)) / rate
+    env = np.where((t % 20) < 12, 1.0, 0.02)
+    x = (np.sin(2 * np.pi * 440 * t) * 0.3 + rng.standard_normal(len(t)) * 0.1) * env
+    x[: int(rate * 2)] = 0
+    return np.stack([x * (1 - 0.3 * c) for c in range(channels)], axis=1).astype(np.float32)
+
+
+def from_file(path: Path) -> tuple[np.ndarray, int]:
+    from core.mixer import codec
+
+    seg = codec().decode(path)
+    pcm = np.frombuffer(seg.raw_data, dtype=np.int16).reshape(-1, seg.channels)
+    return pcm.astype(np.float32) / 32768.0, seg.frame_rate
+
+
+def _measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    value = fn()
+    elapsed = (time.perf_counter() - t0) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, elapsed, peak / 1e6
+
+
+def streaming(data: np.ndarray, rate: int) -> float | None:
+    meter = LoudnessMeter(rate, data.shape[1])
+    step = int(CHUNK_SEC * rate)
+    for start in range(0, len(data), step):
+        meter.add(data[start:start + step])
+    return meter.integrated
+
+
+def reference(data: np.ndarray, rate: int) -> float | None:
+    import pyloudnorm as pyln
+
+    lufs = pyln.Meter(rate).integrated_loudness(data.astype(np.float64))
+    return float(lufs) if np.isfinite(lufs) else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Medidor em streaming x pyloudnorm")
+    parser.add_argument("--files", nargs="*", help="arquivos de áudio (padrão: sinais sintéticos)")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="diferença máxima aceita (LU)")
+    opts = parser.parse_args()
+    try:
+        import pyloudnorm  # noqa: F401
+    except ImportError:
+        print("pyloudnorm não instalado: nada para comparar.")
+        return 1
+
+    cases = []
+    if opts.files:
+        for name in opts.files:
+            data, rate = from_file(Path(name))
+            cases.append((Path(name).name, data, rate))
+    else:
+        for rate, channels, seconds in ((44100, 2, 240), (48000, 1, 60), (22050, 2, 17.3), (11025, 1, 30)):
+            cases.append((f"sintético {rate} Hz {channels}ch {seconds}s", synthetic(rate, channels, seconds), rate))
+
+    worst = 0.0
+    for label, data, rate in cases:
+        ours, ours_ms, ours_mb = _measure(lambda: streaming(data, rate))
+        ref, ref_ms, ref_mb = _measure(lambda: reference(data, rate))
+        diff = abs(ours - ref) if ours is not None and ref is not None else (0.0 if ours == ref else float("inf"))
+        worst = max(worst, diff)
+        fmt = lambda v: f"{v:8.3f}" if v is not None else "       -"  # noqa: E731
+        print(
+            f"{label:<32} streaming {fmt(ours)} LUFS {ours_ms:7.1f} ms {ours_mb:7.1f} MB | "
+            f"pyloudnorm {fmt(ref)} LUFS {ref_ms:7.1f} ms {ref_mb:7.1f} MB | dif {diff:.4f} LU"
+        )
+    ok = worst <= opts.tolerance
+    print(f"{'OK' if ok else 'FALHOU'}: maior diferença {worst:.4f} LU (tolerância {opts.tolerance} LU)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,440 @@
+"""
+Teste de carga da camada web - Rádio IA
+Simula N ouvintes com o mesmo comportamento do player (templates/index.html): /api/status ao
+abrir e a cada 3 s até haver bloco, laço de /api/next + download do áudio, espera de 0,4 s
+entre itens e polling do chat a cada 3 s (com envio ocasional). Roda em degraus de
+concorrência e, para cada degrau, informa latência p50/p95/p99 por rota, taxa de erro,
+vazão (req/s e MB/s) e RSS do servidor.
+
+Dois alvos:
+- padrão: test client do Flask no mesmo processo, com blocos e músicas sintéticos numa pasta
+  temporária (não usa APIs nem a pasta output/ de verdade). Gerador de carga e servidor
+  dividem o mesmo GIL: serve para comparar versões, não como número absoluto.
+- --url: servidor já rodando (python app.py, gunicorn...). RSS só com --server-pid.
+  Atenção: com --chat-send > 0 as mensagens vão para o chat real.
+
+"Ouvir" um item dura --play-sec (tempo comprimido; as faixas reais têm minutos).
+
+Uso: python tools/loadtest.py [--steps 10,25,50] [--duration 20] [--play-sec 2]
+     python tools/loadtest.py --url http://127.0.0.1:5000 --server-pid 1234 --json carga.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# Intervalos do player (index.html)
+STATUS_RETRY_SEC = 3.0
+NEXT_RETRY_SEC = 4.0
+ERROR_RETRY_SEC = 3.0
+BETWEEN_ITEMS_SEC = 0.4
+CHAT_POLL_SEC = 3.0
+# Rotas medidas (ordem do relatório)
+KINDS = ("status", "next", "audio", "chat_poll", "chat_send")
+# Intervalo de amostragem do RSS durante um degrau (s)
+RSS_SAMPLE_SEC = 0.5
+
+
+# ---------- Clientes ----------
+
+
+class _Response:
+    def __init__(self, status: int, body: bytes) -> None:
+        self.status = status
+        self.body = body
+
+    def json(self) -> dict:
+        try:
+            return json.loads(self.body or b"{}")
+        except ValueError:
+            return {}
+
+
+class TestClientTransport:
+    """Flask test client (um por ouvinte)."""
+
+    def __init__(self, flask_app) -> None:
+        self.client = flask_app.test_client()
+
+    def request(self, method: str, path: str, body: dict | None = None) -> _Response:
+        resp = self.client.open(path, method=method, json=body)
+        try:
+            return _Response(resp.status_code, resp.get_data())
+        finally:
+            resp.close()
+
+    def close(self) -> None:
+        pass
+
+
+class HttpTransport:
+    """Conexão HTTP persistente por ouvinte (como o navegador), refeita se cair."""
+
+    def __init__(self, base_url: str) -> None:
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.netloc
+        self.base_path = parts.path.rstrip("/")
+        self.conn: http.client.HTTPConnection | None = None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, timeout=30)
+
+    def request(self, method: str, path: str, body: dict | None = None) -> _Response:
+        headers = {"Accept": "*/*"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = self._connect()
+            try:
+                self.conn.request(method, self.base_path + path, body=data, headers=headers)
+                resp = self.conn.getresponse()
+                return _Response(resp.status, resp.read())
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if attempt:
+                    raise
+        raise RuntimeError("unreachable")
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# ---------- Medições ----------
+
+
+class Recorder:
+    """Amostras de um degrau: (rota, latência ms, status, bytes)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.samples: list[tuple[str, float, int, int]] = []
+
+    def add(self, kind: str, ms: float, status: int, size: int) -> None:
+        with self._lock:
+            self.samples.append((kind, ms, status, size))
+
+
+def _percentile(sorted_values: list[float], p: float) -> float | None:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return round(sorted_values[idx], 2)
+
+
+def _is_error(kind: str, status: int) -> bool:
+    """503 de /api/status e /api/next é "ainda não há bloco" (o player espera), não erro."""
+    if status == 503 and kind in ("status", "next"):
+        return False
+    return status == 0 or status >= 400
+
+
+def _summary(samples: list[tuple[str, float, int, int]], elapsed: float) -> dict:
+    def block(rows: list[tuple[str, float, int, int]]) -> dict:
+        lat = sorted(r[1] for r in rows)
+        errors = sum(1 for r in rows if _is_error(r[0], r[2]))
+        return {
+            "requests": len(rows),
+            "errors": errors,
+            "errorRate": round(errors / len(rows), 4) if rows else 0.0,
+            "p50Ms": _percentile(lat, 50),
+            "p95Ms": _percentile(lat, 95),
+            "p99Ms": _percentile(lat, 99),
+        }
+
+    out = block(samples)
+    out["reqPerSec"] = round(len(samples) / elapsed, 1) if elapsed > 0 else 0.0
+    out["mbPerSec"] = round(sum(r[3] for r in samples) / elapsed / 1e6, 2) if elapsed > 0 else 0.0
+    out["notReady"] = sum(1 for r in samples if r[2] == 503 and r[0] in ("status", "next"))
+    out["byRoute"] = {k: block([r for r in samples if r[0] == k]) for k in KINDS if any(r[0] == k for r in samples)}
+    return out
+
+
+def _rss_mb(pid: int | None) -> float | None:
+    """RSS atual (MB) de /proc/<pid>/status; no próprio processo, pico via getrusage se não houver /proc."""
+    target = "self" if pid is None else str(pid)
+    try:
+        with open(f"/proc/{target}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if pid is None:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return None
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid: int | None, enabled: bool) -> None:
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.enabled = enabled
+        self.values: list[float] = []
+        self.stop = threading.Event()
+
+    def run(self) -> None:
+        while self.enabled:
+            value = _rss_mb(self.pid)
+            if value is not None:
+                self.values.append(value)
+            if self.stop.wait(RSS_SAMPLE_SEC):
+                break
+
+
+# ---------- Ouvinte ----------
+
+
+class Listener(threading.Thread):
+    """Um ouvinte seguindo o player: status → (espera bloco) → next → áudio → ... + chat."""
+
+    def __init__(self, idx: int, transport, prefix: str, rec: Recorder, stop: threading.Event, opts) -> None:
+        super().__init__(daemon=True, name=f"ouvinte-{idx}")
+        self.idx = idx
+        self.transport = transport
+        self.prefix = prefix
+        self.rec = rec
+        self.stop = stop
+        self.opts = opts
+        self.rng = random.Random(idx)
+        self.music_only = self.rng.random() < opts.music_only_share
+        self.chat_cursor = 0
+        self.next_chat = 0.0
+
+    def _call(self, kind: str, method: str, path: str, body: dict | None = None) -> _Response | None:
+        t0 = time.perf_counter()
+        try:
+            resp = self.transport.request(method, path, body)
+        except Exception:
+            self.rec.add(kind, (time.perf_counter() - t0) * 1000, 0, 0)
+            return None
+        self.rec.add(kind, (time.perf_counter() - t0) * 1000, resp.status, len(resp.body))
+        return resp
+
+    def _poll_chat(self) -> None:
+        resp = self._call("chat_poll", "GET", f"{self.prefix}/api/chat/messages?after={self.chat_cursor}")
+        if resp is not None and resp.status == 200:
+            self.chat_cursor = resp.json().get("cursor") or self.chat_cursor
+        if self.rng.random() < self.opts.chat_send:
+            self._call("chat_send", "POST", f"{self.prefix}/api/chat/send",
+                       {"message": f"teste de carga {self.idx}", "user": f"carga{self.idx}"})
+        self.next_chat = time.monotonic() + CHAT_POLL_SEC
+
+    def _wait(self, seconds: float) -> None:
+        """Espera como o player: o setInterval do chat continua rodando."""
+        deadline = time.monotonic() + seconds
+        while not self.stop.is_set():
+            now = time.monotonic()
+            if now >= self.next_chat:
+                self._poll_chat()
+                continue
+            if now >= deadline:
+                return
+            self.stop.wait(min(deadline, self.next_chat) - now)
+
+    def _can_play(self) -> bool:
+        resp = self._call("status", "GET", f"{self.prefix}/api/status")
+        return resp is not None and resp.status == 200 and bool(resp.json().get("canPlay"))
+
+    def run(self) -> None:
+        try:
+            self._can_play()
+            self._poll_chat()
+            if not self.music_only:
+                while not self.stop.is_set() and not self._can_play():
+                    self._wait(STATUS_RETRY_SEC)
+            query = "?mode=music_only" if self.music_only else ""
+            while not self.stop.is_set():
+                resp = self._call("next", "GET", f"{self.prefix}/api/next{query}")
+                if resp is None or resp.status == 503:
+                    self._wait(NEXT_RETRY_SEC)
+                    continue
+                item = resp.json()
+                if resp.status != 200 or not item.get("url"):
+                    self._wait(ERROR_RETRY_SEC)
+                    continue
+                audio = self._call("audio", "GET", item["url"])
+                if audio is None or audio.status != 200:
+                    self._wait(ERROR_RETRY_SEC)
+                    continue
+                self._wait(self.opts.play_sec)
+                self._wait(BETWEEN_ITEMS_SEC)
+        finally:
+            self.transport.close()
+
+
+# ---------- Dados sintéticos (test client) ----------
+
+
+def _synthetic_app(work: Path, opts):
+    """
+    Importa app.py e troca a rádio padrão por uma com músicas e blocos sintéticos em work.
+    A fila de blocos é reabastecida por uma thread (não há gerador rodando).
+    """
+    os.environ.setdefault("RADIO_GENERATOR", "0")
+    sys.path.insert(0, str(BASE_DIR))
+    import app as radio
+    from core import block_manifest, library_index
+    from core.state_store import open_store
+    from core.station import DEFAULT_SLUG, Station
+
+    music_dir, blocks_dir = work / "musicas", work / "blocks"
+    music_dir.mkdir()
+    blocks_dir.mkdir()
+    # Bytes aleatórios bastam: as rotas de áudio só servem o arquivo, não decodificam
+    for i in range(opts.tracks):
+        (music_dir / f"Faixa de teste {i:02d}.mp3").write_bytes(os.urandom(opts.track_kb * 1024))
+    rows, names = [], []
+    for i in range(opts.blocks):
+        path = blocks_dir / f"block_{i + 1:06d}.mp3"
+        path.write_bytes(os.urandom(opts.block_kb * 1024))
+        rows.append(block_manifest.build_row(path, duration_ms=120_000, source="carga"))
+        names.append(path.name)
+    block_manifest.write_manifest(blocks_dir, rows)
+
+    st = Station(
+        slug=DEFAULT_SLUG,
+        name="Carga",
+        music_dir=music_dir,
+        bed_path=None,
+        blocks_dir=blocks_dir,
+        staging_dir=work / "blocks_staging",
+        work_dir=work,
+        state=open_store("memory"),
+    )
+    st.producer = radio._make_producer(st)
+    st.stories = radio._make_story_index(st)
+    st.library = library_index.for_dir(music_dir)
+    st.state.queue_replace(names)
+    radio.STATIONS[DEFAULT_SLUG] = st
+
+    stop = threading.Event()
+
+    def refill() -> None:
+        i = 0
+        while not stop.wait(0.2):
+            while st.state.queue_len() < len(names):
+                st.state.queue_append(names[i % len(names)])
+                i += 1
+
+    threading.Thread(target=refill, daemon=True).start()
+    return radio.app, stop
+
+
+# ---------- Degraus ----------
+
+
+def run_step(concurrency: int, make_transport, opts, rss_pid: int | None, rss_enabled: bool) -> dict:
+    rec = Recorder()
+    stop = threading.Event()
+    sampler = RssSampler(rss_pid, rss_enabled)
+    sampler.start()
+    listeners = [Listener(i, make_transport(), opts.prefix, rec, stop, opts) for i in range(concurrency)]
+    t0 = time.perf_counter()
+    for i, listener in enumerate(listeners):
+        listener.start()
+        if opts.ramp > 0:
+            time.sleep(opts.ramp / concurrency)
+    stop.wait(max(0.0, opts.duration - (time.perf_counter() - t0)))
+    stop.set()
+    for listener in listeners:
+        listener.join(timeout=30)
+    elapsed = time.perf_counter() - t0
+    sampler.stop.set()
+    sampler.join()
+    result = {"concurrency": concurrency, "durationSec": round(elapsed, 1), **_summary(rec.samples, elapsed)}
+    result["rssMb"] = sampler.values[-1] if sampler.values else None
+    result["rssMaxMb"] = max(sampler.values) if sampler.values else None
+    return result
+
+
+def _fmt(value) -> str:
+    return "-" if value is None else str(value)
+
+
+def print_step(r: dict) -> None:
+    print(
+        f"\n== {r['concurrency']} ouvintes | {r['requests']} req em {r['durationSec']} s | "
+        f"{r['reqPerSec']} req/s | {r['mbPerSec']} MB/s | erros {r['errors']} ({r['errorRate'] * 100:.2f}%) | "
+        f"503 sem bloco {r['notReady']} | RSS {_fmt(r['rssMb'])} MB (máx {_fmt(r['rssMaxMb'])})"
+    )
+    print(f"   {'rota':<10} {'req':>7} {'erros':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for kind, s in r["byRoute"].items():
+        print(f"   {kind:<10} {s['requests']:>7} {s['errors']:>6} {_fmt(s['p50Ms']):>9} {_fmt(s['p95Ms']):>9} {_fmt(s['p99Ms']):>9}")
+    print(f"   {'total':<10} {r['requests']:>7} {r['errors']:>6} {_fmt(r['p50Ms']):>9} {_fmt(r['p95Ms']):>9} {_fmt(r['p99Ms']):>9}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga da camada web (ouvintes simulados)")
+    parser.add_argument("--url", help="servidor já rodando (padrão: test client com dados sintéticos)")
+    parser.add_argument("--server-pid", type=int, help="PID do servidor (RSS em modo --url)")
+    parser.add_argument("--station", help="slug da rádio (rotas /s/<rádio>/); padrão: rádio padrão")
+    parser.add_argument("--steps", default="10,25,50", help="degraus de concorrência (ex.: 10,50,100)")
+    parser.add_argument("--duration", type=float, default=20.0, help="duração de cada degrau (s)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="tempo para subir todos os ouvintes do degrau (s)")
+    parser.add_argument("--play-sec", type=float, default=2.0, help="tempo de \"escuta\" de cada item (s)")
+    parser.add_argument("--chat-send", type=float, help="chance de enviar mensagem a cada polling (padrão 0,02; 0 com --url)")
+    parser.add_argument("--music-only-share", type=float, default=0.1, help="fração de ouvintes no modo só músicas")
+    parser.add_argument("--tracks", type=int, default=12, help="músicas sintéticas")
+    parser.add_argument("--track-kb", type=int, default=3000, help="tamanho de cada música sintética (KB)")
+    parser.add_argument("--blocks", type=int, default=15, help="blocos sintéticos")
+    parser.add_argument("--block-kb", type=int, default=1900, help="tamanho de cada bloco sintético (KB)")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    opts = parser.parse_args()
+
+    steps = [int(s) for s in opts.steps.split(",") if s.strip()]
+    opts.prefix = f"/s/{opts.station}" if opts.station else ""
+    if opts.chat_send is None:
+        opts.chat_send = 0.0 if opts.url else 0.02
+
+    work = None
+    refill_stop = None
+    if opts.url:
+        make_transport = lambda: HttpTransport(opts.url)
+        rss_pid, rss_enabled = opts.server_pid, opts.server_pid is not None
+        target = opts.url
+    else:
+        work = Path(tempfile.mkdtemp(prefix="radio-carga-"))
+        flask_app, refill_stop = _synthetic_app(work, opts)
+        make_transport = lambda: TestClientTransport(flask_app)
+        rss_pid, rss_enabled = None, True
+        target = f"test client ({opts.tracks} músicas, {opts.blocks} blocos sintéticos)"
+
+    print(f"Alvo: {target} | degraus {steps} | {opts.duration:.0f} s cada | escuta {opts.play_sec} s/item")
+    results = []
+    try:
+        for n in steps:
+            r = run_step(n, make_transport, opts, rss_pid, rss_enabled)
+            print_step(r)
+            results.append(r)
+    finally:
+        if refill_stop is not None:
+            refill_stop.set()
+        if work is not None:
+            shutil.rmtree(work, ignore_errors=True)
+
+    if opts.json:
+        with open(opts.json, "w", encoding="utf-8") as f:
+            json.dump({"target": target, "steps": results}, f, ensure_ascii=False, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())